@@ -0,0 +1,84 @@
+"""
+FAISS index construction from factory strings.
+
+The index type is configured with a FAISS index_factory string: "Flat" (exact),
+"IVF4096,Flat", "IVF4096,PQ48" (IVF with product quantization), "HNSW32" or
+"SQ8" (scalar quantization), and combinations such as "HNSW32,SQ8". Types that
+need training are trained on a random sample of the vectors they will hold.
+"""
+from typing import List, Optional
+
+import faiss
+import numpy as np
+
+FLAT = "Flat"
+
+
+def needs_training(factory: str, dim: int) -> bool:
+    return not faiss.index_factory(dim, factory).is_trained
+
+
+def build_index(factory: str, vectors: np.ndarray, train_sample: int, seed: int = 0) -> faiss.Index:
+    """Creates an index of the given type, trains it on up to `train_sample` rows of `vectors`, and adds them all."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    index = faiss.index_factory(vectors.shape[1], factory)
+    if not index.is_trained:
+        sample = vectors
+        if len(vectors) > train_sample:
+            rows = np.random.default_rng(seed).choice(len(vectors), train_sample, replace=False)
+            sample = vectors[np.sort(rows)]
+        index.train(sample)
+    if len(vectors):
+        index.add(vectors)
+    return index
+
+
+def reconstruct_all(index: faiss.Index) -> np.ndarray:
+    """Returns every stored vector (approximate for quantized indexes)."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is None:
+        return index.reconstruct_n(0, index.ntotal)
+    # IVF lists need a direct map to reconstruct; drop it again since it blocks remove_ids.
+    ivf.make_direct_map()
+    try:
+        return index.reconstruct_n(0, index.ntotal)
+    finally:
+        ivf.make_direct_map(False)
+
+
+def compacts_on_remove(index: faiss.Index) -> bool:
+    """
+    Whether remove_ids renumbers the remaining rows contiguously, as LangChain's
+    FAISS.delete assumes. True for flat-code indexes (Flat, SQ, PQ); IVF keeps
+    stale labels and HNSW can't remove at all.
+    """
+    return isinstance(faiss.downcast_index(index), faiss.IndexFlatCodes)
+
+
+def rebuild_without(index: faiss.Index, keep_rows: List[int]):
+    """Re-adds only `keep_rows` to an index in place, keeping its training."""
+    vectors = reconstruct_all(index)[keep_rows]
+    index.reset()
+    if len(vectors):
+        index.add(vectors)
+
+
+def search_parameters(index: faiss.Index, nprobe: int, ef_search: int,
+                      selector: Optional[faiss.IDSelector] = None) -> faiss.SearchParameters:
+    """Per-query search settings for the index's type, optionally restricted to `selector`."""
+    if faiss.try_extract_index_ivf(index) is not None:
+        params = faiss.SearchParametersIVF()
+        params.nprobe = nprobe
+    elif isinstance(faiss.downcast_index(index), faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = ef_search
+    else:
+        params = faiss.SearchParameters()
+    if selector is not None:
+        params.sel = selector
+    return params
+
+
+def index_bytes(index: faiss.Index) -> int:
+    """Serialized size of an index, a close proxy for its memory use."""
+    return faiss.serialize_index(index).nbytes
@@ -0,0 +1,66 @@
+"""
+Lines per second of the fast parsers against the regex parse_* functions.
+
+Generates a corpus per format (1M lines by default, see synthetic_logs) with
+a small share of unusual lines that take the regex fallback, checks both
+parsers agree on every line, and reports throughput along with the format
+that sniffing the first PARSER_SNIFF_LINES lines detects. Key-value
+lines are parsed by the regex parser either way, so their row shows the
+run-to-run noise.
+
+Usage (from src/backend):
+    python bench_parsers.py
+    python bench_parsers.py --lines 2000000 --formats apache keyval
+"""
+import argparse
+import time
+from typing import Callable, Dict, List, Tuple
+
+from config import PARSER_SNIFF_LINES
+from log_parser import (
+    fast_parse_apache_log_line, fast_parse_singleline_log_line,
+    parse_apache_log_line, parse_keyval_log_line, parse_singleline_log_line, sniff_format,
+)
+from synthetic_logs import generate
+
+# format -> (regex parser, fast parser); lines come from synthetic_logs
+FORMATS: Dict[str, Tuple[Callable, Callable]] = {
+    "apache": (parse_apache_log_line, fast_parse_apache_log_line),
+    "singleline": (parse_singleline_log_line, fast_parse_singleline_log_line),
+    # Registered with its regex parser (see log_parser); listed to show that choice.
+    "keyval": (parse_keyval_log_line, parse_keyval_log_line),
+}
+
+
+def lines_per_second(parse: Callable[[str], Dict], lines: List[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for line in lines:
+            parse(line)
+        best = min(best, time.perf_counter() - started)
+    return len(lines) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the fast log parsers with the regex ones.")
+    parser.add_argument("--lines", type=int, default=1_000_000, help="lines generated per format")
+    parser.add_argument("--formats", nargs="+", choices=list(FORMATS), default=list(FORMATS))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'format':<12} {'sniffed as':<12} {'regex lines/s':>14} {'fast lines/s':>13} {'speedup':>8}")
+    for fmt in args.formats:
+        regex_parse, fast_parse = FORMATS[fmt]
+        lines = generate(fmt, args.lines)
+        mismatches = sum(regex_parse(line) != fast_parse(line) for line in lines)
+        if mismatches:
+            raise SystemExit(f"{fmt}: fast parser disagrees with the regex parser on {mismatches} lines.")
+        sniffed = sniff_format(lines[:PARSER_SNIFF_LINES])
+        old = lines_per_second(regex_parse, lines, args.repeat)
+        new = lines_per_second(fast_parse, lines, args.repeat)
+        print(f"{fmt:<12} {sniffed or '-':<12} {old:>14,.0f} {new:>13,.0f} {new / old:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
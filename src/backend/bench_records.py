@@ -0,0 +1,119 @@
+"""
+Storage, memory and prompt cost of the record store against pretty-printed JSON content.
+
+Parses a log directory (or synthetic logs) and compares the previous layout,
+with each entry's fields as indented JSON in the Document and all its metadata
+pickled in the docstore, with the current one: slim Documents that reference a
+RecordStore saved as memory-mapped columns. Reports bytes on disk, Python heap
+held while the index is open, and the size of a RETRIEVER_K-entry prompt
+context in characters and approximate tokens.
+
+Usage (from src/backend):
+    python bench_records.py
+    python bench_records.py --logs ../../logs
+"""
+import argparse
+import gc
+import json
+import os
+import pickle
+import tempfile
+import tracemalloc
+from typing import Callable, List, Tuple
+
+from langchain_core.documents import Document
+
+from bench_redaction import synthetic_lines
+from chunking import approx_tokens
+from config import RETRIEVER_K
+from log_index import STORED_METADATA
+from log_parser import iter_log_documents
+from record_store import RECORDS_DIR, RecordStore, parse_rendered
+
+
+def write_synthetic_logs(directory: str, count: int):
+    """Splits the synthetic lines into one file per format, named so the parser detects it."""
+    lines = synthetic_lines(count)
+    for i, name in enumerate(("access.apache", "app-singleline.log", "app-keyval.log")):
+        with open(os.path.join(directory, name), "w") as f:
+            f.write("\n".join(lines[i::3]) + "\n")
+
+
+def pretty(doc: Document) -> Document:
+    """The same entry with its content as indented JSON, as it used to be stored."""
+    pairs = parse_rendered(doc.page_content)
+    content = json.dumps(dict(pairs), indent=2) if pairs is not None else doc.page_content
+    return Document(page_content=content, metadata=doc.metadata)
+
+
+def held_bytes(build: Callable[[], object]) -> Tuple[object, int]:
+    """Python heap still allocated by the object `build` returns."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def directory_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+def context(docs: List[Document]) -> str:
+    """The prompt context rag_pipeline builds from retrieved entries."""
+    return "\n\n".join(
+        f"Source: {d.metadata.get('source', 'N/A')}, Line: {d.metadata.get('line', 'N/A')}\n{d.page_content}" for d in docs
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare pretty-JSON Documents with the record store.")
+    parser.add_argument("--logs", help="log directory (default: synthetic logs)")
+    parser.add_argument("--lines", type=int, default=60_000, help="synthetic lines to generate")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work:
+        logs = args.logs
+        if logs is None:
+            logs = os.path.join(work, "logs")
+            os.makedirs(logs)
+            write_synthetic_logs(logs, args.lines)
+        docs = list(iter_log_documents(logs))
+        if not docs:
+            raise SystemExit(f"No log entries found in {logs}.")
+
+        old_pickle = pickle.dumps({str(i): pretty(d) for i, d in enumerate(docs)})
+        _, old_heap = held_bytes(lambda: pickle.loads(old_pickle))
+
+        records = RecordStore()
+        slim = {}
+        for i, doc in enumerate(docs):
+            metadata = {key: doc.metadata[key] for key in STORED_METADATA if key in doc.metadata}
+            metadata["record"] = records.add(doc.page_content)
+            slim[str(i)] = Document(page_content="", metadata=metadata)
+        records_dir = os.path.join(work, RECORDS_DIR)
+        records.save(records_dir)
+        new_pickle = pickle.dumps(slim)
+        del records, slim
+        (loaded, _), new_heap = held_bytes(lambda: (RecordStore.load(records_dir), pickle.loads(new_pickle)))
+        old_disk, new_disk = len(old_pickle), len(new_pickle) + directory_bytes(records_dir)
+
+        sample = docs[:RETRIEVER_K]
+        old_context = context([pretty(d) for d in sample])
+        new_context = context([Document(page_content=loaded.text(i), metadata=d.metadata) for i, d in enumerate(sample)])
+
+    print(f"{len(docs)} entries from {logs}\n")
+    print(f"{'':<24} {'pretty JSON':>12} {'record store':>13} {'change':>8}")
+    for label, old, new in (
+        ("docstore on disk (MB)", old_disk / 1e6, new_disk / 1e6),
+        ("heap while open (MB)", old_heap / 1e6, new_heap / 1e6),
+        (f"context chars (k={RETRIEVER_K})", len(old_context), len(new_context)),
+        (f"context tokens (k={RETRIEVER_K})", approx_tokens(old_context), approx_tokens(new_context)),
+    ):
+        print(f"{label:<24} {old:>12.1f} {new:>13.1f} {100 * (new - old) / old:>7.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""
+Reproducible performance benchmarks for the whole pipeline, reported as JSON.
+
+Writes a synthetic corpus in all five log formats (synthetic_logs.py) and measures:
+
+    parse      entries/s and MB/s per format through iter_file_documents (redaction included)
+    build      time to build the index, and vectors/s
+    retrieval  p50/p99 of LogIndex searches for already-embedded questions
+    masking    Redactor MB/s over the corpus lines
+    llm        generations/s, p50/p99 and requests reaching the model for the
+               benchmark questions under concurrent load, sent straight to
+               ChatOllama and through the LLMDispatcher (fake_ollama.py serving
+               LLM_MAX_CONCURRENCY generations at once, like OLLAMA_NUM_PARALLEL),
+               then the same for --burst copies of one question sent at once,
+               with the number the dispatcher coalesced
+    e2e        /api/query p50/p99 and throughput under concurrent load, with the
+               LLM served by fake_ollama.py (canned answer, configurable delays)
+
+Embeddings come from DeterministicFakeEmbedding (hashing, no model) unless
+--embeddings model is given, so by default the numbers measure our own code.
+Results are written as JSON. With --baseline, every metric is compared with a
+stored result and the command exits with status 1 if any got worse by more
+than --tolerance.
+
+Usage (from src/backend):
+    python bench_suite.py --output baseline.json
+    python bench_suite.py --scale 50000 --baseline baseline.json --tolerance 0.15
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from fake_ollama import FakeOllama
+from synthetic_logs import GENERATORS, write_corpus
+
+QUESTIONS = [
+    "Which api pods returned 503 errors?",
+    "ERROR entries from orchestrator-eval-12 with retries",
+    "Why were pods evicted on node-3?",
+    "OOMKilled events between 10:00 and 11:00",
+    "payment retried after gateway timeout",
+    "slow requests with latency_ms above 800",
+    "GET /api/v1/items requests that failed with 500",
+    "cache_miss events for billing-7",
+]
+
+# Rates are better when larger; every other compared metric is a time.
+HIGHER_IS_BETTER = "_per_second"
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+
+    def at(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return {"p50_ms": at(0.50) * 1000, "p99_ms": at(0.99) * 1000, "mean_ms": statistics.fmean(ordered) * 1000}
+
+
+def bench_parse(paths: Dict[str, str]) -> Dict[str, Dict[str, float]]:
+    from log_parser import iter_file_documents
+
+    results = {}
+    for fmt, path in paths.items():
+        started = time.perf_counter()
+        entries = sum(1 for _ in iter_file_documents(path))
+        seconds = time.perf_counter() - started
+        results[fmt] = {"entries": entries, "entries_per_second": entries / seconds,
+                        "mb_per_second": os.path.getsize(path) / 1e6 / seconds}
+    return results
+
+
+def bench_build(embeddings, store_path: str, logs: str):
+    from log_index import LogIndex
+
+    index = LogIndex(embeddings, store_path, logs)
+    started = time.perf_counter()
+    index.build()
+    seconds = time.perf_counter() - started
+    return index, {"seconds": seconds, "vectors": len(index.store), "vectors_per_second": len(index.store) / seconds}
+
+
+def bench_retrieval(index, k: int, rounds: int) -> Dict[str, float]:
+    embedded = [(question, index.embeddings.embed_query(question)) for question in QUESTIONS]
+    latencies = []
+    for _ in range(rounds):
+        for question, embedding in embedded:
+            started = time.perf_counter()
+            index.search_by_vector(question, embedding, k)
+            latencies.append(time.perf_counter() - started)
+    return {"searches": len(latencies), **percentiles(latencies)}
+
+
+def bench_masking(paths: Dict[str, str], repeat: int) -> Dict[str, float]:
+    from bench_redaction import throughput
+    from security import default_redactor
+
+    lines = []
+    for path in paths.values():
+        with open(path, encoding="utf-8") as f:
+            lines.extend(f.read().splitlines())
+    return {"lines": len(lines), "mb_per_second": throughput(default_redactor.redact_batch, lines, repeat)}
+
+
+def bench_llm(requests: int, concurrency: int, first_token_delay: float, token_delay: float,
+              burst: int = 32) -> Dict[str, Dict]:
+    """
+    Sends `requests` generations, `concurrency` at a time, cycling through the
+    benchmark questions; every fourth is "high" priority when dispatched. Then
+    sends `burst` copies of one question at once, which the dispatcher coalesces.
+    """
+    from langchain_core.prompt_values import StringPromptValue
+    import llm_loader
+    from config import LLM_MAX_CONCURRENCY
+    from llm_dispatch import LLMDispatcher
+
+    async def run(generate):
+        gate = asyncio.Semaphore(concurrency)
+        latencies: Dict[str, List[float]] = {"high": [], "normal": []}
+
+        async def one(i: int):
+            priority = "high" if i % 4 == 0 else "normal"
+            async with gate:
+                started = time.perf_counter()
+                await generate(StringPromptValue(text=QUESTIONS[i % len(QUESTIONS)]), priority)
+                latencies[priority].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        return time.perf_counter() - started, latencies
+
+    results = {}
+    with FakeOllama(first_token_delay=first_token_delay, token_delay=token_delay, parallel=LLM_MAX_CONCURRENCY) as fake:
+        # A server of its own, limited to LLM_MAX_CONCURRENCY; the e2e one serves everything at once.
+        base_url, llm_loader.OLLAMA_BASE_URL = llm_loader.OLLAMA_BASE_URL, fake.url
+        try:
+            llm = llm_loader.load_local_llm()
+        finally:
+            llm_loader.OLLAMA_BASE_URL = base_url
+
+        async def duplicate_burst(generate):
+            async def one():
+                started = time.perf_counter()
+                await generate(StringPromptValue(text=QUESTIONS[0]), "normal")
+                return time.perf_counter() - started
+
+            started = time.perf_counter()
+            latencies = await asyncio.gather(*(one() for _ in range(burst)))
+            return time.perf_counter() - started, list(latencies)
+
+        async def compare_modes():
+            # One event loop for both, since the client's pooled connections belong to it.
+            dispatcher = LLMDispatcher(llm, LLM_MAX_CONCURRENCY)
+            modes = {"direct": lambda prompt, priority: llm.ainvoke(prompt), "dispatched": dispatcher.generate}
+            for mode, generate in modes.items():
+                before = fake.requests
+                seconds, latencies = await run(generate)
+                results[mode] = {"requests": requests, "llm_requests": fake.requests - before,
+                                 "requests_per_second": requests / seconds,
+                                 **percentiles(latencies["high"] + latencies["normal"])}
+            results["dispatched"]["high_priority"] = percentiles(latencies["high"])
+            results["dispatched"]["coalesced"] = dispatcher.coalesced
+
+            # Many clients asking the same question at once, e.g. about one incident.
+            results["duplicate_burst"] = {"requests": burst}
+            for mode, generate in modes.items():
+                before, coalesced = fake.requests, dispatcher.coalesced
+                seconds, latencies = await duplicate_burst(generate)
+                results["duplicate_burst"][mode] = {"llm_requests": fake.requests - before,
+                                                    "requests_per_second": burst / seconds, **percentiles(latencies)}
+            results["duplicate_burst"]["dispatched"]["coalesced"] = dispatcher.coalesced - coalesced
+
+        asyncio.run(compare_modes())
+    return results
+
+
+def bench_e2e(embeddings, requests: int, concurrency: int) -> Dict[str, float]:
+    """Runs the API in this process and sends `requests` queries, `concurrency` at a time."""
+    import uvicorn
+    import main
+    import rag_pipeline
+
+    rag_pipeline.load_embeddings = lambda: embeddings  # the same embeddings the index was built with
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=0, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="bench-api", daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise SystemExit("The API server failed to start.")
+        time.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    url = f"http://127.0.0.1:{port}/api/query"
+    # The pipeline loads in the background after startup; wait until it is ready.
+    while main.app.state.startup["state"] == "starting":
+        time.sleep(0.05)
+    if main.app.state.startup["state"] == "failed":
+        raise SystemExit(f"The RAG pipeline failed to load: {main.app.state.startup['error']}")
+
+    def query(i: int):
+        body = json.dumps({"query": QUESTIONS[i % len(QUESTIONS)]}).encode("utf-8")
+        request = urllib.request.Request(url, body, {"Content-Type": "application/json"})
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                ok = response.status == 200
+        except OSError:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(query, range(requests)))
+        seconds = time.perf_counter() - started
+    finally:
+        server.should_exit = True
+        thread.join()
+
+    latencies = [latency for latency, ok in results if ok]
+    if not latencies:
+        raise SystemExit("Every end-to-end query failed.")
+    return {"requests": requests, "concurrency": concurrency, "errors": requests - len(latencies),
+            "requests_per_second": len(latencies) / seconds, **percentiles(latencies)}
+
+
+def flatten(results: Dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[prefix + key] = value
+    return flat
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Metrics (rates and times) that are more than `tolerance` worse than the baseline."""
+    current, previous = flatten(results["benchmarks"]), flatten(baseline["benchmarks"])
+    regressions = []
+    for name, old in previous.items():
+        new = current.get(name)
+        if new is None or not old or not name.endswith(("_per_second", "_ms", "seconds")):
+            continue
+        change = (new - old) / old
+        worse = -change if name.endswith(HIGHER_IS_BETTER) else change
+        if worse > tolerance:
+            regressions.append(f"{name}: {old:.4g} -> {new:.4g} ({change:+.1%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parsing, indexing, retrieval, masking and /api/query.")
+    parser.add_argument("--scale", type=int, default=20_000, help="entries generated per log format")
+    parser.add_argument("--formats", nargs="+", choices=list(GENERATORS), default=list(GENERATORS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--embeddings", choices=("fake", "model"), default="fake")
+    parser.add_argument("--retrieval-rounds", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3, help="best-of runs for masking throughput")
+    parser.add_argument("--requests", type=int, default=200, help="end-to-end queries to send")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--first-token-delay", type=float, default=0.05, help="fake LLM seconds before its first token")
+    parser.add_argument("--token-delay", type=float, default=0.002, help="fake LLM seconds between tokens")
+    parser.add_argument("--burst", type=int, default=32, help="identical LLM questions sent at once")
+    parser.add_argument("--skip", nargs="+", default=[], choices=("parse", "build", "retrieval", "masking", "llm", "e2e"))
+    parser.add_argument("--output", help="write the results here (default: stdout)")
+    parser.add_argument("--baseline", help="results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed slowdown before a metric counts as a regression")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work, FakeOllama(first_token_delay=args.first_token_delay,
+                                                           token_delay=args.token_delay) as llm:
+        logs, store = os.path.join(work, "logs"), os.path.join(work, "store")
+        # Backend modules read their configuration at import time, so set it up before importing any.
+        os.environ.update(
+            LOGS_DIRECTORY=logs, VECTOR_STORE_PATH=store, OLLAMA_BASE_URL=llm.url,
+            EMBEDDING_CACHE_PATH=os.path.join(work, "embedding_cache.sqlite"), QUERY_CACHE_ENABLED="false",
+            REFRESH_ON_STARTUP="false", LIVE_INGEST_ENABLED="false",
+            QUERY_MAX_WAITING=os.environ.get("QUERY_MAX_WAITING", str(args.concurrency)),
+        )
+        paths = write_corpus(logs, args.scale, args.formats, args.seed)
+
+        if args.embeddings == "fake":
+            from langchain_core.embeddings import DeterministicFakeEmbedding
+            embeddings = DeterministicFakeEmbedding(size=384)
+        else:
+            from llm_loader import load_embeddings
+            embeddings = load_embeddings()
+        from config import LLM_MAX_CONCURRENCY, QUERY_MAX_CONCURRENCY, RETRIEVER_K
+
+        benchmarks = {}
+        if "parse" not in args.skip:
+            benchmarks["parse"] = bench_parse(paths)
+        if "masking" not in args.skip:
+            benchmarks["masking"] = bench_masking(paths, args.repeat)
+        if "llm" not in args.skip:
+            benchmarks["llm"] = bench_llm(args.requests, args.concurrency, args.first_token_delay,
+                                          args.token_delay, args.burst)
+        if not {"build", "retrieval", "e2e"} <= set(args.skip):
+            index, benchmarks["build"] = bench_build(embeddings, store, logs)
+            if "retrieval" not in args.skip:
+                benchmarks["retrieval"] = bench_retrieval(index, RETRIEVER_K, args.retrieval_rounds)
+            if "e2e" not in args.skip:
+                benchmarks["e2e"] = bench_e2e(embeddings, args.requests, args.concurrency)
+            if "build" in args.skip:
+                del benchmarks["build"]
+
+    results = {
+        "meta": {
+            "scale": args.scale, "formats": args.formats, "seed": args.seed, "embeddings": args.embeddings,
+            "first_token_delay": args.first_token_delay, "token_delay": args.token_delay,
+            "query_max_concurrency": QUERY_MAX_CONCURRENCY, "llm_max_concurrency": LLM_MAX_CONCURRENCY,
+            "python": platform.python_version(),
+            "platform": platform.platform(), "cpus": os.cpu_count(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "benchmarks": benchmarks,
+    }
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"Results written to {args.output}")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        different = {key for key in ("scale", "formats", "embeddings") if baseline["meta"].get(key) != results["meta"][key]}
+        if different:
+            print(f"WARNING: baseline differs in {', '.join(sorted(different))}; results are not directly comparable.")
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Offline index builds, without the API server.
+
+Builds the index for a log directory in a staging directory next to the
+store, saving a checkpoint at most every BUILD_CHECKPOINT_SECONDS: the
+ingestion manifest (how far each file was parsed), the record store and the
+time shards built so far. Embedded batches are kept by the embedding cache as
+they are computed. Running the command again after a crash resumes from the
+last checkpoint; --restart discards it.
+
+A finished build is published by pointing VECTOR_STORE_PATH, a symlink, at it
+with a single rename, and a running server switches to it on
+POST /api/index/reload without restarting. The previously published build is
+kept until the next one replaces it, since a server that hasn't reloaded yet
+still reads from it.
+
+Usage (from src/backend):
+    python build_index.py
+    python build_index.py --restart --reload-url http://localhost:8000
+"""
+import argparse
+import os
+import shutil
+import time
+import urllib.request
+from typing import Optional
+
+from config import BUILD_CHECKPOINT_SECONDS, LOGS_DIRECTORY, VECTOR_STORE_PATH
+from log_index import LogIndex
+from sharded_store import ShardedVectorStore
+
+BUILDS_SUFFIX = ".builds"
+STAGING_DIR = "staging"
+BUILD_PREFIX = "build-"
+
+
+def builds_directory(store_path: str) -> str:
+    """Where builds of `store_path` are staged and kept."""
+    return os.path.abspath(store_path) + BUILDS_SUFFIX
+
+
+def build(embeddings, store_path: str, logs_directory: str, checkpoint_seconds: Optional[float],
+          restart: bool = False) -> str:
+    """Builds (or finishes building) an index of `logs_directory` and returns its directory."""
+    staging = os.path.join(builds_directory(store_path), STAGING_DIR)
+    if restart or not ShardedVectorStore.exists(staging):
+        # Nothing usable: either asked to start over or stopped before the first checkpoint.
+        shutil.rmtree(staging, ignore_errors=True)
+        LogIndex(embeddings, staging, logs_directory).build(checkpoint_seconds)
+    else:
+        print(f"Resuming the build checkpointed in {staging}")
+        index = LogIndex(embeddings, staging, logs_directory)
+        index.load_or_build(refresh=False)
+        index.refresh(checkpoint_seconds=checkpoint_seconds)
+        if not len(index.store):
+            raise ValueError("No documents found in the log directory. Cannot build vector store.")
+
+    finished = os.path.join(builds_directory(store_path), BUILD_PREFIX + time.strftime("%Y%m%dT%H%M%S"))
+    os.rename(staging, finished)
+    return finished
+
+
+def publish(build_dir: str, store_path: str):
+    """
+    Points `store_path` at `build_dir` in one rename and removes builds older
+    than the one it replaces.
+    """
+    builds = builds_directory(store_path)
+    previous = os.path.realpath(store_path) if os.path.lexists(store_path) else None
+    if os.path.isdir(store_path) and not os.path.islink(store_path):
+        # A store the server built in place; move it among the builds so it can be swapped out.
+        previous = os.path.join(os.path.realpath(builds), BUILD_PREFIX + "initial")
+        os.rename(store_path, previous)
+        print(f"Moved the existing store at {store_path} to {previous}; reload or restart servers using it.")
+
+    link = store_path + ".link"
+    if os.path.lexists(link):
+        os.remove(link)
+    os.symlink(os.path.relpath(build_dir, os.path.dirname(os.path.abspath(store_path))), link)
+    os.replace(link, store_path)
+    print(f"Published {build_dir} as {store_path}")
+
+    for name in os.listdir(builds):
+        path = os.path.join(builds, name)
+        if name.startswith(BUILD_PREFIX) and os.path.realpath(path) not in (os.path.realpath(build_dir), previous):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def request_reload(server_url: str):
+    """Asks a running server to switch to the published index."""
+    request = urllib.request.Request(server_url.rstrip("/") + "/api/index/reload", method="POST")
+    with urllib.request.urlopen(request) as response:
+        print(f"Server reloaded: {response.read().decode('utf-8')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the log index offline and publish it atomically.")
+    parser.add_argument("--logs", default=LOGS_DIRECTORY, help="log directory (default: LOGS_DIRECTORY)")
+    parser.add_argument("--store", default=VECTOR_STORE_PATH, help="published store path (default: VECTOR_STORE_PATH)")
+    parser.add_argument("--checkpoint-seconds", type=float, default=BUILD_CHECKPOINT_SECONDS)
+    parser.add_argument("--restart", action="store_true", help="discard a checkpointed build and start over")
+    parser.add_argument("--reload-url", help="base URL of a running server to reload once published")
+    args = parser.parse_args()
+
+    from llm_loader import load_embeddings  # imported here so build() can be used without the model packages
+    build_dir = build(load_embeddings(), args.store, args.logs, args.checkpoint_seconds, args.restart)
+    publish(build_dir, args.store)
+    if args.reload_url:
+        request_reload(args.reload_url)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Log-aware chunking at ingestion and token-budgeted context packing at query time.
+
+Parsed entries are short, so embedding each on its own yields one vector per
+line and hits without their surroundings. Instead, adjacent entries of a file
+that come from the same pod are embedded together as a window, bounded by a
+character size, a time span and an entry count. An entry too long for any
+window is split by the text splitter as before.
+
+At query time more chunks are retrieved than a prompt needs; the packer drops
+duplicates and chunks covering lines already taken, and keeps the best-ranked
+ones that fit a token budget, so prompt size (and with it generation latency)
+stays predictable.
+"""
+import re
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from langchain_core.documents import Document
+
+from log_parser import INDEXED_FIELDS
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+# Position keys of parsed entries, and where a window records its last one.
+UNIT_KEYS = {"line": "end_line", "block": "end_block"}
+
+
+def approx_tokens(text: str) -> int:
+    """Word and punctuation count, a stand-in for the LLM tokenizer."""
+    return len(_TOKEN.findall(text))
+
+
+def merge_metadata(metadatas: Sequence[Dict]) -> Dict:
+    """
+    Metadata for a window of entries: the first entry's, with each indexed
+    field holding the distinct values of the window (a list when there are
+    several) and the last entry's position as end_line / end_block.
+    """
+    merged = dict(metadatas[0])
+    for field in INDEXED_FIELDS:
+        values = list(dict.fromkeys(m[field] for m in metadatas if m.get(field) is not None))
+        if len(values) > 1:
+            merged[field] = values
+        elif values:
+            merged[field] = values[0]
+    for unit, end in UNIT_KEYS.items():
+        if unit in metadatas[-1] and len(metadatas) > 1:
+            merged[end] = metadatas[-1][unit]
+    return merged
+
+
+class LogChunker:
+    """Groups adjacent parsed entries into windows and turns each window into chunks."""
+
+    def __init__(self, text_splitter, window_chars: int, window_seconds: float, max_entries: int):
+        self.text_splitter = text_splitter
+        self.window_chars = window_chars
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+
+    def fits(self, window: List[Document], doc: Document) -> bool:
+        """Whether `doc` can join `window`: same source and pod, within every bound."""
+        if not window:
+            return True
+        first = window[0].metadata
+        if len(window) >= self.max_entries or any(
+                doc.metadata.get(key) != first.get(key) for key in ("source", "pod")):
+            return False
+        if sum(len(d.page_content) + 1 for d in window) + len(doc.page_content) > self.window_chars:
+            return False
+        start, ts = first.get("timestamp"), doc.metadata.get("timestamp")
+        if start is None or ts is None:
+            return start is None and ts is None
+        return abs((datetime.fromisoformat(ts) - datetime.fromisoformat(start)).total_seconds()) <= self.window_seconds
+
+    def windows(self, docs: Iterable[Document]) -> List[List[Document]]:
+        """Splits a run of entries, in file order, into windows."""
+        windows: List[List[Document]] = []
+        for doc in docs:
+            if windows and self.fits(windows[-1], doc):
+                windows[-1].append(doc)
+            else:
+                windows.append([doc])
+        return windows
+
+    def chunks(self, window: List[Document]) -> List[Document]:
+        """One chunk for a window of several entries; a single entry is split if it is too long."""
+        if len(window) == 1:
+            return self.text_splitter.split_documents(window)
+        return [Document(page_content="\n".join(doc.page_content for doc in window),
+                         metadata=merge_metadata([doc.metadata for doc in window]))]
+
+    def chunk_all(self, docs: Iterable[Document]) -> List[Document]:
+        return [chunk for window in self.windows(docs) for chunk in self.chunks(window)]
+
+
+def _span(doc: Document) -> Optional[tuple]:
+    """(source, unit, first, last) of the entries a chunk covers, if it knows its position."""
+    for unit, end in UNIT_KEYS.items():
+        if unit in doc.metadata:
+            first = doc.metadata[unit]
+            return doc.metadata.get("source"), unit, first, doc.metadata.get(end, first)
+    return None
+
+
+def pack_context(docs: Sequence[Document], render: Callable[[Document], str], budget_tokens: int) -> List[str]:
+    """
+    Renders retrieved chunks, best-ranked first, skipping duplicates and chunks
+    overlapping lines already packed, until `budget_tokens` is spent. Parts of
+    one entry too long for a single chunk share its position, so they never
+    count as overlapping each other. A chunk that doesn't fit is skipped in
+    favour of smaller ones further down; the best-ranked chunk is always kept.
+    """
+    packed: List[str] = []
+    spans: List[tuple] = []
+    seen = set()
+    used = 0
+    for doc in docs:
+        span = _span(doc)
+        # Only a single entry is ever split, so parts have equal one-entry spans.
+        part = span is not None and span[2] == span[3]
+        if doc.page_content in seen or (span is not None and any(
+                not (part and s == span) and s[:2] == span[:2] and s[2] <= span[3] and span[2] <= s[3]
+                for s in spans)):
+            continue
+        text = render(doc)
+        tokens = approx_tokens(text)
+        if packed and used + tokens > budget_tokens:
+            continue
+        packed.append(text)
+        used += tokens
+        seen.add(doc.page_content)
+        if span is not None:
+            spans.append(span)
+    return packed
@@ -0,0 +1,81 @@
+"""
+Admission control for LLM-backed requests.
+
+A fixed number of queries may hold an LLM slot at once; a bounded number more
+may wait for one, and anything beyond that is rejected immediately so callers
+can back off (HTTP 429) instead of piling up behind a slow model. Running
+queries are cancelled when their client disconnects.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict
+
+
+class QueryRejected(Exception):
+    """Raised when all slots are busy and the wait queue is full."""
+
+
+class ClientDisconnected(Exception):
+    """Raised when the client went away before its query finished."""
+
+
+class QueryLimiter:
+    """Caps in-flight queries at `max_concurrency`, with at most `max_waiting` queued behind them."""
+
+    def __init__(self, max_concurrency: int, max_waiting: int):
+        self.max_concurrency = max_concurrency
+        self.max_waiting = max_waiting
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.waiting = 0
+        self.in_flight = 0
+        self.rejected = 0
+
+    def full(self) -> bool:
+        """Whether a new query would be rejected right now."""
+        return self._semaphore.locked() and self.waiting >= self.max_waiting
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.full():
+            self.rejected += 1
+            raise QueryRejected()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_waiting": self.max_waiting,
+            "rejected": self.rejected,
+        }
+
+
+async def run_until_disconnect(coro: Awaitable, is_disconnected: Callable[[], Awaitable[bool]],
+                               poll_interval: float = 0.5):
+    """
+    Awaits `coro`, checking `is_disconnected` every `poll_interval` seconds and
+    cancelling the work (and raising ClientDisconnected) once it returns True.
+    The work is also cancelled if the caller itself is cancelled, e.g. by a timeout.
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await is_disconnected():
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
@@ -32,6 +32,9 @@ load_dotenv()
 # Make sure you have pulled this model, e.g., by running `ollama run phi3`
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "mistral:latest") 
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+# How long Ollama keeps the model loaded after a request, in seconds or as a duration
+# such as "30m"; -1 keeps it resident, so queries never wait for it to reload.
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "-1")
 
 # Embedding model remains the same, as it's used for the retriever.
 EMBEDDING_MODEL_ID = "all-MiniLM-L6-v2"
@@ -44,4 +47,128 @@ VECTOR_STORE_PATH = os.getenv("VECTOR_STORE_PATH", "vector_store/faiss_index")
 # --- RAG Configuration ---
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 100
-RETRIEVER_K = 3 # Number of relevant log chunks to retrieve
\ No newline at end of file
+RETRIEVER_K = int(os.getenv("RETRIEVER_K", "12"))  # chunks retrieved; the context packer keeps what fits the budget
+
+# --- Chunking & Context Configuration ---
+# Adjacent entries from the same file and pod are embedded together, in windows of at most CHUNK_SIZE characters.
+CHUNK_WINDOW_SECONDS = float(os.getenv("CHUNK_WINDOW_SECONDS", "60"))  # max time span of one window
+CHUNK_WINDOW_MAX_ENTRIES = int(os.getenv("CHUNK_WINDOW_MAX_ENTRIES", "20"))  # 1 embeds every entry on its own
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))  # approximate tokens of log context per prompt
+
+# --- Ingestion Configuration ---
+# Number of parsed log entries chunked and embedded together while building the index.
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "512"))
+# Lines read from the start of each log file to detect its format.
+PARSER_SNIFF_LINES = int(os.getenv("PARSER_SNIFF_LINES", "20"))
+# Uncompressed log files at least this large are scanned through a memory map.
+LOG_MMAP_MIN_BYTES = int(os.getenv("LOG_MMAP_MIN_BYTES", str(16 * 1024 * 1024)))
+# Whether to ingest appended lines and new files into an existing index at startup.
+REFRESH_ON_STARTUP = os.getenv("REFRESH_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+# --- Offline Build Configuration ---
+# build_index.py saves a checkpoint of a build in progress at most this often.
+BUILD_CHECKPOINT_SECONDS = float(os.getenv("BUILD_CHECKPOINT_SECONDS", "300"))
+
+# --- Embedding Cache Configuration ---
+# Skips re-embedding chunks whose normalised text was embedded before with the same model.
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Kept outside VECTOR_STORE_PATH so it survives index rebuilds.
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH", os.path.join(os.path.dirname(VECTOR_STORE_PATH), "embedding_cache.sqlite")
+)
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "1000000"))
+
+# --- Template Mining Configuration ---
+# Collapses entries that differ only in variable fields into one embedded template per event type.
+TEMPLATE_MINING_ENABLED = os.getenv("TEMPLATE_MINING_ENABLED", "false").lower() in ("1", "true", "yes")
+TEMPLATE_SIM_THRESHOLD = float(os.getenv("TEMPLATE_SIM_THRESHOLD", "0.5"))
+TEMPLATE_EXPAND_LIMIT = int(os.getenv("TEMPLATE_EXPAND_LIMIT", "5"))  # occurrences listed per matched template
+
+# --- Parallel Build Configuration ---
+# When enabled, a cold build parses and embeds with process pools instead of a single core.
+PARALLEL_BUILD = os.getenv("PARALLEL_BUILD", "false").lower() in ("1", "true", "yes")
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(os.cpu_count() or 1)))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "4"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+# Line-oriented files larger than this are split into byte-range shards.
+SHARD_BYTES = int(os.getenv("SHARD_BYTES", str(64 * 1024 * 1024)))
+
+# --- Live Ingestion Configuration ---
+# Tails files under LOGS_DIRECTORY in the background and embeds new lines in micro-batches.
+LIVE_INGEST_ENABLED = os.getenv("LIVE_INGEST_ENABLED", "false").lower() in ("1", "true", "yes")
+LIVE_POLL_INTERVAL = float(os.getenv("LIVE_POLL_INTERVAL", "2.0"))  # seconds between directory scans
+LIVE_BATCH_SIZE = int(os.getenv("LIVE_BATCH_SIZE", "64"))  # flush a micro-batch at this many chunks...
+LIVE_FLUSH_SECONDS = float(os.getenv("LIVE_FLUSH_SECONDS", "1.0"))  # ...or when its oldest chunk is this old
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", "10000"))  # parsed entries buffered before the tailer blocks
+LIVE_SAVE_INTERVAL = float(os.getenv("LIVE_SAVE_INTERVAL", "60.0"))  # seconds between index saves
+
+# --- Hybrid Retrieval Configuration ---
+# Narrows vector search with field filters found in the question and fuses it with BM25 keyword ranking.
+HYBRID_SEARCH_ENABLED = os.getenv("HYBRID_SEARCH_ENABLED", "true").lower() in ("1", "true", "yes")
+HYBRID_FETCH_K = int(os.getenv("HYBRID_FETCH_K", "20"))  # candidates taken from each ranking before fusion
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))  # reciprocal rank fusion damping constant
+
+# --- Aggregation Configuration ---
+# Count and top-N questions are answered from rollups counted at ingestion, without the LLM.
+AGGREGATION_ENABLED = os.getenv("AGGREGATION_ENABLED", "true").lower() in ("1", "true", "yes")
+ROLLUP_BUCKET_SECONDS = int(os.getenv("ROLLUP_BUCKET_SECONDS", "60"))  # time resolution of the counts
+AGGREGATION_TOP_N = int(os.getenv("AGGREGATION_TOP_N", "10"))  # rows listed when a question names no N
+
+# --- Time Sharding Configuration ---
+# Vectors are partitioned into one FAISS shard per "hour" or "day" of log time (UTC).
+SHARD_GRANULARITY = os.getenv("SHARD_GRANULARITY", "hour")
+SHARD_CACHE_SIZE = int(os.getenv("SHARD_CACHE_SIZE", "8"))  # shards kept in memory before the least recently used is dropped
+
+# --- ANN Index Configuration ---
+# FAISS index_factory string used for each shard, e.g. "Flat" (exact), "IVF1024,Flat",
+# "IVF1024,PQ48", "HNSW32" or "SQ8". Compare options on your own data with index_eval.py.
+INDEX_FACTORY = os.getenv("INDEX_FACTORY", "Flat")
+# Shards stay flat until they hold this many vectors, then are trained and rebuilt as INDEX_FACTORY.
+INDEX_TRAIN_MIN = int(os.getenv("INDEX_TRAIN_MIN", "50000"))
+INDEX_TRAIN_SAMPLE = int(os.getenv("INDEX_TRAIN_SAMPLE", "100000"))  # max vectors used for training
+INDEX_NPROBE = int(os.getenv("INDEX_NPROBE", "16"))  # IVF lists probed per query
+INDEX_EF_SEARCH = int(os.getenv("INDEX_EF_SEARCH", "64"))  # HNSW search breadth
+# Open saved shards read-only through memory maps, so every worker process on a host
+# shares one copy of the index and docstore in the page cache.
+INDEX_MMAP = os.getenv("INDEX_MMAP", "true").lower() in ("1", "true", "yes")
+
+# --- Query Concurrency Configuration ---
+QUERY_MAX_CONCURRENCY = int(os.getenv("QUERY_MAX_CONCURRENCY", "4"))  # queries generating with the LLM at once
+QUERY_MAX_WAITING = int(os.getenv("QUERY_MAX_WAITING", "16"))  # queries queued for a slot before new ones get 429
+QUERY_TIMEOUT_SECONDS = float(os.getenv("QUERY_TIMEOUT_SECONDS", "120"))  # including time spent queued
+
+# --- LLM Dispatch Configuration ---
+# Generations sent to Ollama at once; set to Ollama's OLLAMA_NUM_PARALLEL. Further ones
+# wait in the dispatcher, by priority, and identical prompts share one generation.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_KEEPALIVE_SECONDS = float(os.getenv("LLM_KEEPALIVE_SECONDS", "300"))  # idle pooled connections to Ollama are kept this long
+LLM_WARM_ON_STARTUP = os.getenv("LLM_WARM_ON_STARTUP", "true").lower() in ("1", "true", "yes")  # load the model before reporting ready
+
+# --- Query Cache Configuration ---
+# Reuses answers for repeated questions until the index changes or the TTL passes.
+QUERY_CACHE_ENABLED = os.getenv("QUERY_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "256"))
+QUERY_CACHE_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL_SECONDS", "300"))
+# Cosine similarity above which a differently worded question reuses a cached answer.
+QUERY_CACHE_SIMILARITY = float(os.getenv("QUERY_CACHE_SIMILARITY", "0.95"))
+
+# --- Redaction Configuration ---
+# Masks IPs, emails, UUIDs (and any patterns below) in log content as it is ingested,
+# so the vector store and the LLM context never hold the raw values.
+REDACT_AT_INGEST = os.getenv("REDACT_AT_INGEST", "true").lower() in ("1", "true", "yes")
+# Extra patterns as a JSON object {"name": "regex"}, or a path to a JSON file holding one.
+# Matches are replaced with "[NAME_MASKED]".
+REDACTION_PATTERNS = os.getenv("REDACTION_PATTERNS", "")
+# The indexed `ip` field holds a keyed hash of the address instead of a mask, so questions
+# naming an IP can still filter on it. The key is REDACTION_KEY, or else a random key created
+# in REDACTION_KEY_FILE on first use; changing it orphans the hashes of an existing index.
+REDACTION_KEY = os.getenv("REDACTION_KEY", "")
+REDACTION_KEY_FILE = os.getenv("REDACTION_KEY_FILE", os.path.join(os.path.dirname(VECTOR_STORE_PATH), "redaction.key"))
+
+# --- Profiling Configuration ---
+# When enabled, a query sent with the header "X-Profile: 1" is run under a sampling
+# profiler (pyinstrument if installed, else a built-in stack sampler) and the report
+# is written to PROFILE_DIR.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL_SECONDS = float(os.getenv("PROFILE_INTERVAL_SECONDS", "0.001"))
@@ -0,0 +1,149 @@
+"""
+Persistent embedding cache.
+
+Production logs repeat heavily (health checks, dispatch events, identical
+access-log lines), so most chunks embedded during a build have been embedded
+before. Vectors are stored in a SQLite file keyed by a hash of the embedding
+model ID and the whitespace-normalised chunk text, with a size cap enforced by
+least-recently-used eviction.
+"""
+import os
+import hashlib
+import sqlite3
+import threading
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+
+def normalize_text(text: str) -> str:
+    """Collapses whitespace so formatting-only differences share a cache entry."""
+    return " ".join(text.split())
+
+
+class EmbeddingCache:
+    """SQLite-backed map from (model, text) to vector with LRU eviction."""
+
+    def __init__(self, path: str, model_id: str, max_entries: int):
+        self.path = path
+        self.model_id = model_id
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._count, last_used = self._conn.execute("SELECT COUNT(*), MAX(last_used) FROM embeddings").fetchone()
+        # A logical clock is cheaper and more precise than wall time for LRU ordering.
+        self._clock = last_used or 0
+
+    def key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.model_id}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        """Returns the cached vectors for whichever of `keys` are present, marking them recently used."""
+        found: Dict[str, List[float]] = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(unique), 500):
+                part = unique[start:start + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", part
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+            if found:
+                self._clock += 1
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?", ((self._clock, k) for k in found)
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, items: Sequence[Tuple[str, List[float]]]):
+        """Stores vectors, evicting the least recently used entries beyond the size cap."""
+        if not items:
+            return
+        with self._lock:
+            self._clock += 1
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                ((key, array("f", vector).tobytes(), self._clock) for key, vector in items),
+            )
+            self._count += self._conn.total_changes - before
+            if self._count > self.max_entries:
+                excess = self._count - self.max_entries
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+                self._count -= excess
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an Embeddings model so document embeddings are served from an
+    EmbeddingCache when possible. Query embeddings are passed straight through.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, texts: Sequence[str]) -> Tuple[List[Optional[List[float]]], List[str], List[int]]:
+        """
+        Resolves what it can from the cache. Returns the vectors (None where
+        missing), the cache keys, and the indices of the texts still to embed,
+        with duplicates inside the batch only listed once.
+        """
+        keys = [self.cache.key(text) for text in texts]
+        found = self.cache.get_many(keys)
+        vectors: List[Optional[List[float]]] = [found.get(key) for key in keys]
+
+        missing: List[int] = []
+        seen = set()
+        for i, key in enumerate(keys):
+            if vectors[i] is None and key not in seen:
+                seen.add(key)
+                missing.append(i)
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        return vectors, keys, missing
+
+    def fill(self, vectors: List[Optional[List[float]]], keys: List[str], missing: List[int],
+             new_vectors: List[List[float]]) -> List[List[float]]:
+        """Stores freshly computed vectors and completes the batch started by lookup()."""
+        computed = {keys[i]: vector for i, vector in zip(missing, new_vectors)}
+        self.cache.put_many(list(computed.items()))
+        return [vector if vector is not None else computed[key] for vector, key in zip(vectors, keys)]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors, keys, missing = self.lookup(texts)
+        new_vectors = self.embeddings.embed_documents([texts[i] for i in missing]) if missing else []
+        return self.fill(vectors, keys, missing, new_vectors)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def report(self) -> str:
+        return (f"Embedding cache: {self.hits} hits, {self.misses} misses "
+                f"({self.hit_rate():.1%} hit rate), {len(self.cache)} entries stored.")
+
+    def reset_stats(self):
+        self.hits = self.misses = 0
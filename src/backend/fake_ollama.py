@@ -0,0 +1,172 @@
+"""
+A stand-in for the Ollama HTTP API, for benchmarks that shouldn't need a model.
+
+Answers /api/chat and /api/generate with a canned JSON answer, streamed as
+newline-delimited chunks the way Ollama streams them (or as one object when
+the request sets "stream": false). `first_token_delay` is slept before the
+first chunk and `token_delay` before each later one, so generation time can be
+dialled to match a real model. A chat without messages (or a generate without a
+prompt) is answered at once with done_reason "load", as Ollama does when it is
+only asked to load the model. With `parallel`, at most that many generations
+run at once and the rest wait, like Ollama's OLLAMA_NUM_PARALLEL. /api/tags and /api/version answer too. Requests
+(`requests`, `loads`) and accepted connections (`connections`) are counted.
+
+Usage (from src/backend):
+    python fake_ollama.py --port 11434 --first-token-delay 0.2 --token-delay 0.01
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+CANNED_ANSWER = json.dumps({
+    "analysis": "The retrieved entries show repeated 503 responses from the api pods.",
+    "summary": "Requests to the api service failed with 503 while the upstream was unavailable.",
+    "evidence": [{"type": "log", "content": "level=ERROR pod=api-3 status=503"}],
+})
+
+_TOKEN = re.compile(r"\S+\s*")
+
+
+class FakeOllama:
+    """Serves the canned answer on `port` (0 picks a free one) from a background thread."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, first_token_delay: float = 0.0,
+                 token_delay: float = 0.0, answer: str = CANNED_ANSWER, model: str = "fake",
+                 parallel: Optional[int] = None):
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.tokens: List[str] = _TOKEN.findall(answer)
+        self.model = model
+        self.requests = 0
+        self.loads = 0
+        self.connections = 0
+        self._slots = threading.BoundedSemaphore(parallel) if parallel else None
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllama":
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "FakeOllama":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _chunk(self, endpoint: str, text: str, done: bool) -> Dict:
+        chunk = {"model": self.model, "created_at": datetime.now(timezone.utc).isoformat(), "done": done}
+        if endpoint == "/api/chat":
+            chunk["message"] = {"role": "assistant", "content": text}
+        else:
+            chunk["response"] = text
+        if done:
+            chunk.update(done_reason="stop", eval_count=len(self.tokens), prompt_eval_count=0)
+        return chunk
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass  # one line per request would swamp benchmark output
+
+            def setup(self):
+                fake.connections += 1
+                super().setup()
+
+            def _send_json(self, body: Dict, status: int = 200):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send_json({"models": [{"name": fake.model, "model": fake.model}]})
+                elif self.path == "/api/version":
+                    self._send_json({"version": "0.0.0-fake"})
+                else:
+                    self._send_json({"error": "not found"}, 404)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path not in ("/api/chat", "/api/generate"):
+                    self._send_json({"error": "not found"}, 404)
+                    return
+                if not body.get("messages", body.get("prompt")):
+                    fake.loads += 1
+                    chunk = fake._chunk(self.path, "", done=True)
+                    chunk.update(done_reason="load", eval_count=0)
+                    self._send_json(chunk)
+                    return
+                fake.requests += 1
+                with fake._slots or nullcontext():
+                    self._generate(body)
+
+            def _generate(self, body: Dict):
+                time.sleep(fake.first_token_delay)
+                if not body.get("stream", True):
+                    time.sleep(fake.token_delay * max(len(fake.tokens) - 1, 0))
+                    self._send_json(fake._chunk(self.path, "".join(fake.tokens), done=True))
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i, token in enumerate(fake.tokens):
+                    if i:
+                        time.sleep(fake.token_delay)
+                    self._write_chunk(fake._chunk(self.path, token, done=False))
+                self._write_chunk(fake._chunk(self.path, "", done=True))
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _write_chunk(self, part: Dict):
+                data = (json.dumps(part) + "\n").encode("utf-8")
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve canned answers on the Ollama API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--first-token-delay", type=float, default=0.0, help="seconds before the first chunk")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="seconds between later chunks")
+    parser.add_argument("--parallel", type=int, help="generations served at once (default: unlimited)")
+    args = parser.parse_args()
+
+    fake = FakeOllama(args.host, args.port, args.first_token_delay, args.token_delay, parallel=args.parallel).start()
+    print(f"Fake Ollama listening on {fake.url}")
+    try:
+        fake._thread.join()
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
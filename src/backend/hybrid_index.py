@@ -0,0 +1,284 @@
+"""
+Structured side index for hybrid retrieval.
+
+The parsers copy fields such as level, pod, status, ip and event into each
+Document's metadata; this index keeps them column-wise as postings lists per field value, alongside a
+BM25 keyword index over the chunk text. At query time, field filters found in
+the question (an ERROR level, a status code, a known pod name, an IP) shrink
+the candidate set first, vector search then runs only over the survivors, and
+the two rankings are fused with reciprocal rank fusion. A timestamp column
+lets the same candidate selection honour a query's time range.
+
+Documents are numbered with dense ordinals in insertion order, so every
+postings list is an ascending array and deletions are tombstones. Once a
+quarter of the documents are tombstones, the next save renumbers the rest.
+"""
+import re
+import math
+import threading
+from array import array
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+import numpy as np
+from langchain_core.documents import Document
+
+from config import REDACT_AT_INGEST
+from journaled import Journaled, load_journaled
+from log_parser import INDEXED_FIELDS
+from security import ip_token
+from time_range import TimeRange
+
+LEVEL_ALIASES = {
+    "error": "error", "errors": "error", "err": "error",
+    "warn": "warn", "warning": "warn", "warnings": "warn",
+    "info": "info", "debug": "debug",
+    "critical": "critical", "fatal": "fatal",
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9_\-./:]*[a-z0-9]|[a-z0-9]")
+STATUS_PATTERN = re.compile(r"\b([1-5])(\d\d|xx)\b", re.IGNORECASE)
+IP_PATTERN = re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}\b")
+
+# Share of documents tombstoned at which the next save renumbers the survivors.
+COMPACT_TOMBSTONES = 0.25
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def _intersect(a: Sequence[int], b: Sequence[int]) -> List[int]:
+    """Intersects two ascending ordinal lists."""
+    if len(a) > len(b):
+        a, b = b, a
+    b_set = set(b)
+    return [x for x in a if x in b_set]
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[str]], k: int = 60) -> List[str]:
+    """Merges ranked ID lists: each list contributes 1 / (k + rank) per ID."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class FieldIndex(Journaled):
+    """Postings lists per field value plus a BM25 keyword index, keyed by docstore ID."""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_ids: List[str] = []
+        self.ordinals: Dict[str, int] = {}
+        self.alive = bytearray()
+        self.doc_lengths = array("I")
+        self.total_length = 0
+        self.live_count = 0
+        self.timestamps = array("d")  # epoch seconds, NaN when unknown
+        # Newest indexed entry time, as written in the logs; anchors relative time ranges.
+        self.latest: Optional[str] = None
+        self._latest_epoch = -math.inf
+        self.fields: Dict[str, Dict[str, array]] = {field: {} for field in INDEXED_FIELDS}
+        self.term_docs: Dict[str, array] = {}
+        self.term_freqs: Dict[str, array] = {}
+        self._lock = threading.RLock()
+        self._init_journal()
+
+    def __len__(self) -> int:
+        return self.live_count
+
+    def __getstate__(self):
+        state = self._journal_state(self.__dict__.copy())
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+        self._init_journal()
+
+    def _apply(self, op):
+        if op[0] == "add":
+            self.add(op[1], op[2])
+        else:
+            self.remove(op[1])
+
+    def _needs_compaction(self) -> bool:
+        return len(self.doc_ids) - self.live_count > COMPACT_TOMBSTONES * len(self.doc_ids)
+
+    def _compact(self):
+        """Drops tombstoned documents and renumbers the rest in order, so postings stay ascending."""
+        alive = np.frombuffer(self.alive, dtype=np.uint8).astype(bool)
+        renumbered = np.cumsum(alive, dtype=np.int64) - 1
+
+        def compacted(postings: Dict[str, array], values: Optional[Dict[str, array]] = None):
+            for key in list(postings):
+                ordinals = np.frombuffer(postings[key], dtype=np.uint32)
+                keep = alive[ordinals]
+                if not keep.any():
+                    del postings[key]
+                    if values is not None:
+                        del values[key]
+                    continue
+                postings[key] = array("I", renumbered[ordinals[keep]].astype(np.uint32).tobytes())
+                if values is not None:
+                    values[key] = array(values[key].typecode, np.frombuffer(values[key], dtype=np.uint16)[keep].tobytes())
+
+        for postings in self.fields.values():
+            compacted(postings)
+        compacted(self.term_docs, self.term_freqs)
+        self.doc_ids = [doc_id for doc_id, live in zip(self.doc_ids, alive) if live]
+        self.ordinals = {doc_id: ordinal for ordinal, doc_id in enumerate(self.doc_ids)}
+        self.alive = bytearray(b"\x01" * len(self.doc_ids))
+        self.doc_lengths = array("I", np.frombuffer(self.doc_lengths, dtype=np.uint32)[alive].tobytes())
+        self.timestamps = array("d", np.frombuffer(self.timestamps, dtype=np.float64)[alive].tobytes())
+
+    # --- Maintenance ---
+
+    def add(self, ids: Sequence[str], docs: Sequence[Document]):
+        with self._lock:
+            self._record(("add", list(ids), list(docs)))
+            for doc_id, doc in zip(ids, docs):
+                ordinal = len(self.doc_ids)
+                self.doc_ids.append(doc_id)
+                self.ordinals[doc_id] = ordinal
+                self.alive.append(1)
+                self.live_count += 1
+
+                for field in INDEXED_FIELDS:
+                    value = doc.metadata.get(field)
+                    if value is None:
+                        continue
+                    # A window of several entries lists each of its distinct values.
+                    for v in value if isinstance(value, list) else (value,):
+                        self.fields[field].setdefault(str(v).lower(), array("I")).append(ordinal)
+                ts = doc.metadata.get("timestamp")
+                epoch = datetime.fromisoformat(ts).timestamp() if ts else math.nan
+                self.timestamps.append(epoch)
+                if epoch > self._latest_epoch:
+                    self.latest, self._latest_epoch = ts, epoch
+
+                terms = Counter(tokenize(doc.page_content))
+                length = sum(terms.values())
+                self.doc_lengths.append(length)
+                self.total_length += length
+                for term, freq in terms.items():
+                    self.term_docs.setdefault(term, array("I")).append(ordinal)
+                    self.term_freqs.setdefault(term, array("H")).append(min(freq, 65535))
+
+    def remove(self, ids: Iterable[str]):
+        """Tombstones documents; their postings are skipped from then on."""
+        ids = list(ids)
+        with self._lock:
+            self._record(("remove", ids))
+            for doc_id in ids:
+                ordinal = self.ordinals.pop(doc_id, None)
+                if ordinal is not None and self.alive[ordinal]:
+                    self.alive[ordinal] = 0
+                    self.live_count -= 1
+                    self.total_length -= self.doc_lengths[ordinal]
+
+    # --- Querying ---
+
+    def extract_filters(self, query: str) -> Dict[str, Set[str]]:
+        """
+        Finds field constraints mentioned in a question: log levels, status codes
+        (including '5xx' style classes), IP addresses, and exact known values of
+        the other fields (pod names, events, ...).
+        """
+        filters: Dict[str, Set[str]] = {}
+        tokens = tokenize(query)
+
+        levels = {LEVEL_ALIASES[t] for t in tokens if t in LEVEL_ALIASES}
+        levels = {level for level in levels if level in self.fields["level"]}
+        if levels:
+            filters["level"] = levels
+
+        statuses = set()
+        for klass, rest in STATUS_PATTERN.findall(query):
+            if rest.lower() == "xx":
+                statuses.update(v for v in self.fields["status"] if v.startswith(klass))
+            elif klass + rest in self.fields["status"]:
+                statuses.add(klass + rest)
+        if statuses:
+            filters["status"] = statuses
+
+        ips = IP_PATTERN.findall(query)
+        if REDACT_AT_INGEST:
+            # Indexed IPs are keyed tokens; look the question's IPs up the same way.
+            ips = [ip_token(ip) for ip in ips]
+        ips = {ip for ip in ips if ip in self.fields["ip"]}
+        if ips:
+            filters["ip"] = ips
+
+        for field in ("pod", "event", "reason", "node"):
+            values = {t for t in tokens if t in self.fields[field]}
+            if values:
+                filters[field] = values
+        return filters
+
+    def reference_time(self) -> Optional[datetime]:
+        """The newest indexed timestamp (in the logs' own timezone), or None if nothing is dated."""
+        return datetime.fromisoformat(self.latest) if self.latest else None
+
+    def candidates(self, filters: Dict[str, Set[str]], time_range: Optional[TimeRange] = None) -> List[int]:
+        """
+        Ordinals of live documents matching every field (any of the values within
+        a field) and, if given, timestamped within `time_range`.
+        """
+        with self._lock:
+            if time_range is not None:
+                ts = np.frombuffer(self.timestamps, dtype=np.float64)
+                alive = np.frombuffer(self.alive, dtype=np.uint8).astype(bool)
+                # NaN (undated) compares false, so undated entries never match a range.
+                in_range = alive & (ts >= time_range[0]) & (ts <= time_range[1])
+                if not filters:
+                    return np.flatnonzero(in_range).tolist()
+
+            result: Optional[List[int]] = None
+            # Start from the most selective field to keep intersections small.
+            unions = []
+            for field, values in filters.items():
+                postings = set()
+                for value in values:
+                    postings.update(self.fields[field].get(value, ()))
+                unions.append(sorted(postings))
+            for postings in sorted(unions, key=len):
+                result = postings if result is None else _intersect(result, postings)
+                if not result:
+                    return []
+            if time_range is not None:
+                return [o for o in (result or []) if in_range[o]]
+            return [o for o in (result or []) if self.alive[o]]
+
+    def bm25(self, query: str, limit: int, candidates: Optional[Sequence[int]] = None) -> List[str]:
+        """Top `limit` docstore IDs by BM25 score, optionally restricted to `candidates`."""
+        with self._lock:
+            if not self.live_count:
+                return []
+            allowed = set(candidates) if candidates is not None else None
+            avg_length = self.total_length / self.live_count or 1.0
+            scores: Dict[int, float] = {}
+            for term in set(tokenize(query)):
+                docs = self.term_docs.get(term)
+                if docs is None:
+                    continue
+                idf = math.log(1 + (self.live_count - len(docs) + 0.5) / (len(docs) + 0.5))
+                for ordinal, freq in zip(docs, self.term_freqs[term]):
+                    if not self.alive[ordinal] or (allowed is not None and ordinal not in allowed):
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[ordinal] / avg_length)
+                    scores[ordinal] = scores.get(ordinal, 0.0) + idf * freq * (self.k1 + 1) / (freq + norm)
+            best = sorted(scores, key=scores.get, reverse=True)[:limit]
+            return [self.doc_ids[o] for o in best]
+
+    def ids_for(self, ordinals: Iterable[int]) -> List[str]:
+        return [self.doc_ids[o] for o in ordinals]
+
+    @staticmethod
+    def load(path: str) -> "FieldIndex":
+        return load_journaled(path)
@@ -0,0 +1,107 @@
+"""
+Recall@k and latency comparison of FAISS index types on our own vectors.
+
+Vectors are read from the saved vector store, a sample is held out as queries,
+and each candidate index type is built (and trained) on the rest. Results are
+compared with exact flat search, reporting recall@k, query latency, build time
+and index size, so the memory/recall trade-off behind INDEX_FACTORY can be
+chosen on evidence.
+
+Usage (from src/backend):
+    python index_eval.py
+    python index_eval.py --factories Flat "IVF1024,Flat" "IVF1024,PQ48" HNSW32 SQ8 --k 10
+"""
+import argparse
+import math
+import os
+import time
+from typing import Dict, List
+
+import faiss
+import numpy as np
+
+from ann_index import build_index, index_bytes, reconstruct_all, search_parameters
+from config import VECTOR_STORE_PATH, INDEX_NPROBE, INDEX_EF_SEARCH, INDEX_TRAIN_SAMPLE
+from sharded_store import SHARDS_DIR
+
+
+def load_vectors(store_path: str, limit: int, seed: int = 0) -> np.ndarray:
+    """Reads up to `limit` vectors from every shard of a saved store."""
+    shards_dir = os.path.join(store_path, SHARDS_DIR)
+    parts = []
+    for name in sorted(os.listdir(shards_dir)):
+        index = faiss.read_index(os.path.join(shards_dir, name, "index.faiss"))
+        if not isinstance(faiss.downcast_index(index), faiss.IndexFlat):
+            print(f"Note: shard {name} is not a flat index; its vectors are approximate.")
+        parts.append(reconstruct_all(index))
+    vectors = np.concatenate(parts) if parts else np.empty((0, 0), dtype=np.float32)
+    if len(vectors) > limit:
+        vectors = vectors[np.random.default_rng(seed).choice(len(vectors), limit, replace=False)]
+    return np.ascontiguousarray(vectors, dtype=np.float32)
+
+
+def default_factories(count: int, dim: int) -> List[str]:
+    """Flat, IVF-Flat, IVF-PQ, HNSW and SQ8 with sizes suited to `count` vectors."""
+    nlist = max(1, 2 ** round(math.log2(max(1.0, 4 * math.sqrt(count)))))
+    m = next(m for m in (dim // 8, dim // 4, dim // 2, dim) if m and dim % m == 0)
+    return ["Flat", f"IVF{nlist},Flat", f"IVF{nlist},PQ{m}", "HNSW32", "SQ8"]
+
+
+def evaluate(base: np.ndarray, queries: np.ndarray, factory: str, k: int,
+             nprobe: int, ef_search: int, train_sample: int) -> Dict:
+    """Builds one index type over `base` and measures it against exact search."""
+    exact = faiss.IndexFlatL2(base.shape[1])
+    exact.add(base)
+    _, truth = exact.search(queries, k)
+
+    started = time.perf_counter()
+    index = build_index(factory, base, train_sample)
+    build_seconds = time.perf_counter() - started
+
+    params = search_parameters(index, nprobe, ef_search)
+    latencies, hits = [], 0
+    for i in range(len(queries)):
+        started = time.perf_counter()
+        _, found = index.search(queries[i:i + 1], k, params=params)
+        latencies.append(time.perf_counter() - started)
+        hits += len(set(found[0]) & set(truth[i]))
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "factory": factory,
+        "recall": hits / (len(queries) * k),
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "build_s": build_seconds,
+        "bytes": index_bytes(index),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare FAISS index types against exact search on the saved vectors.")
+    parser.add_argument("--store", default=VECTOR_STORE_PATH, help="vector store directory")
+    parser.add_argument("--factories", nargs="+", help="FAISS index_factory strings (default: a size-based set)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200, help="vectors held out as queries")
+    parser.add_argument("--limit", type=int, default=1_000_000, help="max vectors to load")
+    parser.add_argument("--nprobe", type=int, default=INDEX_NPROBE)
+    parser.add_argument("--ef-search", type=int, default=INDEX_EF_SEARCH)
+    parser.add_argument("--train-sample", type=int, default=INDEX_TRAIN_SAMPLE)
+    args = parser.parse_args()
+
+    vectors = load_vectors(args.store, args.limit)
+    if len(vectors) <= args.queries:
+        raise SystemExit(f"Only {len(vectors)} vectors in {args.store}; need more than --queries ({args.queries}).")
+    queries, base = vectors[:args.queries], vectors[args.queries:]
+    factories = args.factories or default_factories(len(base), base.shape[1])
+    print(f"Evaluating on {len(base)} vectors ({base.shape[1]} dims), {len(queries)} queries, k={args.k}\n")
+
+    print(f"{'index':<20} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8} {'build s':>8} {'size MB':>9}")
+    for factory in factories:
+        r = evaluate(base, queries, factory, args.k, args.nprobe, args.ef_search, args.train_sample)
+        print(f"{r['factory']:<20} {r['recall']:>9.3f} {r['p50_ms']:>8.3f} {r['p95_ms']:>8.3f} "
+              f"{r['build_s']:>8.2f} {r['bytes'] / 1e6:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Per-file ingestion manifest stored next to the vector store.
+
+For every source file it records the path, size, mtime and inode seen at the
+last ingestion, the byte offset (and next line number) parsing stopped at, and
+enough information to regenerate the IDs of the vectors the file produced, so
+that refreshes only parse appended data and rotated or truncated files can
+have their stale vectors removed by ID.
+"""
+import os
+import json
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from log_io import list_log_files
+
+MANIFEST_FILE = "manifest.json"
+
+
+class FileEntry:
+    """Ingestion state of a single log file."""
+
+    def __init__(self, path: str, inode: int = 0, size: int = 0, mtime: float = 0.0,
+                 offset: int = 0, unit: int = 1, key: Optional[str] = None, count: int = 0,
+                 tail_ids: Optional[List[str]] = None):
+        self.path = path
+        self.inode = inode
+        # Bytes of the file examined so far; the file has new data when it grows past this.
+        self.size = size
+        self.mtime = mtime
+        # Where the next parse resumes: byte offset and next line/block number.
+        self.offset = offset
+        self.unit = unit
+        # Vector IDs are "<key>-<n>" for n in range(count), so they never need to be stored.
+        self.key = key or uuid.uuid4().hex[:12]
+        self.count = count
+        # IDs of vectors built from an unterminated last line, replaced once the line is complete.
+        self.tail_ids = tail_ids or []
+
+    def new_ids(self, n: int) -> List[str]:
+        """Allocates IDs for `n` new vectors from this file."""
+        ids = [f"{self.key}-{i}" for i in range(self.count, self.count + n)]
+        self.count += n
+        return ids
+
+    def all_ids(self) -> List[str]:
+        """IDs of every vector this file has produced."""
+        return [f"{self.key}-{i}" for i in range(self.count)]
+
+    def reset(self) -> List[str]:
+        """Forgets everything ingested from the file and returns the IDs to delete."""
+        stale = self.all_ids()
+        self.size, self.offset, self.unit, self.count, self.tail_ids = 0, 0, 1, 0, []
+        return stale
+
+    def update_stat(self, st: os.stat_result):
+        self.inode = st.st_ino
+        self.mtime = st.st_mtime
+
+    def to_dict(self) -> Dict:
+        return {
+            "path": self.path, "inode": self.inode, "size": self.size, "mtime": self.mtime,
+            "offset": self.offset, "unit": self.unit, "key": self.key, "count": self.count,
+            "tail_ids": self.tail_ids,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "FileEntry":
+        return cls(**data)
+
+
+class ScanResult:
+    """Outcome of comparing the manifest with the files currently on disk."""
+
+    def __init__(self):
+        self.work: List[Tuple[FileEntry, int]] = []  # (entry, current size) for files with new data
+        self.stale_ids: List[str] = []
+        self.dropped_keys: List[str] = []  # files whose earlier entries no longer count (removed or truncated)
+        self.new_files = 0
+        self.rotated_files = 0
+        self.removed_files = 0
+
+
+class IngestManifest:
+    """The set of FileEntry records for a vector store, persisted as JSON."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, FileEntry] = {}
+
+    @classmethod
+    def load(cls, path: str) -> "IngestManifest":
+        manifest = cls(path)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            manifest.entries = {e["path"]: FileEntry.from_dict(e) for e in data.get("files", [])}
+        return manifest
+
+    def save(self):
+        """Writes the manifest atomically, so a crash never leaves it half-written."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"files": [e.to_dict() for e in self.entries.values()]}, f)
+        os.replace(tmp_path, self.path)
+
+    def track(self, path: str) -> FileEntry:
+        """Returns the entry for `path`, creating a fresh one if the file is not tracked yet."""
+        entry = self.entries.get(path)
+        if entry is None:
+            entry = FileEntry(path)
+            entry.update_stat(os.stat(path))
+            self.entries[path] = entry
+        return entry
+
+    def scan(self, directory: str) -> ScanResult:
+        """
+        Compares the manifest with the files under `directory` and works out what
+        needs (re-)ingesting. Renamed files are matched by inode; files that were
+        replaced, truncated or deleted have their vector IDs listed as stale.
+        """
+        result = ScanResult()
+
+        # Rotated files oldest first, so new files are ingested in log order.
+        current: Dict[str, os.stat_result] = {}
+        for file_path in list_log_files(directory):
+            try:
+                current[file_path] = os.stat(file_path)
+            except OSError as e:
+                print(f"Error processing file {file_path}: {e}")
+
+        # Entries whose path no longer holds the same file may have been renamed (rotated).
+        orphans: Dict[int, FileEntry] = {}
+        for path, entry in list(self.entries.items()):
+            st = current.get(path)
+            if st is None or st.st_ino != entry.inode:
+                del self.entries[path]
+                orphans[entry.inode] = entry
+
+        for path, st in current.items():
+            if path in self.entries:
+                continue
+            entry = orphans.pop(st.st_ino, None)
+            if entry is not None:
+                entry.path = path
+                result.rotated_files += 1
+            else:
+                entry = FileEntry(path)
+                result.new_files += 1
+            self.entries[path] = entry
+
+        for entry in orphans.values():
+            result.stale_ids.extend(entry.all_ids())
+            result.dropped_keys.append(entry.key)
+            result.removed_files += 1
+
+        for path, entry in self.entries.items():
+            st = current[path]
+            if st.st_size < entry.size:
+                # Truncated in place (e.g. copytruncate rotation): start over.
+                result.stale_ids.extend(entry.reset())
+                result.dropped_keys.append(entry.key)
+                result.rotated_files += 1
+            entry.update_stat(st)
+            if st.st_size > entry.size:
+                if entry.tail_ids:
+                    # The unterminated last line has grown; drop its vectors and re-parse it.
+                    result.stale_ids.extend(entry.tail_ids)
+                    entry.tail_ids = []
+                result.work.append((entry, st.st_size))
+
+        return result
@@ -0,0 +1,167 @@
+"""
+Incremental saving for the pickled side indexes (field index, rollups,
+template miner).
+
+Each is saved as a snapshot pickle plus a journal (`<path>.log`) of the
+operations applied since that snapshot. A save appends only the operations
+made since the previous save, and a save with none writes nothing, so the live
+saver's periodic saves cost I/O proportional to the new data rather than to
+the corpus. The snapshot is rewritten once the journal outgrows half of it.
+Loading replays the journal over the snapshot.
+
+The journal starts with the generation of the snapshot it belongs to, so a
+journal left over from an older snapshot (a crash between writing the two) is
+never replayed. A torn last operation is ignored on load and cut off by the
+next save.
+
+A process that only reads the index (a worker following another's saves)
+catches up with follow_journaled, which replays just the journal written since
+it last looked, and only reloads the snapshot once a new one has been written.
+
+Indexes with tombstones compact them when a snapshot is written, and force a
+snapshot once too much of them is dead; a journal only ever replays onto the
+snapshot it was started for, so renumbering then is safe.
+"""
+import os
+import pickle
+import uuid
+from typing import Any, List, Optional, Tuple
+
+# Operations kept in memory between saves; past this, the next save writes a
+# snapshot instead, so a large refresh doesn't hold a second copy of its input.
+MAX_PENDING_OPS = 100_000
+
+# Bookkeeping that describes the files, not the index; left out of snapshots.
+_JOURNAL_ATTRS = ("_journal_path", "_journal_bytes", "_snapshot_bytes", "_pending", "_replaying", "_overflow")
+
+
+class Journaled:
+    """
+    Mixin for a lock-guarded (`self._lock`), pickled index. Mutators call
+    `_record(op)` with a picklable operation, and `_apply(op)` replays it.
+    """
+
+    _generation: Optional[str] = None
+
+    def _init_journal(self):
+        self._journal_path: Optional[str] = None  # the snapshot this object was loaded from or saved to
+        self._journal_bytes = 0
+        self._snapshot_bytes = 0
+        self._pending: List[Any] = []
+        self._replaying = False
+        self._overflow = False
+
+    def _journal_state(self, state: dict) -> dict:
+        """Drops the bookkeeping attributes from a __getstate__ dict."""
+        for name in _JOURNAL_ATTRS:
+            state.pop(name, None)
+        return state
+
+    def _record(self, op):
+        # Nothing is journaled before the first save or load: the first save writes a snapshot.
+        if self._journal_path is None or self._replaying or self._overflow:
+            return
+        if len(self._pending) >= MAX_PENDING_OPS:
+            self._overflow, self._pending = True, []
+            return
+        self._pending.append(op)
+
+    def _apply(self, op):
+        raise NotImplementedError
+
+    def _needs_compaction(self) -> bool:
+        """Whether the next save should write a compacted snapshot; see _compact()."""
+        return False
+
+    def _compact(self):
+        """Drops dead entries before a snapshot is written. Journal replay never needs it."""
+
+    def save(self, path: str):
+        with self._lock:
+            log_path = path + ".log"
+            log_size = os.path.getsize(log_path) if os.path.exists(log_path) else -1
+            if (self._journal_path != path or self._overflow or log_size < self._journal_bytes
+                    or self._journal_bytes > self._snapshot_bytes // 2 or self._needs_compaction()):
+                self._write_snapshot(path)
+            elif self._pending:
+                data = b"".join(pickle.dumps(op, protocol=pickle.HIGHEST_PROTOCOL) for op in self._pending)
+                with open(log_path, "r+b") as f:
+                    f.seek(self._journal_bytes)
+                    f.truncate()
+                    f.write(data)
+                self._journal_bytes += len(data)
+                self._pending = []
+
+    def _write_snapshot(self, path: str):
+        if self._needs_compaction():
+            self._compact()
+        self._generation = uuid.uuid4().hex
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        with open(tmp, "wb") as f:
+            pickle.dump(self._generation, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path + ".log")
+        self._journal_path = path
+        self._snapshot_bytes = os.path.getsize(path)
+        self._journal_bytes = os.path.getsize(path + ".log")
+        self._pending, self._overflow = [], False
+
+
+def _replay(index, f) -> int:
+    """Applies the operations from `f` onwards; returns how many."""
+    applied = 0
+    index._replaying = True
+    try:
+        while True:
+            try:
+                op = pickle.load(f)
+            except Exception:  # EOFError at the end, anything else for a torn last operation
+                break
+            index._apply(op)
+            index._journal_bytes = f.tell()
+            applied += 1
+    finally:
+        index._replaying = False
+    return applied
+
+
+def load_journaled(path: str):
+    """Loads a snapshot saved by Journaled.save and replays its journal."""
+    with open(path, "rb") as f:
+        index = pickle.load(f)
+    index._journal_path = path
+    index._snapshot_bytes = os.path.getsize(path)
+    try:
+        with open(path + ".log", "rb") as f:
+            if index._generation is None or pickle.load(f) != index._generation:
+                raise FileNotFoundError(path + ".log")
+            index._journal_bytes = f.tell()
+            _replay(index, f)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        # A snapshot from before journaling, or a journal that isn't this snapshot's.
+        index._overflow = True
+    return index
+
+
+def follow_journaled(index, path: str) -> Tuple[Any, bool]:
+    """
+    Brings an index loaded from `path` up to date with later saves by another
+    process: replays the journal past what was already read, or loads the
+    snapshot again if a new one has been written. Returns the index (a new
+    object after a reload) and whether it changed. Only for indexes that are
+    not modified locally.
+    """
+    with index._lock:
+        try:
+            with open(path + ".log", "rb") as f:
+                if (index._journal_path == path and not index._overflow
+                        and index._generation is not None and pickle.load(f) == index._generation):
+                    f.seek(index._journal_bytes)
+                    return index, _replay(index, f) > 0
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            pass
+    if not os.path.exists(path):
+        return index, False
+    return load_journaled(path), True
@@ -0,0 +1,302 @@
+"""
+Live tail ingestion.
+
+A tailer thread polls the log directory through the ingestion manifest and
+parses appended lines with the regular parsers; an embedder thread drains
+them in micro-batches, flushed when a batch fills up or its oldest entry
+reaches the flush deadline. Only the final FAISS insert takes the index lock,
+so in-flight queries are never blocked behind embedding.
+
+The queue between the two threads is bounded: when embedding falls behind, the
+tailer blocks and unread data simply waits on disk (backpressure).
+
+With several uvicorn workers only one ingests, the holder of the store's
+ingestion lease (log_index.try_ingest_lease); the others run an IndexFollower,
+which catches up with each save of the ingesting worker (LogIndex.follow).
+"""
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from langchain_core.documents import Document
+
+from ingest_manifest import MANIFEST_FILE
+from log_index import LogIndex
+
+
+class _Stopped(Exception):
+    """Raised inside the tailer to abandon a scan when the ingestor is stopping."""
+
+
+class LiveIngestor:
+    """Background worker that keeps a LogIndex in sync with files as they are written."""
+
+    def __init__(self, index: LogIndex, poll_interval: float, batch_size: int,
+                 flush_seconds: float, queue_size: int, save_interval: float):
+        self.index = index
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.save_interval = save_interval
+        self.queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._tailer: Optional[threading.Thread] = None
+        self._embedder: Optional[threading.Thread] = None
+        # Set when a scan is abandoned mid-file; the in-memory manifest is then
+        # ahead of what was indexed, so it must not be saved.
+        self._aborted = False
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+        self._batch_ids: List[str] = []
+        self._batch_chunks: List[Document] = []
+        self._batch_started: Optional[float] = None
+
+        self.docs_read = 0
+        self.vectors_added = 0
+        self.vectors_removed = 0
+        self.lag_seconds = 0.0
+        self.backpressure_seconds = 0.0
+        self.backpressure_active = False
+        self.last_flush_at: Optional[float] = None
+
+    def start(self):
+        self._tailer = threading.Thread(target=self._tail_loop, name="live-tailer", daemon=True)
+        self._embedder = threading.Thread(target=self._embed_loop, name="live-embedder", daemon=True)
+        self._embedder.start()
+        self._tailer.start()
+        print(f"Live ingestion started (poll every {self.poll_interval}s, batches of {self.batch_size} "
+              f"or {self.flush_seconds}s, queue capacity {self.queue.maxsize}).")
+
+    def stop(self, timeout: float = 30.0):
+        """Stops both threads, flushing what was already read and saving if the state is consistent."""
+        self._stop.set()
+        self._wake.set()
+        for thread in (self._tailer, self._embedder):
+            if thread is not None:
+                thread.join(timeout)
+        if self._dirty and not self._aborted:
+            self.index.save_locked()
+        print("Live ingestion stopped.")
+
+    def wake(self):
+        """Triggers a scan now instead of waiting for the next poll."""
+        self._wake.set()
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        return {
+            "role": "ingestor",
+            "running": self._tailer is not None and self._tailer.is_alive(),
+            "queue_depth": self.queue.qsize(),
+            "queue_capacity": self.queue.maxsize,
+            "pending_batch": len(self._batch_ids),
+            "oldest_pending_seconds": (now - self._batch_started) if self._batch_started else 0.0,
+            "lag_seconds": self.lag_seconds,
+            "backpressure_active": self.backpressure_active,
+            "backpressure_seconds": self.backpressure_seconds,
+            "docs_read": self.docs_read,
+            "vectors_added": self.vectors_added,
+            "vectors_removed": self.vectors_removed,
+            "seconds_since_flush": (now - self.last_flush_at) if self.last_flush_at else None,
+        }
+
+    # --- Tailer ---
+
+    def _tail_loop(self):
+        while not self._stop.is_set():
+            try:
+                self._poll()
+            except _Stopped:
+                self._aborted = True
+                return
+            except Exception as e:
+                print(f"Live ingestion scan failed: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _poll(self):
+        with self.index.ingest_lock:
+            scan = self.index.manifest.scan(self.index.logs_directory)
+            self.index.rollups.drop(scan.dropped_keys)
+            if scan.stale_ids:
+                # Deletes travel through the queue so they can't overtake queued adds of the same IDs.
+                self._put(("delete", scan.stale_ids, None, time.monotonic()))
+
+            def emit(ids: List[str], chunks: List[Document]):
+                self.docs_read += 1
+                self._put(("add", ids, chunks, time.monotonic()))
+
+            for entry, size in scan.work:
+                try:
+                    self.index.ingest_file(entry, size, emit)
+                except _Stopped:
+                    raise
+                except Exception as e:
+                    print(f"Error processing file {entry.path}: {e}")
+
+    def _put(self, item):
+        try:
+            self.queue.put_nowait(item)
+            return
+        except queue.Full:
+            pass
+
+        self.backpressure_active = True
+        started = time.monotonic()
+        try:
+            while True:
+                if self._stop.is_set():
+                    raise _Stopped()
+                try:
+                    self.queue.put(item, timeout=0.5)
+                    return
+                except queue.Full:
+                    continue
+        finally:
+            self.backpressure_active = False
+            self.backpressure_seconds += time.monotonic() - started
+
+    # --- Embedder ---
+
+    def _embed_loop(self):
+        while True:
+            if self._batch_started is not None:
+                timeout = max(0.0, self.flush_seconds - (time.monotonic() - self._batch_started))
+            else:
+                timeout = 0.5
+            try:
+                kind, ids, chunks, enqueued_at = self.queue.get(timeout=timeout)
+                if kind == "delete":
+                    self._flush()
+                    self.vectors_removed += self.index.delete(ids)
+                    self._dirty = True
+                else:
+                    self._batch_ids.extend(ids)
+                    self._batch_chunks.extend(chunks)
+                    if self._batch_started is None:
+                        self._batch_started = enqueued_at
+            except queue.Empty:
+                pass
+
+            if self._batch_ids and (
+                len(self._batch_ids) >= self.batch_size
+                or time.monotonic() - self._batch_started >= self.flush_seconds
+            ):
+                self._flush()
+
+            if self._stop.is_set() and not (self._tailer and self._tailer.is_alive()) and self.queue.empty():
+                self._flush()
+                return
+            self._maybe_save()
+
+    def _flush(self):
+        if not self._batch_ids:
+            return
+        try:
+            vectors = self.index.embeddings.embed_documents([c.page_content for c in self._batch_chunks])
+            self.index.add_embedded(self._batch_ids, self._batch_chunks, vectors)
+        except Exception as e:
+            # Keep the batch and retry on the next pass rather than dropping data.
+            print(f"Live ingestion embedding failed, will retry: {e}")
+            time.sleep(1.0)
+            return
+
+        now = time.monotonic()
+        self.vectors_added += len(self._batch_ids)
+        self.lag_seconds = now - self._batch_started
+        self.last_flush_at = now
+        self._dirty = True
+        self._batch_ids, self._batch_chunks, self._batch_started = [], [], None
+
+    def _maybe_save(self):
+        """Saves store and manifest together, but only when everything read has been indexed."""
+        if not self._dirty or self._aborted:
+            return
+        if time.monotonic() - self._last_save < self.save_interval or self._batch_ids or not self.queue.empty():
+            return
+        # Holding the ingest lock means the tailer is between scans.
+        if not self.index.ingest_lock.acquire(blocking=False):
+            return
+        try:
+            if self.queue.empty():
+                self.index.save_locked()
+                self._dirty = False
+                self._last_save = time.monotonic()
+        finally:
+            self.index.ingest_lock.release()
+
+
+class IndexFollower:
+    """
+    Keeps a worker that doesn't ingest up to date: polls the saved manifest,
+    which is written last in every save, and calls `reload` (which catches up
+    with the save) when it changes.
+    Has the same start/stop/wake/stats interface as LiveIngestor.
+    """
+
+    def __init__(self, store_path: str, reload: Callable[[], object], poll_interval: float):
+        self.manifest_path = os.path.join(store_path, MANIFEST_FILE)
+        self.reload = reload
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._seen = self._mtime()
+        self.reloads = 0
+        self.last_reload_at: Optional[float] = None
+
+    def _mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.manifest_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="index-follower", daemon=True)
+        self._thread.start()
+        print("Another worker holds the ingestion lease; following its saves.")
+
+    def stop(self, timeout: float = 30.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def wake(self):
+        """Checks for a new save now instead of waiting for the next poll."""
+        self._wake.set()
+
+    def stats(self) -> Dict:
+        return {
+            "role": "follower",
+            "running": self._thread is not None and self._thread.is_alive(),
+            "reloads": self.reloads,
+            "seconds_since_reload": (time.monotonic() - self.last_reload_at) if self.last_reload_at else None,
+        }
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.check()
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def check(self) -> bool:
+        """Reloads if the store has been saved since the last check; returns whether it did."""
+        mtime = self._mtime()
+        if mtime is None or mtime == self._seen:
+            return False
+        try:
+            if self.reload() is False:
+                return False  # skipped (e.g. a reload already in progress); retried next poll
+        except Exception as e:
+            print(f"Following the ingesting worker failed, will retry: {e}")
+            return False
+        self._seen = mtime
+        self.reloads += 1
+        self.last_reload_at = time.monotonic()
+        return True
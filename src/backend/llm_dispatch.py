@@ -0,0 +1,165 @@
+"""
+Scheduling of LLM generations between the RAG pipeline and Ollama.
+
+Every async query reaches the model through one LLMDispatcher, which
+
+- runs at most `max_concurrency` generations at once and starts queued ones by
+  priority ("high", "normal", "low"), then earliest deadline. Set it to
+  Ollama's OLLAMA_NUM_PARALLEL: requests beyond that would only queue inside
+  Ollama, in arrival order;
+- coalesces identical prompts: while a generation is queued or running, a
+  request with the same prompt subscribes to it instead of starting another,
+  and receives the whole output, streamed from the first chunk;
+- bounds each request's wait by its deadline, and cancels a generation once
+  every request waiting on it has gone (disconnected or timed out), before it
+  starts if it is still queued.
+
+The connection pool and keep_alive of the underlying ChatOllama client are set
+up in llm_loader.py.
+"""
+import asyncio
+import heapq
+import itertools
+import math
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from metrics import LLM_COALESCED, LLM_GENERATIONS
+
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+
+class _Generation:
+    """One generation, queued or running, and the output it has produced so far."""
+
+    def __init__(self, key: str, prompt_value, rank: int):
+        self.key = key
+        self.prompt_value = prompt_value
+        self.rank = rank
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def publish(self, chunk: str = "", done: bool = False, error: Optional[BaseException] = None):
+        if chunk:
+            self.chunks.append(chunk)
+        if done:
+            self.done, self.error = True, error
+        # Wake everyone waiting on the current event; later waits use a fresh one.
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+
+class LLMDispatcher:
+    """Runs prompts on a LangChain chat model with priorities, deadlines and coalescing."""
+
+    def __init__(self, llm, max_concurrency: int, config: Optional[Dict] = None):
+        self.llm = llm
+        self.max_concurrency = max_concurrency
+        self.config = config or {}
+        # (rank, deadline, sequence, generation); entries for generations that
+        # already started or were abandoned are skipped when popped.
+        self._queue: List[Tuple[int, float, int, _Generation]] = []
+        self._pending: Dict[str, _Generation] = {}
+        self._sequence = itertools.count()
+        self.running = 0
+        self.generations = 0
+        self.coalesced = 0
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for generation in self._pending.values() if generation.task is None)
+
+    def stats(self) -> Dict[str, int]:
+        return {"running": self.running, "queued": self.queued, "max_concurrency": self.max_concurrency,
+                "generations": self.generations, "coalesced": self.coalesced}
+
+    async def generate(self, prompt_value, priority: str = "normal", deadline: Optional[float] = None) -> str:
+        """The full generated text for `prompt_value`; see stream()."""
+        return "".join([chunk async for chunk in self.stream(prompt_value, priority, deadline)])
+
+    async def stream(self, prompt_value, priority: str = "normal",
+                     deadline: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Yields the text generated for `prompt_value` as it arrives. `deadline`
+        is an event loop time (loop.time()); waiting past it raises TimeoutError.
+        Closing the iterator leaves the generation, cancelling it if no other
+        request is waiting on it.
+        """
+        loop = asyncio.get_running_loop()
+        rank = PRIORITIES[priority]
+        deadline = math.inf if deadline is None else deadline
+        key = prompt_value.to_string()
+        generation = self._pending.get(key)
+        if generation is None:
+            generation = self._pending[key] = _Generation(key, prompt_value, rank)
+            heapq.heappush(self._queue, (rank, deadline, next(self._sequence), generation))
+            self.generations += 1
+            LLM_GENERATIONS.inc()
+        else:
+            self.coalesced += 1
+            LLM_COALESCED.inc()
+            if generation.task is None and rank < generation.rank:
+                # A more urgent request joined a queued generation; requeue it at that priority.
+                generation.rank = rank
+                heapq.heappush(self._queue, (rank, deadline, next(self._sequence), generation))
+        generation.subscribers += 1
+        self._dispatch()
+
+        try:
+            position = 0
+            while True:
+                if position < len(generation.chunks):
+                    position += 1
+                    yield generation.chunks[position - 1]
+                    continue
+                if generation.done:
+                    if generation.error is not None:
+                        raise generation.error
+                    return
+                try:
+                    await asyncio.wait_for(generation._changed.wait(), max(deadline - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    raise TimeoutError("LLM request deadline passed.") from None
+        finally:
+            self._leave(generation)
+
+    def _leave(self, generation: _Generation):
+        generation.subscribers -= 1
+        if generation.subscribers or generation.done:
+            return
+        if generation.task is not None:
+            generation.task.cancel()
+        # Dropped at once, so an identical prompt arriving now starts afresh; a
+        # queued generation's heap entry is skipped when popped.
+        if self._pending.get(generation.key) is generation:
+            del self._pending[generation.key]
+
+    def _dispatch(self):
+        """Starts queued generations while there are free slots."""
+        while self.running < self.max_concurrency and self._queue:
+            *_, generation = heapq.heappop(self._queue)
+            if generation.task is not None or self._pending.get(generation.key) is not generation:
+                continue
+            self.running += 1
+            generation.task = asyncio.get_running_loop().create_task(self._run(generation))
+
+    async def _run(self, generation: _Generation):
+        error = None
+        try:
+            async for chunk in self.llm.astream(generation.prompt_value, self.config):
+                generation.publish(chunk.content)
+        except asyncio.CancelledError as e:
+            error = e
+            raise
+        except Exception as e:
+            error = e
+        finally:
+            self.running -= 1
+            # Later identical prompts start a new generation rather than reading a finished one.
+            if self._pending.get(generation.key) is generation:
+                del self._pending[generation.key]
+            generation.publish(done=True, error=error)
+            self._dispatch()
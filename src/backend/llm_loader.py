@@ -1,5 +1,13 @@
+import time
+import httpx
+import ollama
 from langchain_ollama import ChatOllama
-from config import OLLAMA_MODEL, OLLAMA_BASE_URL
+from config import (
+    OLLAMA_MODEL, OLLAMA_BASE_URL, OLLAMA_KEEP_ALIVE, EMBEDDING_MODEL_ID,
+    EMBEDDING_CACHE_ENABLED, EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES,
+    LLM_MAX_CONCURRENCY, LLM_KEEPALIVE_SECONDS,
+)
+from embedding_cache import CachedEmbeddings, EmbeddingCache
 
 def load_local_llm():
     """
@@ -17,7 +25,39 @@ def load_local_llm():
         top_p=0.9,
         num_predict=2048,  # Corresponds to max_new_tokens
         format="json",    # Enforce JSON output
+        keep_alive=int(OLLAMA_KEEP_ALIVE) if OLLAMA_KEEP_ALIVE.lstrip("-").isdigit() else OLLAMA_KEEP_ALIVE,
+        # Reuse open connections instead of reconnecting per query; the dispatcher
+        # never runs more than LLM_MAX_CONCURRENCY generations at once.
+        client_kwargs={"limits": httpx.Limits(max_connections=LLM_MAX_CONCURRENCY,
+                                              max_keepalive_connections=LLM_MAX_CONCURRENCY,
+                                              keepalive_expiry=LLM_KEEPALIVE_SECONDS)},
     )
 
     print("Ollama model loaded successfully.")
-    return llm
\ No newline at end of file
+    return llm
+
+def warm_llm(llm):
+    """
+    Loads the model into Ollama's memory ahead of the first query; a chat
+    request without messages only loads it (ChatOllama would discard that
+    reply, hence the plain client). Failures are reported, not raised.
+    """
+    started = time.perf_counter()
+    try:
+        ollama.Client(host=llm.base_url).chat(model=llm.model, messages=[], keep_alive=llm.keep_alive)
+        print(f"Ollama model loaded into memory in {time.perf_counter() - started:.1f}s.")
+    except Exception as e:
+        print(f"WARNING: Could not warm up the Ollama model: {e}")
+
+def load_embeddings():
+    """
+    Loads the embedding model, wrapped in the persistent embedding cache when enabled.
+    """
+    # Imported here: it pulls in torch, which loading the LLM client doesn't need.
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_ID)
+    if EMBEDDING_CACHE_ENABLED:
+        cache = EmbeddingCache(EMBEDDING_CACHE_PATH, EMBEDDING_MODEL_ID, EMBEDDING_CACHE_MAX_ENTRIES)
+        embeddings = CachedEmbeddings(embeddings, cache)
+    return embeddings
@@ -0,0 +1,564 @@
+"""
+The searchable log index: time-sharded FAISS vector stores plus the ingestion
+manifest that lets them be refreshed incrementally from the log directory, and
+a field and keyword side index used for hybrid retrieval. Entry content lives
+in a column-wise record store; the stored Documents only reference it. Every
+parsed entry is also counted into rollups that answer aggregation questions.
+"""
+import asyncio
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from typing import IO, Callable, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from config import (
+    LOGS_DIRECTORY, VECTOR_STORE_PATH, EMBEDDING_MODEL_ID, CHUNK_SIZE, CHUNK_OVERLAP, INGEST_BATCH_SIZE,
+    PARALLEL_BUILD, PARSE_WORKERS, EMBED_WORKERS, EMBED_BATCH_SIZE, SHARD_BYTES,
+    TEMPLATE_MINING_ENABLED, TEMPLATE_SIM_THRESHOLD, TEMPLATE_EXPAND_LIMIT,
+    HYBRID_SEARCH_ENABLED, HYBRID_FETCH_K, HYBRID_RRF_K, SHARD_GRANULARITY, SHARD_CACHE_SIZE,
+    INDEX_FACTORY, INDEX_TRAIN_MIN, INDEX_TRAIN_SAMPLE, INDEX_NPROBE, INDEX_EF_SEARCH, INDEX_MMAP,
+    ROLLUP_BUCKET_SECONDS, AGGREGATION_TOP_N, CHUNK_WINDOW_SECONDS, CHUNK_WINDOW_MAX_ENTRIES,
+)
+from chunking import LogChunker, merge_metadata
+from embedding_cache import CachedEmbeddings
+from hybrid_index import FieldIndex, reciprocal_rank_fusion
+from journaled import follow_journaled
+from ingest_manifest import MANIFEST_FILE, FileEntry, IngestManifest
+from log_io import compression_of
+from metrics import INGESTED_VECTORS, REMOVED_VECTORS, stage
+from log_parser import FORMATS, FilePosition, detect_file_format, indexed_metadata, iter_file_documents
+from parallel_build import build_vector_store_parallel
+from record_store import RECORDS_DIR, RecordStore
+from rollups import Rollups
+from sharded_store import SHARDS_DIR, ShardedVectorStore
+from template_miner import TemplateMiner
+from time_range import TimeRange, parse_time_range
+
+TEMPLATES_FILE = "templates.pkl"
+FIELDS_FILE = "fields.pkl"
+ROLLUPS_FILE = "rollups.pkl"
+
+# Metadata kept on stored Documents; everything else is in the record store.
+STORED_METADATA = ("source", "line", "block", "end_line", "end_block", "timestamp", "template_id")
+
+STORE_OPTIONS = dict(
+    index_factory=INDEX_FACTORY, train_min=INDEX_TRAIN_MIN, train_sample=INDEX_TRAIN_SAMPLE,
+    nprobe=INDEX_NPROBE, ef_search=INDEX_EF_SEARCH, mmap=INDEX_MMAP,
+)
+
+
+# Per store path: a thread lock and how deeply this process holds the file lock.
+_held_store_locks: Dict[str, List] = {}
+_held_store_locks_guard = threading.Lock()
+
+
+@contextmanager
+def _store_lock(store_path: str):
+    """
+    An exclusive lock on the store across processes (only across threads where
+    flock isn't available). Re-entrant within a process, so a save can take it
+    inside load_or_build.
+    """
+    with _held_store_locks_guard:
+        held = _held_store_locks.setdefault(store_path, [threading.RLock(), 0])
+    with held[0]:
+        held[1] += 1
+        try:
+            if held[1] > 1 or fcntl is None:
+                yield
+                return
+            os.makedirs(os.path.dirname(store_path) or ".", exist_ok=True)
+            with open(store_path + ".lock", "a") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+        finally:
+            held[1] -= 1
+
+
+def try_ingest_lease(store_path: str) -> Optional[IO]:
+    """
+    Takes the store's ingestion lease without waiting: an open lock file
+    (`<store>.ingest.lock`) held until it is closed or the process exits, or
+    None if another process holds it. Only the holder writes the store while
+    serving, so uvicorn workers never save over each other. Where flock isn't
+    available every process gets the lease.
+    """
+    os.makedirs(os.path.dirname(store_path) or ".", exist_ok=True)
+    f = open(store_path + ".ingest.lock", "a")
+    if fcntl is None:
+        return f
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+
+class LogIndex:
+    """Owns the vector stores under `store_path` and keeps them in sync with `logs_directory`."""
+
+    def __init__(self, embeddings, store_path: str = VECTOR_STORE_PATH, logs_directory: str = LOGS_DIRECTORY):
+        self.embeddings = embeddings
+        # Resolved once, so a store published by swapping a symlink (build_index.py)
+        # doesn't change under an index that is already open.
+        self.store_path = os.path.realpath(store_path)
+        self.logs_directory = logs_directory
+        self.store = ShardedVectorStore(self.store_path, embeddings, SHARD_GRANULARITY, SHARD_CACHE_SIZE, **STORE_OPTIONS)
+        self.manifest = IngestManifest.load(os.path.join(self.store_path, MANIFEST_FILE))
+        self.miner: Optional[TemplateMiner] = None
+        if TEMPLATE_MINING_ENABLED:
+            templates_path = os.path.join(self.store_path, TEMPLATES_FILE)
+            self.miner = TemplateMiner.load(templates_path) if os.path.exists(templates_path) else TemplateMiner(TEMPLATE_SIM_THRESHOLD)
+        self.fields = FieldIndex()
+        self.records = RecordStore()
+        self.rollups = Rollups(ROLLUP_BUCKET_SECONDS)
+        self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        # Template representatives stand for their own event type, so they are never windowed together.
+        self.chunker = LogChunker(self.text_splitter, CHUNK_SIZE, CHUNK_WINDOW_SECONDS,
+                                  1 if self.miner is not None else CHUNK_WINDOW_MAX_ENTRIES)
+        # `lock` guards the FAISS stores for the short add/delete/search steps;
+        # `ingest_lock` serialises whole scan-and-ingest passes over the manifest.
+        self.lock = threading.RLock()
+        self.ingest_lock = threading.Lock()
+        # Bumped whenever the searchable content changes; cached answers from older versions are stale.
+        self.version = 0
+
+    def load_or_build(self, refresh: bool = True):
+        """
+        Loads the saved store (optionally refreshing it with new log data) or
+        builds it from scratch. Processes sharing the store (uvicorn workers)
+        do this one at a time, so only the first builds or refreshes it and the
+        others load the result.
+        """
+        with _store_lock(self.store_path):
+            # Another process may have refreshed the store since this index was created.
+            self.manifest = IngestManifest.load(os.path.join(self.store_path, MANIFEST_FILE))
+            templates_path = os.path.join(self.store_path, TEMPLATES_FILE)
+            if self.miner is not None and os.path.exists(templates_path):
+                self.miner = TemplateMiner.load(templates_path)
+            self._load_or_build(refresh)
+
+    def _load_or_build(self, refresh: bool):
+        if ShardedVectorStore.exists(self.store_path):
+            print("Loading existing vector store...")
+            self.store = ShardedVectorStore.load(
+                self.store_path, self.embeddings, SHARD_GRANULARITY, SHARD_CACHE_SIZE, **STORE_OPTIONS
+            )
+            self.records = RecordStore.load(os.path.join(self.store_path, RECORDS_DIR))
+            self._load_fields()
+            self._load_rollups()
+            if not self.manifest.entries:
+                # Stores built before manifests existed: assume the current files are already indexed.
+                print("WARNING: No ingestion manifest found; treating current log files as already indexed.")
+                self.manifest.scan(self.logs_directory)
+                for entry in self.manifest.entries.values():
+                    entry.size = entry.offset = os.path.getsize(entry.path)
+                self.manifest.save()
+            elif refresh:
+                self.refresh()
+        else:
+            if os.path.exists(os.path.join(self.store_path, "index.faiss")):
+                print("Found a single-file vector store from before time sharding; rebuilding it.")
+            self.build()
+
+    def build(self, checkpoint_seconds: Optional[float] = None):
+        """
+        Builds a new store from every file in the log directory and saves it.
+        With `checkpoint_seconds`, progress is also saved at most that often, so
+        an interrupted build can be finished by loading the store and refreshing it.
+        """
+        print("Building new vector store...")
+        print(f"Loading logs from: {self.logs_directory}")
+        shutil.rmtree(os.path.join(self.store_path, SHARDS_DIR), ignore_errors=True)
+        shutil.rmtree(os.path.join(self.store_path, RECORDS_DIR), ignore_errors=True)
+        self.store = ShardedVectorStore(self.store_path, self.embeddings, SHARD_GRANULARITY, SHARD_CACHE_SIZE, **STORE_OPTIONS)
+        self.fields = FieldIndex()
+        self.records = RecordStore()
+        self.rollups = Rollups(ROLLUP_BUCKET_SECONDS)
+        self.manifest.entries = {}
+        if self.miner is not None:
+            self.miner = TemplateMiner(TEMPLATE_SIM_THRESHOLD)
+
+        if PARALLEL_BUILD:
+            build_vector_store_parallel(
+                self.logs_directory, self.embeddings, self.chunker, EMBEDDING_MODEL_ID,
+                PARSE_WORKERS, EMBED_WORKERS, EMBED_BATCH_SIZE, SHARD_BYTES, manifest=self.manifest,
+                add_embedded=self.add_embedded, select_documents=self.select_documents,
+                count_documents=self.count_documents,
+            )
+            if checkpoint_seconds is not None:
+                self.save()
+        # The serial path is an incremental refresh from an empty manifest; after a
+        # parallel build it only picks up unterminated last lines left out of the shards.
+        self.refresh(save=False, checkpoint_seconds=checkpoint_seconds)
+
+        if not len(self.store):
+            raise ValueError("No documents found in the log directory. Cannot build vector store.")
+        self.save()
+        print(f"Vector store built and saved to {self.store_path}")
+        self._report_cache()
+
+    def refresh(self, save: bool = True, checkpoint_seconds: Optional[float] = None) -> Dict[str, int]:
+        """
+        Ingests only what changed since the last run: appended lines and new files
+        are parsed and embedded, and vectors from rotated, truncated or deleted
+        files are removed by ID. Cost is proportional to the new data. With
+        `checkpoint_seconds`, the index is also saved at most that often after a
+        batch is added, when everything the manifest covers is in the store.
+        While serving, only the holder of the ingestion lease may call this.
+        """
+        with self.ingest_lock:
+            scan = self.manifest.scan(self.logs_directory)
+            removed = self.delete(scan.stale_ids)
+            self.rollups.drop(scan.dropped_keys)
+
+            pending: List[Tuple[str, Document]] = []
+            last_checkpoint = time.monotonic()
+
+            def emit(ids: List[str], chunks: List[Document]):
+                nonlocal last_checkpoint
+                pending.extend(zip(ids, chunks))
+                if len(pending) >= INGEST_BATCH_SIZE:
+                    self.add_chunks(pending)
+                    pending.clear()
+                    if checkpoint_seconds is not None and time.monotonic() - last_checkpoint >= checkpoint_seconds:
+                        self.save_locked()
+                        last_checkpoint = time.monotonic()
+                        print(f"Checkpoint saved: {len(self.store)} vectors.")
+
+            added = 0
+            for entry, size in scan.work:
+                try:
+                    added += self.ingest_file(entry, size, emit)
+                except Exception as e:
+                    print(f"Error processing file {entry.path}: {e}")
+            self.add_chunks(pending)
+
+            stats = {
+                "files_scanned": len(self.manifest.entries),
+                "files_updated": len(scan.work),
+                "new_files": scan.new_files,
+                "rotated_files": scan.rotated_files,
+                "removed_files": scan.removed_files,
+                "vectors_added": added,
+                "vectors_removed": removed,
+            }
+            if added or removed or scan.removed_files or scan.rotated_files:
+                print(f"Index refreshed: {added} vectors added, {removed} removed "
+                      f"({len(scan.work)} files updated, {scan.new_files} new, {scan.rotated_files} rotated, "
+                      f"{scan.removed_files} removed).")
+                if save:
+                    self._report_cache()
+                    self.save_locked()
+            return stats
+
+    def save(self):
+        """Persists the stores, then the manifest (a crash in between re-ingests rather than loses data)."""
+        if os.path.islink(self.store_path):
+            # Was a real directory when opened: build_index.py has since published a new build over it.
+            print(f"WARNING: {self.store_path} has been replaced by a published build; not saving over it.")
+            return
+        with self.lock:
+            # New records first, so a crash afterwards leaves only unreferenced ones; released
+            # records are compacted away only once the deletions that released them are saved.
+            records_path = os.path.join(self.store_path, RECORDS_DIR)
+            self.records.save(records_path, compact=False)
+            self.store.save()
+            self.records.save(records_path)
+            if self.miner is not None:
+                self.miner.save(os.path.join(self.store_path, TEMPLATES_FILE))
+            self.fields.save(os.path.join(self.store_path, FIELDS_FILE))
+            self.rollups.save(os.path.join(self.store_path, ROLLUPS_FILE))
+            self.manifest.save()
+
+    def save_locked(self):
+        """save() under the store lock, so other processes never load a half-written save."""
+        with _store_lock(self.store_path):
+            self.save()
+
+    def follow(self) -> bool:
+        """
+        Catches up with the latest save by the process holding the ingestion
+        lease, reading only what it changed: rewritten shards, appended records
+        and the side indexes' journal tails. Bumps `version` (and returns True)
+        only if the searchable content changed.
+        """
+        with _store_lock(self.store_path), self.lock:
+            self.manifest = IngestManifest.load(os.path.join(self.store_path, MANIFEST_FILE))
+            changed = self.store.follow()
+            changed = self.records.follow(os.path.join(self.store_path, RECORDS_DIR)) or changed
+            self.fields, fields_changed = follow_journaled(self.fields, os.path.join(self.store_path, FIELDS_FILE))
+            self.rollups, rollups_changed = follow_journaled(self.rollups, os.path.join(self.store_path, ROLLUPS_FILE))
+            if self.miner is not None:
+                self.miner, _ = follow_journaled(self.miner, os.path.join(self.store_path, TEMPLATES_FILE))
+            if changed or fields_changed or rollups_changed:
+                self.version += 1
+                return True
+            return False
+
+    def _load_fields(self):
+        """Loads the field index saved with the store, or rebuilds it from the docstores."""
+        fields_path = os.path.join(self.store_path, FIELDS_FILE)
+        if os.path.exists(fields_path):
+            self.fields = FieldIndex.load(fields_path)
+        else:
+            print("No field index found; rebuilding it from the vector store.")
+            self.fields = FieldIndex()
+            for doc_id, doc in self.store.iter_documents():
+                self.fields.add([doc_id], [self._hydrate(doc, with_fields=True)])
+
+    def _load_rollups(self):
+        """
+        Loads the rollups saved with the store, or recounts them from the stored
+        records; entries that template mining didn't embed are missed.
+        """
+        rollups_path = os.path.join(self.store_path, ROLLUPS_FILE)
+        if os.path.exists(rollups_path):
+            self.rollups = Rollups.load(rollups_path)
+            return
+        print("No rollups found; recounting them from the vector store. Rebuild the index for exact counts.")
+        self.rollups = Rollups(ROLLUP_BUCKET_SECONDS)
+        seen = set()
+        for doc_id, doc in self.store.iter_documents():
+            file_key = doc_id.rsplit("-", 1)[0]
+            entry = (file_key, doc.metadata.get("line", doc.metadata.get("block")))
+            if entry in seen:
+                continue  # a further piece of an entry too long for one chunk
+            seen.add(entry)
+            records = self._record_ids(doc)
+            if records is None:
+                self.rollups.add(file_key, doc.metadata)
+            for record_id in records or ():
+                self.rollups.add(file_key, {"timestamp": doc.metadata.get("timestamp"),
+                                            **indexed_metadata(self.records.as_dict(record_id))})
+
+    def count_documents(self, entry: FileEntry, docs: List[Document]):
+        """Counts parsed Documents of a file into the rollups, whether or not they get embedded."""
+        for doc in docs:
+            self.rollups.add(entry.key, doc.metadata)
+
+    def aggregate(self, question: str, time_range: Optional[TimeRange] = None) -> Optional[Dict]:
+        """Answers a count or top-N question from the rollups, or returns None if it isn't one."""
+        return self.rollups.answer(question, time_range, self.fields.reference_time(), AGGREGATION_TOP_N)
+
+    def select_documents(self, docs: List[Document]) -> List[Document]:
+        """
+        Decides which parsed Documents get embedded. With template mining on, only
+        the first entry of each log template is kept; the rest become occurrences.
+        """
+        if self.miner is None:
+            return docs
+        selected = []
+        for doc in docs:
+            template, needs_vector = self.miner.add(doc)
+            if needs_vector:
+                doc.metadata["template_id"] = template.id
+                selected.append(doc)
+        return selected
+
+    def describe_template(self, template_id: int) -> str:
+        """Expands a matched template into its occurrence count, time span and recent occurrences."""
+        return self.miner.describe(template_id, TEMPLATE_EXPAND_LIMIT)
+
+    def _report_cache(self):
+        """Prints and resets the embedding cache hit rate, when a cache is in use."""
+        if isinstance(self.embeddings, CachedEmbeddings):
+            print(self.embeddings.report())
+            self.embeddings.reset_stats()
+
+    def ingest_file(self, entry: FileEntry, size: int, emit: Callable[[List[str], List[Document]], None]) -> int:
+        """
+        Parses a file from its recorded position, passing each entry's vector IDs
+        and chunks to `emit`, and advances the manifest entry. Returns the number
+        of chunks emitted.
+        """
+        position = FilePosition(entry.offset, entry.unit)
+        # Where the current entry (and the one before it) started.
+        before = before_last = (position.offset, position.unit)
+        window: List[Document] = []
+        last_doc = None
+        added = 0
+
+        def flush(docs: List[Document], resume_at: Tuple[int, int]) -> List[str]:
+            nonlocal added
+            # Kept current so a checkpoint taken while these are emitted resumes after them.
+            entry.offset, entry.unit = resume_at
+            chunks = self.chunker.chunks(docs)
+            ids = entry.new_ids(len(chunks))
+            emit(ids, chunks)
+            added += len(chunks)
+            return ids
+
+        for doc in iter_file_documents(entry.path, os.path.basename(entry.path), position):
+            # Flushed first, so a checkpoint taken then hasn't counted or mined this entry yet.
+            if window and not self.chunker.fits(window, doc):
+                flush(window, before)
+                window = []
+            self.count_documents(entry, [doc])
+            last_doc = doc
+            if self.select_documents([doc]):
+                window.append(doc)
+            before_last, before = before, (position.offset, position.unit)
+
+        end = (position.offset, position.unit)
+        # Compressed files are tracked by their size on disk; offsets count decompressed bytes.
+        entry.size = size if compression_of(entry.path) else max(size, position.offset)
+
+        # An entry that ran to end-of-file without a terminator may still be being
+        # written; it gets its own chunks, resumed from and replaced next time.
+        tail = None
+        if window and window[-1] is last_doc and self._ends_unterminated(entry.path, position.offset):
+            tail = window.pop()
+        if window:
+            flush(window, before_last if tail is not None else end)
+        if tail is not None:
+            entry.tail_ids = flush([tail], end)
+            self.rollups.subtract(entry.key, tail.metadata)
+        entry.offset, entry.unit = before_last if tail is not None else end
+        return added
+
+    @staticmethod
+    def _ends_unterminated(path: str, offset: int) -> bool:
+        if compression_of(path):
+            return False  # archives are complete; a truncated stream already stops at a whole line
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() != offset:
+                return False
+            log_format = FORMATS.get(detect_file_format(path))
+            if log_format is not None and log_format.multiline:
+                return True  # a block is only complete once a blank line follows it
+            f.seek(offset - 1)
+            return f.read(1) != b"\n"
+
+    def add_chunks(self, pending: List[Tuple[str, Document]]):
+        """Embeds (id, chunk) pairs and adds them to the store."""
+        if not pending:
+            return
+        texts = [chunk.page_content for _, chunk in pending]
+        vectors = self.embeddings.embed_documents(texts)
+        self.add_embedded([doc_id for doc_id, _ in pending], [chunk for _, chunk in pending], vectors)
+
+    def add_embedded(self, ids: List[str], chunks: List[Document], vectors: List[List[float]]):
+        """Adds already-embedded chunks. Only this short step holds the store lock."""
+        with self.lock:
+            self.fields.add(ids, chunks)
+            self.store.add(ids, [self._stored(chunk) for chunk in chunks], vectors)
+            self.version += 1
+        INGESTED_VECTORS.inc(len(ids))
+
+    def _stored(self, chunk: Document) -> Document:
+        """
+        Moves a chunk's content into the record store, one record per line, leaving
+        a Document that references them (consecutive IDs: the first and a count).
+        """
+        metadata = {key: chunk.metadata[key] for key in STORED_METADATA if key in chunk.metadata}
+        lines = chunk.page_content.split("\n")
+        metadata["record"] = self.records.add(lines[0])
+        for line in lines[1:]:
+            self.records.add(line)
+        if len(lines) > 1:
+            metadata["records"] = len(lines)
+        return Document(page_content="", metadata=metadata)
+
+    @staticmethod
+    def _record_ids(doc: Document) -> Optional[range]:
+        record_id = doc.metadata.get("record")
+        return None if record_id is None else range(record_id, record_id + doc.metadata.get("records", 1))
+
+    def _hydrate(self, doc: Document, with_fields: bool = False) -> Document:
+        """
+        Restores a stored Document's content from its records; `with_fields` also
+        restores the indexed fields to its metadata. Documents from stores built
+        before the record store are returned as they are.
+        """
+        records = self._record_ids(doc)
+        if records is None:
+            return doc
+        metadata = dict(doc.metadata)
+        if with_fields:
+            fields = merge_metadata([indexed_metadata(self.records.as_dict(record_id)) for record_id in records])
+            fields.pop("timestamp", None)  # the window's own timestamp is already stored
+            metadata.update(fields)
+        return Document(page_content="\n".join(self.records.text(record_id) for record_id in records), metadata=metadata)
+
+    def delete(self, ids: List[str]) -> int:
+        """Removes the given vector IDs, ignoring any the store doesn't hold."""
+        with self.lock:
+            ids = [doc_id for doc_id in ids if doc_id in self.store]
+            if not ids:
+                return 0
+            docs = self.store.delete(ids)
+            for doc in docs:
+                self.records.release(self._record_ids(doc) or ())
+            self.fields.remove(ids)
+            self.version += 1
+            REMOVED_VECTORS.inc(len(ids))
+            if self.miner is not None:
+                # Let the next matching entry re-embed templates that lose their representative.
+                self.miner.mark_unindexed({d.metadata["template_id"] for d in docs if "template_id" in d.metadata})
+            return len(ids)
+
+    def search(self, query: str, k: int, time_range: Optional[TimeRange] = None,
+               embedding: Optional[List[float]] = None) -> List[Document]:
+        """
+        Returns the `k` chunks most relevant to `query`; safe to call while ingestion runs.
+        A time range (given, or parsed from the query) limits the search to the
+        time shards and entries it overlaps. With hybrid retrieval on, field
+        values named in the query (level, status, pod, IP, ...) first narrow the
+        candidates, then vector similarity and BM25 rankings are fused.
+        Pass `embedding` if the query was already embedded.
+        """
+        if embedding is None:
+            embedding = self.embeddings.embed_query(query)
+        return self.search_by_vector(query, embedding, k, time_range)
+
+    async def asearch(self, query: str, k: int, time_range: Optional[TimeRange] = None,
+                      embedding: Optional[List[float]] = None) -> List[Document]:
+        """Async search: embeds without blocking the event loop and runs the lookup in a worker thread."""
+        if embedding is None:
+            embedding = await self.embeddings.aembed_query(query)
+        return await asyncio.to_thread(self.search_by_vector, query, embedding, k, time_range)
+
+    def search_by_vector(self, query: str, embedding: List[float], k: int,
+                         time_range: Optional[TimeRange] = None) -> List[Document]:
+        """search() with the query already embedded; `query` is still used for filters and keywords."""
+        with stage("search"), self.lock:
+            if not len(self.store):
+                return []
+            if time_range is None:
+                reference = self.fields.reference_time()
+                time_range = parse_time_range(query, reference) if reference is not None else None
+
+            filters = self.fields.extract_filters(query) if HYBRID_SEARCH_ENABLED else {}
+            candidates = None
+            if filters or time_range is not None:
+                candidates = self.fields.candidates(filters, time_range)
+                if not candidates and filters:
+                    # A filter combination nothing matches falls back to the time range alone.
+                    candidates = self.fields.candidates({}, time_range) if time_range is not None else None
+                if candidates is not None and not candidates:
+                    return []
+
+            fetch_k = max(k, HYBRID_FETCH_K) if HYBRID_SEARCH_ENABLED else k
+            buckets = self.store.overlapping(*time_range) if time_range is not None else None
+            candidate_ids = self.fields.ids_for(candidates) if candidates is not None else None
+            rankings = [self.store.search(embedding, fetch_k, buckets, candidate_ids)]
+            if HYBRID_SEARCH_ENABLED:
+                rankings.append(self.fields.bm25(query, fetch_k, candidates))
+            ids = reciprocal_rank_fusion(rankings, HYBRID_RRF_K)[:k]
+            return [self._hydrate(doc) for doc in (self.store.get(doc_id) for doc_id in ids) if doc is not None]
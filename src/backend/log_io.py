@@ -0,0 +1,164 @@
+"""
+Reading log files: plain, compressed and rotated.
+
+Compressed files (gzip, bz2, xz and zstd, recognised by their magic bytes or
+suffix) are decompressed as a stream; offsets into them count decompressed
+bytes. Large plain files are scanned line by line through a memory map, so
+lines are read straight from the page cache without buffering copies of the
+file. Rotation chains (foo.log.2.gz, foo.log.1, foo.log) are listed oldest
+first.
+"""
+import bz2
+import io
+import lzma
+import mmap
+import os
+import re
+import shutil
+import subprocess
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+from config import LOG_MMAP_MIN_BYTES
+
+# Magic bytes first, since rotated archives aren't always named by codec.
+MAGIC = ((b"\x1f\x8b", "gzip"), (b"BZh", "bz2"), (b"\xfd7zXZ\x00", "xz"), (b"\x28\xb5\x2f\xfd", "zstd"))
+SUFFIXES = {".gz": "gzip", ".bz2": "bz2", ".xz": "xz", ".lzma": "xz", ".zst": "zstd", ".zstd": "zstd"}
+
+_ROTATION_INDEX = re.compile(r"^(.*)\.(\d+)$")
+
+
+def strip_compression_suffix(name: str) -> str:
+    root, ext = os.path.splitext(name)
+    return root if ext.lower() in SUFFIXES else name
+
+
+def compression_of(path: str) -> Optional[str]:
+    """The codec a file is compressed with, or None for plain files."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(6)
+    except OSError:
+        head = b""
+    for magic, codec in MAGIC:
+        if head.startswith(magic):
+            return codec
+    if head:
+        return None
+    return SUFFIXES.get(os.path.splitext(path)[1].lower())
+
+
+def _open_gzip(path: str) -> BinaryIO:
+    try:
+        from isal import igzip  # several times faster than zlib when installed
+        return igzip.open(path, "rb")
+    except ImportError:
+        import gzip
+        return gzip.open(path, "rb")
+
+
+def _open_zstd(path: str) -> BinaryIO:
+    try:
+        import zstandard
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True, closefd=True))
+    except ImportError:
+        pass
+    try:
+        from compression import zstd  # Python 3.14+
+        return zstd.open(path, "rb")
+    except ImportError:
+        pass
+    if shutil.which("zstd") is None:
+        raise OSError(f"Cannot read {path}: install the 'zstandard' package or the zstd command-line tool.")
+    process = subprocess.Popen(["zstd", "-dcq", path], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    return _ProcessReader(process)
+
+
+class _ProcessReader(io.BufferedReader):
+    """The stdout of a decompressing subprocess; closing it stops the process."""
+
+    def __init__(self, process: subprocess.Popen):
+        super().__init__(process.stdout)
+        self._process = process
+
+    def close(self):
+        if self._process.poll() is None:
+            self._process.kill()
+        super().close()
+        self._process.wait()
+
+
+OPENERS = {"gzip": _open_gzip, "bz2": lambda path: bz2.open(path, "rb"), "xz": lambda path: lzma.open(path, "rb"),
+           "zstd": _open_zstd}
+
+
+@contextmanager
+def open_log(path: str) -> Iterator[BinaryIO]:
+    """Opens a log file for binary reading, decompressing it if needed."""
+    codec = compression_of(path)
+    f = OPENERS[codec](path) if codec else open(path, "rb")
+    try:
+        yield f
+    finally:
+        f.close()
+
+
+def _skip(f: BinaryIO, count: int):
+    """Moves a stream forward; decompressing streams that can't seek are read through."""
+    try:
+        f.seek(count)
+    except (OSError, io.UnsupportedOperation):
+        while count > 0:
+            chunk = f.read(min(count, 1 << 20))
+            if not chunk:
+                break
+            count -= len(chunk)
+
+
+def iter_lines(path: str, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[str, int]]:
+    """
+    Yields (line, offset after the line) from byte offset `start`, stopping at
+    offset `end` if given. A compressed file that ends early (still being
+    written) stops at its last complete line.
+    """
+    codec = compression_of(path)
+    size = os.path.getsize(path)
+    if codec is None and size and size >= LOG_MMAP_MIN_BYTES:
+        if start >= size:
+            return
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            mm.seek(start)
+            yield from _iter_stream_lines(mm, start, end)
+        return
+
+    with open_log(path) as f:
+        try:
+            if start:
+                _skip(f, start)
+            yield from _iter_stream_lines(f, start, end)
+        except EOFError:
+            print(f"Note: {path} ends mid-stream; reading stopped at its last complete line.")
+
+
+def _iter_stream_lines(f, offset: int, end: Optional[int]) -> Iterator[Tuple[str, int]]:
+    for raw in iter(f.readline, b""):
+        if end is not None and offset >= end:
+            break
+        offset += len(raw)
+        yield raw.decode('utf-8', errors='ignore').rstrip('\r\n'), offset
+
+
+def rotation_key(path: str) -> Tuple[str, str, int]:
+    """Sort key placing the rotations of a log oldest first: foo.log.2.gz, foo.log.1, foo.log."""
+    directory, name = os.path.split(path)
+    name = strip_compression_suffix(name)
+    match = _ROTATION_INDEX.match(name)
+    if match:
+        return directory, match.group(1), -int(match.group(2))
+    return directory, name, 0
+
+
+def list_log_files(directory: str) -> List[str]:
+    """Every file under `directory`, with rotation chains in chronological order."""
+    paths = [os.path.join(root, file) for root, _, files in os.walk(directory) for file in files]
+    return sorted(paths, key=rotation_key)
@@ -1,9 +1,16 @@
 import os
 import json
 import re
-from typing import List, Dict, Any
+from datetime import datetime, timezone
+from itertools import islice
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional, Sequence, Tuple
 from langchain_core.documents import Document
 
+from config import PARSER_SNIFF_LINES, REDACT_AT_INGEST
+from log_io import iter_lines, list_log_files, open_log, strip_compression_suffix
+from record_store import flatten, render
+from security import default_redactor, ip_token
+
 # Regex for Apache log format
 APACHE_LOG_PATTERN = re.compile(
     r'(?P<ip>[\d\.]+) - - \[(?P<timestamp>.*?)\] "(?P<request>.*?)" (?P<status>\d{3}) (?P<size>\d+) "(?P<referrer>.*?)" "(?P<level>.*?)"'
@@ -70,78 +77,394 @@ def parse_pretty_log_block(block: str) -> Dict[str, Any]:
     return data if data else {"raw_log": block}
 
 
+# --- Fast parsers ---
+# str.split/partition versions of the regex parsers above for the common shape
+# of each format. They return exactly what the regex parser would, and hand any
+# line they can't vouch for to it. Key-value logs keep the regex parser:
+# KEYVAL_PATTERN.findall is a single linear scan that a Python token loop doesn't beat.
+
+def fast_parse_apache_log_line(line: str) -> Dict[str, Any]:
+    """parse_apache_log_line without regex for lines with no quotes inside the quoted fields."""
+    parts = line.split('"', 6)
+    if len(parts) == 7:
+        head, request, codes, referrer, gap, level, _ = parts
+        ip, sep, timestamp = head.partition(" - - [")
+        status, _, size = codes[1:-1].partition(" ")
+        if (sep and ip and not ip.strip("0123456789.") and timestamp.endswith("] ") and gap == " "
+                and codes[:1] == " " and codes[-1:] == " " and len(status) == 3 and status.isdecimal() and size.isdecimal()):
+            return {"ip": ip, "timestamp": timestamp[:-2], "request": request, "status": status,
+                    "size": size, "referrer": referrer, "level": level}
+    return parse_apache_log_line(line)
+
+
+def fast_parse_singleline_log_line(line: str) -> Dict[str, Any]:
+    """parse_singleline_log_line with the header split on "|" instead of SINGLELINE_PATTERN."""
+    if not line:
+        return {}
+    parts = line.split("|", 3)
+    if len(parts) < 4 or not parts[0] or not parts[1] or not parts[2]:
+        return parse_singleline_log_line(line)
+    data = {"timestamp": parts[0].strip(), "pod": parts[1].strip(), "level": parts[2].strip()}
+    data.update(KEYVAL_PATTERN.findall(parts[3]))
+    return data
+
+
+# Keys the parsers (and common JSON loggers) use for the event time.
+TIMESTAMP_KEYS = ("timestamp", "ts", "time", "@timestamp")
+
+def parse_timestamp(value: str) -> Optional[datetime]:
+    """
+    Parses the timestamp formats the parsers extract: ISO 8601 (singleline,
+    keyval, pretty and most JSON logs) and Apache's '12/Sep/2025:23:47:22 +0530'.
+    Naive timestamps are assumed to be UTC.
+    """
+    value = value.strip()
+    try:
+        ts = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            ts = datetime.strptime(value, "%d/%b/%Y:%H:%M:%S %z")
+        except ValueError:
+            return None
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+def extract_timestamp(parsed: Dict[str, Any]) -> Optional[datetime]:
+    """Returns the event time of a parsed log entry, if it has a recognisable one."""
+    for key in TIMESTAMP_KEYS:
+        value = parsed.get(key)
+        if isinstance(value, str):
+            ts = parse_timestamp(value)
+            if ts is not None:
+                return ts
+    return None
+
+
+# Parsed fields copied into Document metadata, where the hybrid retriever indexes them.
+INDEXED_FIELDS = ("level", "pod", "status", "ip", "event", "reason", "node")
+
+def indexed_metadata(parsed: Dict[str, Any]) -> Dict[str, Any]:
+    """Picks the filterable fields (and the normalised timestamp) out of a parsed entry."""
+    metadata = {key: str(parsed[key]).strip() for key in INDEXED_FIELDS if parsed.get(key) not in (None, "")}
+    ts = extract_timestamp(parsed)
+    if ts is not None:
+        metadata["timestamp"] = ts.isoformat()
+    return metadata
+
+
+def detect_format(file_name: str) -> str:
+    """Guesses the parser for a log file from its name alone; see detect_file_format."""
+    if file_name.endswith('.jsonl'):
+        return "jsonl"
+    if file_name.endswith('.apache') or "apache" in file_name:
+        return "apache"
+    if "pretty" in file_name:
+        return "pretty"
+    if "keyval" in file_name:
+        return "keyval"
+    if "singleline" in file_name:
+        return "singleline"
+    return "text"
+
+
+# --- Format registry ---
+
+class LogFormat:
+    """
+    A parseable log format: `parse` turns a line (or, for multiline formats, a
+    blank-line separated block) into a dict, or None to skip it; `sniff` says
+    whether a single line looks like this format. `sniff_sample`, if given,
+    must also accept the whole sample (blank lines included) for the format to
+    be picked by content, for formats a line-by-line check can't tell apart.
+    """
+
+    def __init__(self, name: str, parse: Callable[[str], Any], sniff: Callable[[str], bool], multiline: bool = False,
+                 sniff_sample: Optional[Callable[[Sequence[str]], bool]] = None):
+        self.name = name
+        self.parse = parse
+        self.sniff = sniff
+        self.multiline = multiline
+        self.sniff_sample = sniff_sample
+
+
+# In sniffing priority order: when formats match equally many lines, the earlier wins.
+FORMATS: Dict[str, LogFormat] = {}
+
+# Share of sniffed lines a format must match to be chosen.
+SNIFF_MIN_SHARE = 0.5
+
+
+def register_format(log_format: LogFormat):
+    """
+    Adds (or replaces) a format. Formats registered at import time of a module
+    the parse workers also import are available to parallel builds as well.
+    """
+    FORMATS[log_format.name] = log_format
+
+
+def _parse_json_line(line: str) -> Any:
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        return None
+
+
+def _sniff_json(line: str) -> bool:
+    return line.startswith("{") and isinstance(_parse_json_line(line), dict)
+
+
+def _sniff_apache(line: str) -> bool:
+    return "raw_log" not in fast_parse_apache_log_line(line)
+
+
+def _sniff_singleline(line: str) -> bool:
+    return line.count("|") >= 3 and "raw_log" not in fast_parse_singleline_log_line(line)
+
+
+def _sniff_pretty(line: str) -> bool:
+    key, sep, _ = line.partition(":")
+    return bool(sep) and key.isupper() and key.replace("_", "").isalpha()
+
+
+def _sniff_pretty_sample(sample: Sequence[str]) -> bool:
+    """
+    Python logging's `LEVEL:logger:msg` lines also start with an upper-case
+    key, so a pretty sample must hold several blank-line separated blocks, each
+    with distinct keys. The last block may be cut short by the sample size.
+    """
+    blocks = [
+        [line.partition(":")[0] for line in block.split("\n") if _sniff_pretty(line)]
+        for block in iter_pretty_blocks(sample)
+    ]
+    if len(blocks) < 2:
+        return False
+    if any(len(keys) != len(set(keys)) for keys in blocks):
+        return False
+    return all(len(keys) >= 2 for keys in blocks[:-1])
+
+
+def _sniff_keyval(line: str) -> bool:
+    return len(KEYVAL_PATTERN.findall(line)) >= 2
+
+
+register_format(LogFormat("jsonl", _parse_json_line, _sniff_json))
+register_format(LogFormat("apache", fast_parse_apache_log_line, _sniff_apache))
+register_format(LogFormat("singleline", fast_parse_singleline_log_line, _sniff_singleline))
+register_format(LogFormat("pretty", parse_pretty_log_block, _sniff_pretty, multiline=True,
+                          sniff_sample=_sniff_pretty_sample))
+register_format(LogFormat("keyval", parse_keyval_log_line, _sniff_keyval))
+
+
+def _sniff_share(log_format: LogFormat, lines: Sequence[str]) -> float:
+    """Share of the non-blank `lines` that look like `log_format`."""
+    lines = [line for line in lines if line.strip()]
+    if not lines:
+        return 0.0
+    return sum(1 for line in lines if log_format.sniff(line)) / len(lines)
+
+
+def sniff_format(lines: Sequence[str]) -> Optional[str]:
+    """Picks the registered format matching most of the given non-blank lines, or None if none fits."""
+    best, best_share = None, 0.0
+    for name, log_format in FORMATS.items():
+        share = _sniff_share(log_format, lines)
+        if share > best_share and (log_format.sniff_sample is None or log_format.sniff_sample(lines)):
+            best, best_share = name, share
+    return best if best_share >= SNIFF_MIN_SHARE else None
+
+
+def detect_file_format(file_path: str, file_name: Optional[str] = None) -> str:
+    """
+    Picks the parser for a log file by sniffing its first PARSER_SNIFF_LINES
+    lines, so rotated files like app-2025-09-13.log.1 keep their structure.
+    A format named in the file name (see detect_format) wins whenever most of
+    the sampled lines fit it; the content only decides for files whose name
+    says nothing or is contradicted. Files that can't be sniffed (empty or
+    unreadable) fall back to the name.
+    """
+    try:
+        with open_log(file_path) as f:
+            sample = [raw.decode('utf-8', errors='ignore').rstrip('\r\n') for raw in islice(f, PARSER_SNIFF_LINES)]
+    except (OSError, EOFError):
+        sample = []
+    hint = detect_format(strip_compression_suffix(file_name or os.path.basename(file_path)))
+    if not any(line.strip() for line in sample):
+        return hint
+    if hint in FORMATS and _sniff_share(FORMATS[hint], sample) >= SNIFF_MIN_SHARE:
+        return hint
+    return sniff_format(sample) or "text"
+
+
+class FilePosition:
+    """
+    Tracks how far a log file has been consumed: the byte offset just past the
+    last parsed entry and the number the next line (or pretty block) will get.
+    """
+
+    def __init__(self, offset: int = 0, unit: int = 1):
+        self.offset = offset
+        self.unit = unit
+
+    def __repr__(self) -> str:
+        return f"FilePosition(offset={self.offset}, unit={self.unit})"
+
+
+# A block is cut after this many lines, so a file without blank lines is
+# still read a bounded piece at a time.
+MAX_BLOCK_LINES = 200
+
+
+def _group_blocks(lines: Iterable[Tuple[str, int]]) -> Iterator[Tuple[str, int]]:
+    """
+    Groups (line, end offset) pairs into blank-line-delimited (block, end
+    offset) pairs of at most MAX_BLOCK_LINES lines.
+    """
+    block: List[str] = []
+    block_end = 0
+    for line, offset in lines:
+        if line.strip():
+            block.append(line)
+            block_end = offset
+            if len(block) >= MAX_BLOCK_LINES:
+                yield "\n".join(block), block_end
+                block = []
+        elif block:
+            yield "\n".join(block), block_end
+            block = []
+    if block:
+        yield "\n".join(block), block_end
+
+
+def iter_pretty_blocks(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Groups an iterable of lines into blank-line-delimited blocks without
+    reading the whole file into memory.
+    """
+    for block, _ in _group_blocks((line, 0) for line in lines):
+        yield block
+
+
+def _parse_line(fmt: str, line: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    Parses one line of a line-oriented format into Document content (the
+    one-line `key=value` rendering of its fields) and its indexed metadata
+    fields, or None to skip it.
+    """
+    log_format = FORMATS.get(fmt)
+    # Fallback: generic line-by-line parsing
+    if log_format is None:
+        line = line.strip()
+        return (line, {}) if line else None
+
+    parsed = log_format.parse(line)
+    if parsed is None:
+        return None
+    if not isinstance(parsed, dict):
+        return json.dumps(parsed), {}
+    return render(flatten(parsed).items()), indexed_metadata(parsed)
+
+
+def _redact_fields(fields: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Masks sensitive values in indexed metadata. The ip field becomes a keyed
+    token (see security.ip_token) so it can still be filtered on; timestamps
+    are left as is.
+    """
+    redacted = {}
+    for key, value in fields.items():
+        if key == "ip" and isinstance(value, str):
+            redacted[key] = ip_token(value)
+        elif isinstance(value, str) and key != "timestamp":
+            redacted[key] = default_redactor.redact(value)
+        else:
+            redacted[key] = value
+    return redacted
+
+
+def iter_file_documents(
+    file_path: str,
+    source: Optional[str] = None,
+    position: Optional[FilePosition] = None,
+    end: Optional[int] = None,
+) -> Iterator[Document]:
+    """
+    Lazily parses a single log file into LangChain Documents.
+    The file is read line by line, so memory use does not depend on file size.
+
+    Reading starts at `position` (the start of the file by default) and stops at
+    byte offset `end`, which must fall on a line boundary. `position` is advanced
+    as entries are consumed, so callers can resume from it later.
+
+    With REDACT_AT_INGEST, sensitive values are masked in both the content and
+    the metadata before the Document is created, so they never reach the
+    vector store or the LLM.
+    """
+    source = source or os.path.basename(file_path)
+    fmt = detect_file_format(file_path, source)
+    log_format = FORMATS.get(fmt)
+    position = position if position is not None else FilePosition()
+
+    lines = iter_lines(file_path, position.offset, end)
+
+    # Multi-line formats (e.g. pretty blocks starting with TIMESTAMP:)
+    if log_format is not None and log_format.multiline:
+        for block, offset in _group_blocks(lines):
+            unit = position.unit
+            position.offset, position.unit = offset, unit + 1
+            parsed = log_format.parse(block)
+            content, fields = render(flatten(parsed).items()), indexed_metadata(parsed)
+            if REDACT_AT_INGEST:
+                content, fields = default_redactor.redact(content), _redact_fields(fields)
+            yield Document(
+                page_content=content,
+                metadata={"source": source, "block": unit, **fields}
+            )
+        return
+
+    for line, offset in lines:
+        unit = position.unit
+        position.offset, position.unit = offset, unit + 1
+        result = _parse_line(fmt, line)
+        if result is not None:
+            content, fields = result
+            if REDACT_AT_INGEST:
+                content, fields = default_redactor.redact(content), _redact_fields(fields)
+            yield Document(
+                page_content=content,
+                metadata={"source": source, "line": unit, **fields}
+            )
+
+
+def iter_log_documents(directory: str) -> Iterator[Document]:
+    """
+    Walks a directory and lazily yields a Document per parsed log entry, taking
+    rotated files oldest first. Files that fail to read are reported and skipped.
+    """
+    for file_path in list_log_files(directory):
+        try:
+            yield from iter_file_documents(file_path, source=os.path.basename(file_path))
+        except Exception as e:
+            print(f"Error processing file {file_path}: {e}")
+
+
+def iter_document_batches(directory: str, batch_size: int) -> Iterator[List[Document]]:
+    """
+    Yields parsed Documents in lists of at most `batch_size`, so downstream
+    chunking and embedding can run with bounded memory.
+    """
+    batch: List[Document] = []
+    for doc in iter_log_documents(directory):
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
 def load_and_parse_logs(directory: str) -> List[Document]:
     """
     Loads and parses all log files from a directory, creating LangChain Documents.
-    Handles .jsonl, .apache, .log, and other formats gracefully.
-    """
-    documents = []
-    for root, _, files in os.walk(directory):
-        for file in files:
-            file_path = os.path.join(root, file)
-            try:
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
-
-                    # JSON Lines logs
-                    if file.endswith('.jsonl'):
-                        for i, line in enumerate(content.splitlines()):
-                            try:
-                                data = json.loads(line)
-                                documents.append(Document(
-                                    page_content=json.dumps(data, indent=2),
-                                    metadata={"source": file, "line": i + 1}
-                                ))
-                            except json.JSONDecodeError:
-                                continue
-
-                    # Apache logs
-                    elif file.endswith('.apache') or "apache" in file:
-                        for i, line in enumerate(content.splitlines()):
-                            parsed = parse_apache_log_line(line)
-                            documents.append(Document(
-                                page_content=json.dumps(parsed, indent=2),
-                                metadata={"source": file, "line": i + 1}
-                            ))
-
-                    # Pretty logs (multi-line blocks starting with TIMESTAMP:)
-                    elif "pretty" in file:
-                        blocks = re.split(r'\n\s*\n', content.strip())  # split by blank lines
-                        for i, block in enumerate(blocks):
-                            parsed = parse_pretty_log_block(block)
-                            documents.append(Document(
-                                page_content=json.dumps(parsed, indent=2),
-                                metadata={"source": file, "block": i + 1}
-                            ))
-
-                    # Key-value logs
-                    elif "keyval" in file:
-                        for i, line in enumerate(content.splitlines()):
-                            parsed = parse_keyval_log_line(line)
-                            documents.append(Document(
-                                page_content=json.dumps(parsed, indent=2),
-                                metadata={"source": file, "line": i + 1}
-                            ))
-
-                    # Single-line pipe logs
-                    elif "singleline" in file:
-                        for i, line in enumerate(content.splitlines()):
-                            parsed = parse_singleline_log_line(line)
-                            documents.append(Document(
-                                page_content=json.dumps(parsed, indent=2),
-                                metadata={"source": file, "line": i + 1}
-                            ))
-
-                    # Fallback: generic line-by-line parsing
-                    else:
-                        for i, line in enumerate(content.splitlines()):
-                            if line.strip():
-                                documents.append(Document(
-                                    page_content=line.strip(),
-                                    metadata={"source": file, "line": i + 1}
-                                ))
-
-            except Exception as e:
-                print(f"Error processing file {file_path}: {e}")
-
-    return documents
+    Handles .jsonl, .apache, .log, and other formats gracefully, compressed or not.
+    Prefer iter_log_documents / iter_document_batches for large corpora.
+    """
+    return list(iter_log_documents(directory))
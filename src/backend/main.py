@@ -1,11 +1,22 @@
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from contextlib import nullcontext
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+import asyncio
+import json
+import threading
+import time
 import uvicorn
 
 from schemas import QueryRequest, QueryResponse
-from llm_loader import load_local_llm
-from rag_pipeline import RAGPipeline
-from config import LOGS_DIRECTORY
+from time_range import explicit_time_range
+from concurrency import ClientDisconnected, QueryLimiter, QueryRejected, run_until_disconnect
+from metrics import INDEX_VECTORS, LLM_QUEUED, QUERIES_IN_FLIGHT, QUERIES_WAITING, profiled
+from config import (
+    LOGS_DIRECTORY, LIVE_INGEST_ENABLED, LIVE_POLL_INTERVAL, LIVE_BATCH_SIZE, LIVE_FLUSH_SECONDS,
+    LIVE_QUEUE_SIZE, LIVE_SAVE_INTERVAL, QUERY_MAX_CONCURRENCY, QUERY_MAX_WAITING, QUERY_TIMEOUT_SECONDS,
+    PROFILING_ENABLED, LLM_WARM_ON_STARTUP,
+)
 import os
 
 app = FastAPI(
@@ -14,14 +25,78 @@ app = FastAPI(
     version="1.0.0",
 )
 
-# This dictionary will hold our initialized RAG pipeline
+# This will hold our initialized RAG pipeline, once it has loaded in the background.
 app.state.rag_pipeline = None
+app.state.startup = {"state": "starting", "error": None}  # "starting", "ready" or "failed"
+app.state.live_ingestor = None
+app.state.ingest_lease = None  # held for the life of the process by the worker that ingests
+app.state.query_limiter = QueryLimiter(QUERY_MAX_CONCURRENCY, QUERY_MAX_WAITING)
+app.state.reload_lock = threading.Lock()
+
+# Read when /metrics is scraped.
+QUERIES_IN_FLIGHT.set_function(lambda: app.state.query_limiter.in_flight)
+QUERIES_WAITING.set_function(lambda: app.state.query_limiter.waiting)
+INDEX_VECTORS.set_function(lambda: len(app.state.rag_pipeline.index.store) if app.state.rag_pipeline else 0)
+LLM_QUEUED.set_function(lambda: app.state.rag_pipeline.dispatcher.queued if app.state.rag_pipeline else 0)
+
+def _start_live_ingestor():
+    """
+    Starts the worker's background index task on the pipeline's current index.
+    The worker holding the store's ingestion lease is the only one that ingests
+    (tailing the log directory when LIVE_INGEST_ENABLED, else on refresh); the
+    others follow its saves.
+    """
+    from live_ingest import IndexFollower, LiveIngestor
+    from log_index import try_ingest_lease
+
+    index = app.state.rag_pipeline.index
+    if app.state.ingest_lease is None:
+        app.state.ingest_lease = try_ingest_lease(index.store_path)
+    if app.state.ingest_lease is None:
+        app.state.live_ingestor = IndexFollower(index.store_path, _follow_reload, LIVE_POLL_INTERVAL)
+    elif LIVE_INGEST_ENABLED:
+        app.state.live_ingestor = LiveIngestor(
+            index, LIVE_POLL_INTERVAL, LIVE_BATCH_SIZE,
+            LIVE_FLUSH_SECONDS, LIVE_QUEUE_SIZE, LIVE_SAVE_INTERVAL,
+        )
+    else:
+        return
+    app.state.live_ingestor.start()
+
+def _follow_reload():
+    """Catches up with the ingesting worker's save; returns False if a reload is already running."""
+    if not app.state.reload_lock.acquire(blocking=False):
+        return False
+    try:
+        return app.state.rag_pipeline.follow_index()
+    finally:
+        app.state.reload_lock.release()
+
+def _load_pipeline():
+    """Loads the LLM client, embedding model and index; queries get 503 until this is done."""
+    started = time.perf_counter()
+    try:
+        # Imported here rather than at the top: LangChain, FAISS and the embedding
+        # model take seconds to load, and the server answers health checks meanwhile.
+        from llm_loader import load_local_llm, warm_llm
+        from rag_pipeline import RAGPipeline
+
+        llm = load_local_llm()
+        if LLM_WARM_ON_STARTUP:
+            warm_llm(llm)
+        app.state.rag_pipeline = RAGPipeline(llm=llm)
+        _start_live_ingestor()
+        app.state.startup = {"state": "ready", "error": None}
+        print(f"RAG pipeline initialized in {time.perf_counter() - started:.1f}s.")
+    except Exception as e:
+        app.state.startup = {"state": "failed", "error": str(e)}
+        print(f"RAG pipeline failed to initialize: {e}")
 
 @app.on_event("startup")
 def startup_event():
     """
-    On application startup, load the LLM and initialize the RAG pipeline.
-    This makes the first API call much faster.
+    On application startup, start loading the LLM and RAG pipeline in the
+    background, so the server accepts requests (and health checks) right away.
     """
     print("Application startup...")
     if not os.path.exists(LOGS_DIRECTORY) or not os.listdir(LOGS_DIRECTORY):
@@ -29,30 +104,216 @@ def startup_event():
         print("Please create it and add log files before querying.")
         # We can still start the server, but queries might fail until logs are added
         # and the vector store is built (which happens on the first query if the store is missing).
-    
-    llm = load_local_llm()
-    app.state.rag_pipeline = RAGPipeline(llm=llm)
-    print("RAG pipeline initialized.")
+
+    threading.Thread(target=_load_pipeline, name="pipeline-loader", daemon=True).start()
+
+def _require_pipeline():
+    """Raises 503 while the RAG pipeline is still loading, or if it failed to load."""
+    if app.state.rag_pipeline is None:
+        error = app.state.startup["error"]
+        detail = (f"RAG pipeline failed to initialize: {error}" if error
+                  else "RAG pipeline is not initialized. Please wait and try again.")
+        raise HTTPException(status_code=503, detail=detail, headers={"Retry-After": "5"})
+
+def _profiler(http_request: Request, label: str, on_report=None):
+    """A sampling profiler for requests sent with `X-Profile: 1` (when PROFILING_ENABLED), else a no-op."""
+    if PROFILING_ENABLED and http_request.headers.get("X-Profile") == "1":
+        return profiled(label, on_report)
+    return nullcontext()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    """Stops background ingestion, flushing and saving what it has already read."""
+    if app.state.live_ingestor is not None:
+        app.state.live_ingestor.stop()
 
 @app.post("/api/query", response_model=QueryResponse)
-async def handle_query(request: QueryRequest):
+async def handle_query(request: QueryRequest, http_request: Request):
     """
     Handles a user query by passing it to the RAG pipeline.
+    Runs fully async so slow generations never block other requests. Queries
+    beyond the concurrency limit wait for a slot; once the wait queue is full
+    they are rejected with 429. Each query has a deadline (504) and is cancelled
+    if the client disconnects. Count and top-N questions are answered from the
+    rollups without taking a slot. The LLM generation is scheduled at the
+    request's `priority` ("normal" by default).
     """
-    if app.state.rag_pipeline is None:
-        raise HTTPException(status_code=503, detail="RAG pipeline is not initialized. Please wait and try again.")
+    _require_pipeline()
     
     try:
-        result = app.state.rag_pipeline.query(request.query)
-        return JSONResponse(content=result)
+        time_range = explicit_time_range(request.start_time, request.end_time)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    reports = []
+    deadline = asyncio.get_running_loop().time() + QUERY_TIMEOUT_SECONDS
+    try:
+        with _profiler(http_request, "query", reports.append):
+            result = app.state.rag_pipeline.aggregate(request.query, time_range)
+            if result is None:
+                async with asyncio.timeout(QUERY_TIMEOUT_SECONDS):
+                    async with app.state.query_limiter.slot():
+                        result = await run_until_disconnect(
+                            app.state.rag_pipeline.aquery(request.query, time_range, request.priority or "normal", deadline),
+                            http_request.is_disconnected,
+                        )
+        return JSONResponse(content=result, headers={"X-Profile-Report": os.path.basename(reports[0])} if reports else None)
+    except QueryRejected:
+        raise HTTPException(status_code=429, detail="Too many queries in progress. Please retry shortly.",
+                            headers={"Retry-After": "5"})
+    except TimeoutError:
+        raise HTTPException(status_code=504, detail=f"Query did not finish within {QUERY_TIMEOUT_SECONDS:.0f}s.")
+    except ClientDisconnected:
+        print("Client disconnected; query cancelled.")
+        return Response(status_code=499)
     except Exception as e:
         print(f"An error occurred during query processing: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _sse(event: str, data) -> str:
+    """Formats one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/api/query/stream")
+async def handle_query_stream(request: QueryRequest, http_request: Request):
+    """
+    Streams a query over Server-Sent Events: an `evidence` event with the
+    retrieved log entries as soon as retrieval finishes, `token` events with
+    the (masked) LLM output as it is generated, and a final `result` event with
+    the structured summary and evidence. Failures after the stream has started
+    arrive as an `error` event. Shares the concurrency limit of /api/query;
+    aggregation answers are sent as a single `result` event without a slot.
+    Streams are scheduled at "high" LLM priority unless the request sets one.
+    """
+    _require_pipeline()
+
+    try:
+        time_range = explicit_time_range(request.start_time, request.end_time)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    aggregated = app.state.rag_pipeline.aggregate(request.query, time_range)
+    if aggregated is not None:
+        return StreamingResponse(iter([_sse("result", aggregated)]), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    # Reject up front while a plain 429 can still be sent; the slot itself is
+    # taken inside the stream so it is always released when the stream ends.
+    if app.state.query_limiter.full():
+        raise HTTPException(status_code=429, detail="Too many queries in progress. Please retry shortly.",
+                            headers={"Retry-After": "5"})
+
+    deadline = asyncio.get_running_loop().time() + QUERY_TIMEOUT_SECONDS
+
+    async def events():
+        try:
+            with _profiler(http_request, "stream"):
+                async with asyncio.timeout(QUERY_TIMEOUT_SECONDS):
+                    async with app.state.query_limiter.slot():
+                        async for event, data in app.state.rag_pipeline.astream_query(
+                                request.query, time_range, request.priority or "high", deadline):
+                            yield _sse(event, data)
+        except QueryRejected:
+            yield _sse("error", {"status": 429, "detail": "Too many queries in progress. Please retry shortly."})
+        except TimeoutError:
+            yield _sse("error", {"status": 504, "detail": f"Query did not finish within {QUERY_TIMEOUT_SECONDS:.0f}s."})
+        except Exception as e:
+            print(f"An error occurred during streaming query processing: {e}")
+            yield _sse("error", {"status": 500, "detail": str(e)})
+
+    # The stream is cancelled (and the LLM request with it) if the client disconnects.
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/api/index/refresh")
+def refresh_index():
+    """Incrementally ingests new and appended log data into the existing index."""
+    _require_pipeline()
+
+    # Only the lease holder writes the store; this worker picks up its saves as they land.
+    if app.state.ingest_lease is None:
+        raise HTTPException(status_code=409, detail="Another worker holds the ingestion lease; refresh through it.")
+
+    # With live ingestion running, just trigger an immediate scan instead of racing it.
+    if app.state.live_ingestor is not None:
+        app.state.live_ingestor.wake()
+        return {"status": "scheduled", **app.state.live_ingestor.stats()}
+
+    try:
+        return app.state.rag_pipeline.refresh_index()
+    except Exception as e:
+        print(f"An error occurred during index refresh: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/index/reload")
+def reload_index():
+    """
+    Switches to the index currently published at VECTOR_STORE_PATH (e.g. by
+    build_index.py) without restarting. Queries are served by the old index
+    until the new one has loaded.
+    """
+    _require_pipeline()
+    if not app.state.reload_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="An index reload is already in progress.")
+
+    try:
+        # Ingestion and following track the index they were started with; restart on the new one.
+        if app.state.live_ingestor is not None:
+            app.state.live_ingestor.stop()
+            app.state.live_ingestor = None
+        try:
+            return app.state.rag_pipeline.reload_index()
+        except FileNotFoundError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        except Exception as e:
+            print(f"An error occurred during index reload: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+        finally:
+            _start_live_ingestor()
+    finally:
+        app.state.reload_lock.release()
+
+@app.get("/api/ingest/status")
+def ingest_status():
+    """Reports live ingestion lag, queue depth and backpressure."""
+    if app.state.live_ingestor is None:
+        return {"running": False}
+    return app.state.live_ingestor.stats()
+
 @app.get("/api/health")
 def health_check():
-    """Simple health check endpoint."""
-    return {"status": "ok", "rag_pipeline_initialized": app.state.rag_pipeline is not None}
+    """
+    Liveness: answers as soon as the process is up, whether or not the RAG
+    pipeline has finished loading (see `ready` and /api/health/ready).
+    """
+    return {
+        "status": "ok",
+        "ready": app.state.startup["state"] == "ready",
+        "startup": app.state.startup,
+        "rag_pipeline_initialized": app.state.rag_pipeline is not None,
+        "queries": app.state.query_limiter.stats(),
+        "llm": app.state.rag_pipeline.dispatcher.stats() if app.state.rag_pipeline else None,
+    }
+
+@app.get("/api/health/ready")
+def readiness_check():
+    """Readiness: 200 once queries can be served, 503 while loading or after a failed load."""
+    if app.state.startup["state"] != "ready":
+        return JSONResponse(status_code=503, content={"ready": False, **app.state.startup})
+    return {"ready": True, **app.state.startup}
+
+@app.get("/api/cache/stats")
+def cache_stats():
+    """Query cache hit/miss counters."""
+    pipeline = app.state.rag_pipeline
+    if pipeline is None or pipeline.cache is None:
+        return {"enabled": False}
+    return {"enabled": True, "index_version": pipeline.index.version, **pipeline.cache.stats()}
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus metrics: per-stage latency histograms, parse failures, in-flight queries, index size and ingestion."""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 if __name__ == "__main__":
     # To run: uvicorn main:app --host 0.0.0.0 --port 8000 --reload
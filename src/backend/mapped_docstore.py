@@ -0,0 +1,109 @@
+"""
+Read-only, memory-mapped docstores for saved shards.
+
+LangChain's FAISS.save_local pickles a shard's docstore and row -> ID map, so
+every process that loads the shard would unpickle its own copy of every
+Document. Shards are saved in a mapped form instead: the Documents as JSON in
+one byte blob with per-row offsets, and the IDs as fixed-width byte strings,
+by row and sorted for lookups. All are .npy files opened with mmap_mode="r",
+so uvicorn workers serving the same store share a single copy in the page
+cache, and opening a shard reads none of it up front. A shard that is written
+to is read from the same files into an ordinary in-memory docstore.
+"""
+import json
+import os
+from typing import Iterator, Mapping, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+def save_mapped(directory: str, store):
+    """Writes the mapped form of a LangChain FAISS store's docstore next to its saved index."""
+    ids = [store.index_to_docstore_id[row] for row in range(store.index.ntotal)]
+    encoded = []
+    for doc_id in ids:
+        doc = store.docstore.search(doc_id)
+        encoded.append(json.dumps([doc.page_content, doc.metadata], separators=(",", ":")).encode("utf-8"))
+    lengths = np.fromiter((len(b) for b in encoded), dtype=np.uint64, count=len(encoded))
+    id_array = np.array([doc_id.encode("utf-8") for doc_id in ids], dtype=bytes)
+    order = np.argsort(id_array, kind="stable")
+    columns = {
+        "doc_blob": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        "doc_offsets": np.concatenate([np.zeros(1, dtype=np.uint64), np.cumsum(lengths, dtype=np.uint64)]),
+        "ids": id_array,
+        "sorted_ids": id_array[order],
+        "sorted_rows": order.astype(np.int64),
+    }
+    for name, data in columns.items():
+        np.save(os.path.join(directory, f"{name}.npy"), data)
+
+
+class MappedDocstore:
+    """The docstore of a saved shard, read through memory maps; lookups only, no writes."""
+
+    def __init__(self, directory: str):
+        def load(name):
+            return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+
+        self._blob, self._offsets, self._ids = load("doc_blob"), load("doc_offsets"), load("ids")
+        self._sorted_ids, self._sorted_rows = load("sorted_ids"), load("sorted_rows")
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def id_at(self, row: int) -> str:
+        return self._ids[row].decode("utf-8")
+
+    def row_of(self, doc_id: str) -> Optional[int]:
+        key = doc_id.encode("utf-8")
+        i = int(np.searchsorted(self._sorted_ids, key))
+        if i < len(self._sorted_ids) and self._sorted_ids[i] == key:
+            return int(self._sorted_rows[i])
+        return None
+
+    def document(self, row: int) -> Document:
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        page_content, metadata = json.loads(self._blob[start:end].tobytes())
+        return Document(page_content=page_content, metadata=metadata)
+
+    def search(self, search: str):
+        """Same contract as InMemoryDocstore.search: the Document, or a message if it is missing."""
+        row = self.row_of(search)
+        return self.document(row) if row is not None else f"ID {search} not found."
+
+
+class MappedIds(Mapping):
+    """FAISS row -> docstore ID, the `index_to_docstore_id` of a mapped shard."""
+
+    def __init__(self, docstore: MappedDocstore):
+        self.docstore = docstore
+
+    def __getitem__(self, row: int) -> str:
+        if not 0 <= row < len(self.docstore):
+            raise KeyError(row)
+        return self.docstore.id_at(row)
+
+    def __len__(self) -> int:
+        return len(self.docstore)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(len(self.docstore)))
+
+
+class MappedPositions(Mapping):
+    """Docstore ID -> FAISS row, looked up by binary search instead of a per-process dict."""
+
+    def __init__(self, docstore: MappedDocstore):
+        self.docstore = docstore
+
+    def __getitem__(self, doc_id: str) -> int:
+        row = self.docstore.row_of(doc_id)
+        if row is None:
+            raise KeyError(doc_id)
+        return row
+
+    def __len__(self) -> int:
+        return len(self.docstore)
+
+    def __iter__(self) -> Iterator[str]:
+        return (self.docstore.id_at(row) for row in range(len(self.docstore)))
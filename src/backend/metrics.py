@@ -0,0 +1,155 @@
+"""
+Prometheus metrics and an opt-in per-request profiler.
+
+Every query stage is timed into one histogram labelled by stage, so a latency
+regression can be traced to retrieval (embed_query, search, format_context) or
+generation (llm_first_token, llm_generation, parse_json, mask). LLM timings
+come from a LangChain callback handler, which sees the first token whether
+the model is invoked or streamed. Gauges for in-flight queries, queued
+generations and index size are read when /metrics is scraped.
+
+A request sent with `X-Profile: 1` while PROFILING_ENABLED is set is sampled
+by pyinstrument when it is installed, or else by a stack sampler on the
+serving thread, and the report is written to PROFILE_DIR.
+"""
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter as Tally
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from prometheus_client import Counter, Gauge, Histogram
+
+from config import PROFILE_DIR, PROFILE_INTERVAL_SECONDS
+
+# Spans cache hits on embedding (milliseconds) up to a long generation (minutes).
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+STAGE_SECONDS = Histogram("logcopilot_stage_seconds", "Time spent in each query pipeline stage.",
+                          ["stage"], buckets=BUCKETS)
+JSON_PARSE_FAILURES = Counter("logcopilot_json_parse_failures_total", "LLM responses that were not valid JSON.")
+QUERIES_IN_FLIGHT = Gauge("logcopilot_queries_in_flight", "Queries holding an LLM slot.")
+QUERIES_WAITING = Gauge("logcopilot_queries_waiting", "Queries queued for an LLM slot.")
+INDEX_VECTORS = Gauge("logcopilot_index_vectors", "Vectors in the log index.")
+INGESTED_VECTORS = Counter("logcopilot_ingested_vectors_total", "Vectors added to the log index.")
+REMOVED_VECTORS = Counter("logcopilot_removed_vectors_total", "Vectors removed from the log index.")
+LLM_GENERATIONS = Counter("logcopilot_llm_generations_total", "Generations sent to the LLM.")
+LLM_COALESCED = Counter("logcopilot_llm_coalesced_total", "LLM requests served by an identical in-flight generation.")
+LLM_QUEUED = Gauge("logcopilot_llm_queued", "Generations waiting for an LLM slot.")
+
+
+def stage(name: str):
+    """Times a block (or decorated function) into the stage histogram."""
+    return STAGE_SECONDS.labels(name).time()
+
+
+class LLMTimingHandler(BaseCallbackHandler):
+    """Records time to first token and total generation time of each LLM call."""
+
+    run_inline = True  # cheap enough to run on the event loop instead of an executor
+
+    def __init__(self):
+        self._started: Dict[UUID, float] = {}
+        self._first_token_seen = set()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs):
+        started = self._started.get(run_id)
+        if started is not None and run_id not in self._first_token_seen:
+            self._first_token_seen.add(run_id)
+            STAGE_SECONDS.labels("llm_first_token").observe(time.perf_counter() - started)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs):
+        self._finish(run_id)
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs):
+        self._finish(run_id, observe=False)
+
+    def _finish(self, run_id: UUID, observe: bool = True):
+        started = self._started.pop(run_id, None)
+        self._first_token_seen.discard(run_id)
+        if started is not None and observe:
+            STAGE_SECONDS.labels("llm_generation").observe(time.perf_counter() - started)
+
+
+class _StackSampler:
+    """Samples one thread's stack at a fixed interval and tallies the collapsed stacks."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Tally = Tally()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                stack = traceback.extract_stack(frame)
+                self.stacks[";".join(f"{f.name} ({os.path.basename(f.filename)}:{f.lineno})" for f in stack)] += 1
+
+    def folded(self) -> str:
+        """Stacks in the folded format read by flamegraph.pl and speedscope."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+@contextmanager
+def profiled(label: str, on_report: Optional[Callable[[str], None]] = None):
+    """
+    Profiles the enclosed block and writes a report named after `label` to
+    PROFILE_DIR; `on_report` receives its path. Work running concurrently on
+    the same thread shows up in the stack sampler's report as well.
+    """
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = f"{time.strftime('%Y%m%dT%H%M%S')}-{label}"
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        Profiler = None
+
+    if Profiler is not None:
+        profiler = Profiler(interval=PROFILE_INTERVAL_SECONDS, async_mode="enabled")
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            path = os.path.join(PROFILE_DIR, name + ".html")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(profiler.output_html())
+            _reported(path, on_report)
+    else:
+        sampler = _StackSampler(threading.get_ident(), PROFILE_INTERVAL_SECONDS)
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            path = os.path.join(PROFILE_DIR, name + ".folded")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(sampler.folded())
+            _reported(path, on_report)
+
+
+def _reported(path: str, on_report: Optional[Callable[[str], None]]):
+    print(f"Profile written to {path}")
+    if on_report is not None:
+        on_report(path)
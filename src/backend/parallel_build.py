@@ -0,0 +1,248 @@
+"""
+Parallel vector store builds.
+
+A process pool parses log files (large line-oriented files are split into
+byte-range shards on line boundaries), and a second pool of embedding workers
+turns fixed-size batches of chunks into vectors. The batches are handed back to
+the parent's index in a deterministic order.
+"""
+import os
+import time
+import multiprocessing as mp
+from collections import Counter, deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from embedding_cache import CachedEmbeddings
+from ingest_manifest import FileEntry, IngestManifest
+from log_io import compression_of, list_log_files
+from log_parser import FORMATS, FilePosition, detect_file_format, iter_file_documents
+
+# (file path, source name, start offset, end offset or None for end of file)
+Shard = Tuple[str, str, int, Optional[int]]
+
+
+class BuildStats:
+    """Counters and timings collected during a parallel build."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.lines = 0
+        self.documents = 0
+        self.vectors = 0
+        self.parse_seconds = 0.0  # summed over parse workers
+        self.embed_seconds = 0.0  # summed over embedding workers
+
+    def report(self) -> str:
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return (
+            f"Parsed {self.lines} lines into {self.documents} documents and embedded {self.vectors} vectors "
+            f"in {elapsed:.1f}s: {self.lines / elapsed:.0f} lines/s, {self.vectors / elapsed:.1f} vectors/s overall; "
+            f"{self.lines / max(self.parse_seconds, 1e-9):.0f} lines/s per parse worker, "
+            f"{self.vectors / max(self.embed_seconds, 1e-9):.1f} vectors/s per embedding worker."
+        )
+
+
+def last_line_end(file_path: str, size: int) -> int:
+    """Returns the offset just past the last newline before `size` (0 if there is none)."""
+    with open(file_path, 'rb') as f:
+        pos = size
+        while pos > 0:
+            start = max(0, pos - 65536)
+            f.seek(start)
+            idx = f.read(pos - start).rfind(b"\n")
+            if idx >= 0:
+                return start + idx + 1
+            pos = start
+    return 0
+
+
+def plan_shards(directory: str, shard_bytes: int) -> List[Shard]:
+    """
+    Lists the work units for a directory, rotated files oldest first.
+    Line-oriented files larger than `shard_bytes` are split into byte ranges
+    that start on line boundaries; multi-line block formats (pretty) and
+    compressed files are always parsed whole. An unterminated last line of a
+    plain file is left out, since it may still be being written.
+    """
+    shards: List[Shard] = []
+    for file_path in list_log_files(directory):
+        file = os.path.basename(file_path)
+        try:
+            size = os.path.getsize(file_path)
+            log_format = FORMATS.get(detect_file_format(file_path, file))
+            if compression_of(file_path) or (log_format is not None and log_format.multiline):
+                shards.append((file_path, file, 0, None))
+                continue
+
+            size = last_line_end(file_path, size)
+            with open(file_path, 'rb') as f:
+                start = 0
+                while start < size:
+                    f.seek(start + shard_bytes)
+                    f.readline()
+                    end = min(f.tell(), size)
+                    shards.append((file_path, file, start, end))
+                    start = end
+        except OSError as e:
+            print(f"Error processing file {file_path}: {e}")
+    return shards
+
+
+def _parse_shard(shard: Shard) -> Tuple[Shard, List[Document], FilePosition, float]:
+    """Parse worker: returns the shard's Documents (numbered from line 1) and where parsing stopped."""
+    started = time.perf_counter()
+    file_path, source, start, end = shard
+    position = FilePosition(start)
+    try:
+        docs = list(iter_file_documents(file_path, source, position, end))
+    except Exception as e:
+        print(f"Error processing file {file_path}: {e}")
+        docs = []
+    return shard, docs, position, time.perf_counter() - started
+
+
+_worker_embeddings = None
+
+
+def _init_embed_worker(model_id, threads: int):
+    """
+    Loads the embedding model once per embedding worker process. `model_id`
+    may also be a picklable Embeddings object, which is used as is.
+    """
+    global _worker_embeddings
+    if not isinstance(model_id, str):
+        _worker_embeddings = model_id
+        return
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    from langchain_huggingface import HuggingFaceEmbeddings
+    _worker_embeddings = HuggingFaceEmbeddings(model_name=model_id)
+
+
+def _embed_batch(texts: List[str]) -> Tuple[List[List[float]], float]:
+    """Embedding worker: embeds one batch of chunk texts."""
+    started = time.perf_counter()
+    vectors = _worker_embeddings.embed_documents(texts) if texts else []
+    return vectors, time.perf_counter() - started
+
+
+def _bounded_map(pool: Executor, fn: Callable, items: Iterable, max_in_flight: int) -> Iterator:
+    """Like Executor.map, but keeps at most `max_in_flight` tasks queued so results don't pile up in memory."""
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(fn, item))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def build_vector_store_parallel(
+    directory: str,
+    embeddings,
+    chunker,
+    model_id: str,
+    parse_workers: int,
+    embed_workers: int,
+    embed_batch_size: int,
+    shard_bytes: int,
+    manifest: IngestManifest,
+    add_embedded: Callable[[List[str], List[Document], List[List[float]]], None],
+    select_documents: Optional[Callable[[List[Document]], List[Document]]] = None,
+    count_documents: Optional[Callable[[FileEntry, List[Document]], None]] = None,
+) -> BuildStats:
+    """
+    Embeds every log file under `directory` using process pools for parsing and
+    embedding, passing each finished batch to `add_embedded`. Vector IDs are
+    allocated from the manifest and each file's final position is recorded so
+    later refreshes resume where the build stopped. `count_documents` sees every
+    parsed Document; `select_documents` can drop those that should not be embedded.
+    """
+    stats = BuildStats()
+    shards = plan_shards(directory, shard_bytes)
+    print(f"Parallel build: {len(shards)} shards, {parse_workers} parse workers, "
+          f"{embed_workers} embedding workers, batch size {embed_batch_size}")
+
+    # Spawn rather than fork: the parent already holds torch and FAISS state.
+    ctx = mp.get_context("spawn")
+    threads_per_worker = max(1, (os.cpu_count() or 1) // embed_workers)
+
+    in_flight = deque()
+
+    def merge_ready(limit: int):
+        while len(in_flight) > limit:
+            batch, cached, future = in_flight.popleft()
+            vectors, seconds = future.result()
+            if cached is not None:
+                vectors = embeddings.fill(*cached, vectors)
+            stats.embed_seconds += seconds
+            stats.vectors += len(batch)
+            add_embedded([doc_id for doc_id, _ in batch], [c for _, c in batch], vectors)
+
+    with ProcessPoolExecutor(parse_workers, mp_context=ctx) as parse_pool, \
+            ProcessPoolExecutor(embed_workers, mp_context=ctx, initializer=_init_embed_worker,
+                                initargs=(model_id, threads_per_worker)) as embed_pool:
+
+        def submit(batch: List[Tuple[str, Document]]):
+            texts = [c.page_content for _, c in batch]
+            cached = None
+            if isinstance(embeddings, CachedEmbeddings):
+                # Only cache misses are sent to the workers.
+                cached = embeddings.lookup(texts)
+                texts = [texts[i] for i in cached[2]]
+            in_flight.append((batch, cached, embed_pool.submit(_embed_batch, texts)))
+            merge_ready(2 * embed_workers)
+
+        line_base = {}
+        shards_left = Counter(shard[0] for shard in shards)
+        # Each file's last window so far, which may continue into its next shard.
+        open_windows: Dict[str, List[Document]] = {}
+        pending_chunks: List[Tuple[str, Document]] = []
+        for shard, docs, position, seconds in _bounded_map(parse_pool, _parse_shard, shards, 2 * parse_workers):
+            # Shards are parsed independently, so shift their line numbers by the
+            # lines in the preceding shards of the same file (results arrive in order).
+            file_path = shard[0]
+            lines_read = position.unit - 1
+            base = line_base.get(file_path, 0)
+            if base:
+                for doc in docs:
+                    if "line" in doc.metadata:
+                        doc.metadata["line"] += base
+            line_base[file_path] = base + lines_read
+
+            stats.lines += lines_read
+            stats.documents += len(docs)
+            stats.parse_seconds += seconds
+
+            entry = manifest.track(file_path)
+            if count_documents is not None:
+                count_documents(entry, docs)
+            if select_documents is not None:
+                docs = select_documents(docs)
+            # Windows are formed across shard boundaries, exactly as a serial build forms them.
+            windows = chunker.windows(open_windows.pop(file_path, []) + docs)
+            shards_left[file_path] -= 1
+            if shards_left[file_path] and windows:
+                open_windows[file_path] = windows.pop()
+            chunks = [chunk for window in windows for chunk in chunker.chunks(window)]
+            entry.offset = position.offset
+            # Compressed files are tracked by their size on disk; offsets count decompressed bytes.
+            entry.size = os.path.getsize(file_path) if compression_of(file_path) else position.offset
+            entry.unit = base + lines_read + 1
+            pending_chunks.extend(zip(entry.new_ids(len(chunks)), chunks))
+            while len(pending_chunks) >= embed_batch_size:
+                submit(pending_chunks[:embed_batch_size])
+                pending_chunks = pending_chunks[embed_batch_size:]
+
+        if pending_chunks:
+            submit(pending_chunks)
+        merge_ready(0)
+
+    print(stats.report())
+    return stats
@@ -0,0 +1,132 @@
+"""
+Two-level cache of query responses.
+
+Level one matches the normalised question text exactly; level two matches a
+previously answered question whose embedding is close enough (cosine
+similarity above a threshold). Entries expire after a TTL, the least recently
+used are evicted beyond a size cap, and every entry records the index version
+it was answered from, so any ingestion that changes the vector store makes
+older answers stale.
+
+Questions naming different identifiers, status codes, IPs or times ("pod-64"
+vs "pod-65", "500" vs "503") are never treated as semantic matches, however
+similar their embeddings.
+"""
+import copy
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Hashable, Optional, Sequence, Tuple
+
+import numpy as np
+
+_PUNCTUATION = re.compile(r"[\s?!.,;:]+$")
+_TOKEN = re.compile(r"[\w.\-:/@]+")
+
+
+def normalize_query(query: str) -> str:
+    return _PUNCTUATION.sub("", " ".join(query.lower().split()))
+
+
+def _signature(query: str) -> FrozenSet[str]:
+    """Tokens that contain digits; semantic matches must agree on all of them."""
+    return frozenset(t.strip(".:-") for t in _TOKEN.findall(query.lower()) if any(c.isdigit() for c in t))
+
+
+class _Entry:
+    def __init__(self, response: Dict, version: int, embedding: Optional[np.ndarray], signature: FrozenSet[str]):
+        self.response = response
+        self.version = version
+        self.embedding = embedding
+        self.signature = signature
+        self.created = time.monotonic()
+
+
+class QueryCache:
+    """Exact and semantic response cache with TTL, LRU eviction and version invalidation."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float, similarity_threshold: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[Tuple[str, Hashable], _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.invalidated = 0
+        self.evicted = 0
+
+    def _usable(self, key, entry: _Entry, version: int) -> bool:
+        """Drops the entry if it expired or predates the current index version."""
+        if entry.version == version and time.monotonic() - entry.created < self.ttl_seconds:
+            return True
+        del self._entries[key]
+        self.invalidated += 1
+        return False
+
+    def get(self, query: str, scope: Hashable, version: int,
+            embedding: Optional[Sequence[float]] = None) -> Optional[Dict]:
+        """
+        Returns a cached response for `query` within `scope` (e.g. its time range)
+        at index `version`, or None. The semantic level is only consulted when
+        the query embedding is given.
+        """
+        key = (normalize_query(query), scope)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._usable(key, entry, version):
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return copy.deepcopy(entry.response)
+
+            if embedding is not None:
+                vector = self._unit(embedding)
+                signature = _signature(query)
+                best_key, best_score = None, self.similarity_threshold
+                for other_key, other in list(self._entries.items()):
+                    if other_key[1] != scope or other.signature != signature or other.embedding is None:
+                        continue
+                    if not self._usable(other_key, other, version):
+                        continue
+                    score = float(vector @ other.embedding)
+                    if score >= best_score:
+                        best_key, best_score = other_key, score
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self.semantic_hits += 1
+                    return copy.deepcopy(self._entries[best_key].response)
+
+            self.misses += 1
+            return None
+
+    def put(self, query: str, scope: Hashable, version: int, response: Dict,
+            embedding: Optional[Sequence[float]] = None):
+        key = (normalize_query(query), scope)
+        entry = _Entry(copy.deepcopy(response), version,
+                       self._unit(embedding) if embedding is not None else None, _signature(query))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evicted += 1
+
+    @staticmethod
+    def _unit(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+            "invalidated": self.invalidated,
+            "evicted": self.evicted,
+        }
@@ -1,50 +1,62 @@
-import os
 import json
-from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from operator import itemgetter
+from typing import AsyncIterator, Optional, Tuple
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough, RunnableLambda
+from langchain_core.runnables import RunnableLambda
 from langchain_core.output_parsers import StrOutputParser
 
-from config import LOGS_DIRECTORY, VECTOR_STORE_PATH, EMBEDDING_MODEL_ID, CHUNK_SIZE, CHUNK_OVERLAP, RETRIEVER_K
-from log_parser import load_and_parse_logs
-from security import mask_sensitive_data
+from config import (
+    RETRIEVER_K, REFRESH_ON_STARTUP, AGGREGATION_ENABLED, CONTEXT_TOKEN_BUDGET,
+    QUERY_CACHE_ENABLED, QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_TTL_SECONDS, QUERY_CACHE_SIMILARITY,
+    LLM_MAX_CONCURRENCY,
+)
+from chunking import pack_context
+from llm_dispatch import LLMDispatcher
+from llm_loader import load_embeddings
+from log_index import LogIndex
+from metrics import JSON_PARSE_FAILURES, LLMTimingHandler, stage
+from query_cache import QueryCache
+from security import StreamMasker, mask_sensitive_batch, mask_sensitive_data
+from sharded_store import ShardedVectorStore
+from time_range import TimeRange
 
 class RAGPipeline:
     def __init__(self, llm):
         self.llm = llm
+        # Times to first token and full generation, whether the LLM is invoked or streamed.
+        self.llm_config = {"callbacks": [LLMTimingHandler()]}
+        # Async queries share one scheduler: priorities, deadlines and identical prompts coalesced.
+        self.dispatcher = LLMDispatcher(llm, LLM_MAX_CONCURRENCY, self.llm_config)
         self.retriever = None
+        self.cache = None
+        if QUERY_CACHE_ENABLED:
+            self.cache = QueryCache(QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_TTL_SECONDS, QUERY_CACHE_SIMILARITY)
         self._setup_pipeline()
 
     def _setup_pipeline(self):
         """Initializes the vector store and the RAG chain."""
-        embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_ID)
-
-        if os.path.exists(VECTOR_STORE_PATH):
-            print("Loading existing vector store...")
-            vector_store = FAISS.load_local(VECTOR_STORE_PATH, embeddings, allow_dangerous_deserialization=True)
-        else:
-            print("Building new vector store...")
-            print(f"Loading logs from: {LOGS_DIRECTORY}")
-            documents = load_and_parse_logs(LOGS_DIRECTORY)
-            if not documents:
-                raise ValueError("No documents found in the log directory. Cannot build vector store.")
-            
-            text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
-            chunks = text_splitter.split_documents(documents)
-            
-            vector_store = FAISS.from_documents(chunks, embeddings)
-            os.makedirs(os.path.dirname(VECTOR_STORE_PATH), exist_ok=True)
-            vector_store.save_local(VECTOR_STORE_PATH)
-            print(f"Vector store built and saved to {VECTOR_STORE_PATH}")
-
-        self.retriever = vector_store.as_retriever(search_kwargs={"k": RETRIEVER_K})
+        self.index = LogIndex(load_embeddings())
+        self.index.load_or_build(refresh=REFRESH_ON_STARTUP)
+
+        # Search through the index rather than a retriever bound to one FAISS object,
+        # so background ingestion can add vectors without racing in-flight queries.
+        # The async variant is used by ainvoke, so async queries never block the event loop.
+        self.retriever = RunnableLambda(
+            lambda inputs: self.index.search(
+                inputs["question"], RETRIEVER_K, inputs.get("time_range"), inputs.get("embedding")
+            ),
+            afunc=lambda inputs: self.index.asearch(
+                inputs["question"], RETRIEVER_K, inputs.get("time_range"), inputs.get("embedding")
+            ),
+        )
         
         # --- Prompt Engineering ---
         # This generic prompt works well with Ollama's JSON mode.
         # It clearly instructs the model on the desired output format.
-        template = """
+        # The instructions are identical for every query and come first, as the system
+        # message, so Ollama reuses their cached prompt state instead of evaluating them
+        # again; only the question and context that follow are new each time.
+        instructions = """
         You are an expert Log Analysis Assistant. Your task is to answer questions based ONLY on the provided log snippets.
         Do not make up information. If the context does not contain the answer, state that clearly.
         
@@ -54,47 +66,210 @@ class RAGPipeline:
 
         Your final output must be a single JSON object with three keys: "analysis", "summary" and "evidence".
         The "evidence" key should be a list of objects, where each object has a "type" (e.g., "log") and "content" (the log data).
-        
+        """
+        template = """
         Question: {question}
 
         Context from Logs:
         {context}
         """
         
-        prompt = ChatPromptTemplate.from_template(template)
+        prompt = ChatPromptTemplate.from_messages([("system", instructions), ("human", template)])
+
+        def format_doc(doc):
+            line = doc.metadata.get('line', 'N/A')
+            if "end_line" in doc.metadata:
+                line = f"{line}-{doc.metadata['end_line']}"  # a window of adjacent entries
+            text = f"Source: {doc.metadata.get('source', 'N/A')}, Line: {line}\n{doc.page_content}"
+            # A template representative stands in for every entry of that event type.
+            if "template_id" in doc.metadata and self.index.miner is not None:
+                text += "\n" + self.index.describe_template(doc.metadata["template_id"])
+            return text
+
+        def pack_docs(docs):
+            """The retrieved chunks that make it into the prompt, formatted, within CONTEXT_TOKEN_BUDGET."""
+            with stage("format_context"):
+                return pack_context(docs, format_doc, CONTEXT_TOKEN_BUDGET)
 
         def format_docs(docs):
-            return "\n\n".join(f"Source: {doc.metadata.get('source', 'N/A')}, Line: {doc.metadata.get('line', 'N/A')}\n{doc.page_content}" for doc in docs)
+            return "\n\n".join(pack_docs(docs))
 
         def parse_json_output(text: str):
             """Safely parse the LLM's JSON output string."""
             try:
-                return json.loads(text)
+                with stage("parse_json"):
+                    return json.loads(text)
             except json.JSONDecodeError:
+                JSON_PARSE_FAILURES.inc()
                 print(f"Failed to parse LLM JSON output: {text}")
                 return {
                     "summary": "The model's response was not in the expected JSON format.",
                     "evidence": [{"type": "error", "content": text}]
                 }
 
+        # Kept for the async paths, which run the same steps one at a time so the
+        # generation goes through the dispatcher; the chain serves synchronous query().
+        self.prompt = prompt
+        self.pack_docs = pack_docs
+        self.parse_json_output = parse_json_output
+
         self.chain = (
-            {"context": self.retriever | RunnableLambda(format_docs), "question": RunnablePassthrough()}
+            {"context": self.retriever | RunnableLambda(format_docs), "question": itemgetter("question")}
             | prompt
-            | self.llm
+            | self.llm.with_config(self.llm_config)
             | StrOutputParser()
             | RunnableLambda(parse_json_output)
         )
 
-    def query(self, user_query: str):
-        """Executes a query against the RAG chain."""
+    def refresh_index(self):
+        """Picks up new, appended, rotated and deleted log files without a full rebuild."""
+        return self.index.refresh()
+
+    def follow_index(self):
+        """
+        Catches up with the ingesting worker's latest save of the current index,
+        reading only what it changed. Cached answers stay valid unless it did.
+        """
+        changed = self.index.follow()
+        return {"store_path": self.index.store_path, "vectors": len(self.index.store), "changed": changed}
+
+    def reload_index(self):
+        """
+        Switches to the index currently saved at VECTOR_STORE_PATH, e.g. one
+        published by build_index.py. Queries already running finish on the old one.
+        """
+        index = LogIndex(self.index.embeddings)
+        if not ShardedVectorStore.exists(index.store_path):
+            raise FileNotFoundError(f"No vector store found at {index.store_path}.")
+        index.load_or_build(refresh=False)
+        # Carry the version on, so answers cached from the old index are never reused.
+        index.version = self.index.version + 1
+        self.index = index
+        return {"store_path": index.store_path, "vectors": len(index.store)}
+
+    def aggregate(self, user_query: str, time_range: Optional[TimeRange] = None):
+        """
+        Answers count and top-N questions from the index rollups, with the counts
+        as table evidence. Returns None for questions that need the RAG chain.
+        """
+        if not AGGREGATION_ENABLED:
+            return None
+        with stage("aggregate"):
+            response = self.index.aggregate(user_query, time_range)
+            if response is None:
+                return None
+            print("Answered from the rollups.")
+            response["summary"] = mask_sensitive_data(response["summary"])
+            for item in response["evidence"]:
+                rows = item["content"]["rows"]
+                labels = mask_sensitive_batch([str(row[0]) for row in rows])
+                item["content"]["rows"] = [[label, *row[1:]] for label, row in zip(labels, rows)]
+            return response
+
+    def query(self, user_query: str, time_range: Optional[TimeRange] = None):
+        """Executes a query against the RAG chain, optionally limited to a time range."""
         print(f"Received query: {user_query}")
-        response = self.chain.invoke(user_query)
+        aggregated = self.aggregate(user_query, time_range)
+        if aggregated is not None:
+            return aggregated
+        # Embedded once, for both the semantic cache lookup and retrieval.
+        with stage("embed_query"):
+            embedding = self.index.embeddings.embed_query(user_query)
+        cached = self._cached(user_query, time_range, embedding)
+        if cached is not None:
+            return cached
+
+        version = self.index.version
+        response = self.chain.invoke({"question": user_query, "time_range": time_range, "embedding": embedding})
+        return self._store(user_query, time_range, embedding, version, self._finalize(response))
+
+    async def aquery(self, user_query: str, time_range: Optional[TimeRange] = None, priority: str = "normal",
+                     deadline: Optional[float] = None):
+        """
+        Async version of query(), with the generation scheduled by the dispatcher
+        at `priority` until `deadline` (event loop time). Cancelling it cancels the
+        in-flight LLM request unless an identical query is still waiting on it.
+        """
+        print(f"Received query: {user_query}")
+        aggregated = self.aggregate(user_query, time_range)
+        if aggregated is not None:
+            return aggregated
+        with stage("embed_query"):
+            embedding = await self.index.embeddings.aembed_query(user_query)
+        cached = self._cached(user_query, time_range, embedding)
+        if cached is not None:
+            return cached
+
+        version = self.index.version
+        docs = await self.index.asearch(user_query, RETRIEVER_K, time_range, embedding)
+        prompt_value = await self.prompt.ainvoke({"context": "\n\n".join(self.pack_docs(docs)), "question": user_query})
+        text = await self.dispatcher.generate(prompt_value, priority, deadline)
+        response = self._finalize(self.parse_json_output(text))
+        return self._store(user_query, time_range, embedding, version, response)
+
+    def _cached(self, user_query: str, time_range: Optional[TimeRange], embedding):
+        if self.cache is None:
+            return None
+        response = self.cache.get(user_query, time_range, self.index.version, embedding)
+        if response is not None:
+            print("Answered from the query cache.")
+        return response
 
-        # Mask sensitive data and ensure consistent output format
+    def _store(self, user_query: str, time_range: Optional[TimeRange], embedding, version: int, response):
+        """Caches a well-formed response under the index version it was retrieved from."""
+        if self.cache is not None and not any(item.get("type") == "error" for item in response.get("evidence", [])):
+            self.cache.put(user_query, time_range, version, response, embedding)
+        return response
+
+    async def astream_query(self, user_query: str, time_range: Optional[TimeRange] = None, priority: str = "high",
+                            deadline: Optional[float] = None) -> AsyncIterator[Tuple[str, object]]:
+        """
+        Streams a query as (event, data) pairs: the retrieved "evidence" as soon as
+        retrieval returns, masked LLM "token" text as it is generated, and the final
+        structured "result". Closing the iterator cancels the LLM request (see aquery()).
+        Aggregation questions get only the "result".
+        """
+        print(f"Received streaming query: {user_query}")
+        aggregated = self.aggregate(user_query, time_range)
+        if aggregated is not None:
+            yield "result", aggregated
+            return
+        with stage("embed_query"):
+            embedding = await self.index.embeddings.aembed_query(user_query)
+        cached = self._cached(user_query, time_range, embedding)
+        if cached is not None:
+            yield "result", cached
+            return
+
+        version = self.index.version
+        docs = await self.index.asearch(user_query, RETRIEVER_K, time_range, embedding)
+        context = self.pack_docs(docs)
+        evidence = mask_sensitive_batch(context)
+        yield "evidence", [{"type": "log", "content": content} for content in evidence]
+
+        prompt_value = await self.prompt.ainvoke({"context": "\n\n".join(context), "question": user_query})
+        masker = StreamMasker()
+        parts = []
+        async for chunk in self.dispatcher.stream(prompt_value, priority, deadline):
+            parts.append(chunk)
+            text = masker.feed(chunk)
+            if text:
+                yield "token", text
+        text = masker.flush()
+        if text:
+            yield "token", text
+
+        response = self._finalize(self.parse_json_output("".join(parts)))
+        yield "result", self._store(user_query, time_range, embedding, version, response)
+
+    @stage("mask")
+    def _finalize(self, response):
+        """Mask sensitive data and ensure consistent output format."""
         if 'summary' in response and isinstance(response.get('summary'), str):
             response['summary'] = mask_sensitive_data(response['summary'])
         
         if 'evidence' in response and isinstance(response.get('evidence'), list):
+            contents = []
             for item in response['evidence']:
                 content = item.get('content')
                 content_str = ""
@@ -110,7 +285,10 @@ class RAGPipeline:
                     # For any other type (numbers, etc.), convert to a plain string
                     content_str = str(content)
                 
-                # Now, mask the guaranteed-to-be-string content and update the item
-                item['content'] = mask_sensitive_data(content_str)
+                contents.append(content_str)
+
+            # Now, mask the guaranteed-to-be-string contents in one batch and update the items
+            for item, masked in zip(response['evidence'], mask_sensitive_batch(contents)):
+                item['content'] = masked
         
         return response
\ No newline at end of file
@@ -0,0 +1,377 @@
+"""
+Compact, column-wise storage for parsed log records.
+
+Parsed entries are rendered as one dense `key=value` line instead of indented
+JSON, which is what gets embedded and pasted into prompts. The index keeps the
+fields of each record in a RecordStore rather than in its Documents: every key
+and value string is interned once, and a record is a run of (key ID, value ID)
+pairs in two flat integer columns, so repeated keys, levels, pod names and
+event types cost four bytes each. Stored Documents only carry a record ID.
+
+On disk the columns and the UTF-8 string blob are raw little-endian files,
+loaded memory-mapped, so opening a large index doesn't read its records into
+memory. Saves append the records and strings added since the last save, then
+commit their new lengths in meta.json, so a save costs I/O proportional to
+what was added; bytes past the committed lengths (from a crash mid-save) are
+ignored and overwritten by the next save.
+
+When the index deletes vectors it releases their records. Once released
+records make up COMPACT_RELEASED of the table, the next save rewrites it
+without them (and without strings nothing else uses). Records keep their IDs,
+so stored Documents never change: after a compaction a record_ids column maps
+each row back to its ID.
+"""
+import json
+import os
+import re
+import shutil
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+RECORDS_DIR = "records"
+META_FILE = "meta.json"
+
+# File name -> element type of each column.
+COLUMNS = {
+    "offsets": np.dtype("<u8"), "keys": np.dtype("<u4"), "values": np.dtype("<u4"),
+    "strings": np.dtype("u1"), "string_offsets": np.dtype("<u8"),
+    "record_ids": np.dtype("<u8"), "released": np.dtype("<u8"),
+}
+
+# Share of the stored records released by the index (their vectors deleted)
+# at which the next save compacts the table.
+COMPACT_RELEASED = 0.25
+
+# Key of the single field holding an unstructured line (rendered without "key=").
+MESSAGE = ""
+
+_UNSAFE_KEY = re.compile(r'[\s="]')
+_PAIR = re.compile(r'([^\s="]+)=("(?:[^"\\]|\\.)*"|[^\s"]\S*)')
+_NEEDS_QUOTES = re.compile(r'^$|\s|^"')
+
+Pairs = List[Tuple[str, str]]
+
+
+def flatten(parsed: Dict[str, Any], prefix: str = "") -> Dict[str, str]:
+    """Flattens nested objects into dotted keys; non-string values become compact JSON."""
+    flat: Dict[str, str] = {}
+    for key, value in parsed.items():
+        key = _UNSAFE_KEY.sub("_", f"{prefix}{key}") or "_"
+        if isinstance(value, dict) and value:
+            flat.update(flatten(value, key + "."))
+        else:
+            flat[key] = value if isinstance(value, str) else json.dumps(value, separators=(",", ":"))
+    return flat
+
+
+def render(fields: Iterable[Tuple[str, str]]) -> str:
+    """One-line `key=value` form; values with whitespace (or empty ones) are JSON-quoted."""
+    parts = []
+    for key, value in fields:
+        if key == MESSAGE:
+            parts.append(value)
+        else:
+            parts.append(f"{key}={json.dumps(value, ensure_ascii=False) if _NEEDS_QUOTES.search(value) else value}")
+    return " ".join(parts)
+
+
+def parse_rendered(text: str) -> Optional[Pairs]:
+    """Inverse of render() for structured records; None if `text` isn't exactly in that form."""
+    pairs, pos = [], 0
+    for match in _PAIR.finditer(text):
+        if match.start() != pos:
+            return None
+        value = match.group(2)
+        pairs.append((match.group(1), json.loads(value) if value.startswith('"') else value))
+        pos = match.end() + 1
+    if not pairs or pos != len(text) + 1 or render(pairs) != text:
+        return None
+    return pairs
+
+
+class RecordStore:
+    """
+    Record table: interned strings plus (key, value) ID columns. Records are
+    appended; the ones the index releases are dropped when the table is
+    compacted, and the others keep their IDs.
+    """
+
+    def __init__(self):
+        # Loaded (memory-mapped) part; records and strings added since live in the arrays below.
+        self._base_offsets = np.zeros(1, dtype=np.uint64)
+        self._base_keys = np.empty(0, dtype=np.uint32)
+        self._base_values = np.empty(0, dtype=np.uint32)
+        self._base_blob = np.empty(0, dtype=np.uint8)
+        self._base_string_offsets = np.zeros(1, dtype=np.uint64)
+        # ID of each loaded record once a compaction has left gaps; empty while IDs are row numbers.
+        self._base_record_ids = np.empty(0, dtype=np.uint64)
+        self._base_released = np.empty(0, dtype=np.uint64)
+        self._base_next_id = 0
+        self._offsets = array("Q")  # end offset of each new record in the pair columns
+        self._keys = array("I")
+        self._values = array("I")
+        self._strings: List[str] = []
+        self._released = array("Q")
+        self._ids: Optional[Dict[str, int]] = {}
+        # Directory this store was loaded from or last saved to; later saves there only append.
+        self._directory: Optional[str] = None
+
+    @property
+    def _base_records(self) -> int:
+        return len(self._base_offsets) - 1
+
+    @property
+    def _base_strings(self) -> int:
+        return len(self._base_string_offsets) - 1
+
+    @property
+    def _gapped(self) -> bool:
+        """Whether record IDs differ from row numbers, i.e. the table has been compacted."""
+        return bool(len(self._base_record_ids)) or self._base_records != self._base_next_id
+
+    def __len__(self) -> int:
+        """Records stored, including released ones not yet compacted away."""
+        return self._base_records + len(self._offsets)
+
+    @property
+    def released(self) -> int:
+        return len(self._base_released) + len(self._released)
+
+    # --- Strings ---
+
+    def _string(self, string_id: int) -> str:
+        if string_id < self._base_strings:
+            start, end = self._base_string_offsets[string_id], self._base_string_offsets[string_id + 1]
+            return self._base_blob[start:end].tobytes().decode("utf-8")
+        return self._strings[string_id - self._base_strings]
+
+    def _intern(self, value: str) -> int:
+        if self._ids is None:
+            # Built on the first write after loading, so read-only use never decodes every string.
+            self._ids = {self._string(i): i for i in range(self._base_strings)}
+        string_id = self._ids.get(value)
+        if string_id is None:
+            string_id = self._ids[value] = self._base_strings + len(self._strings)
+            self._strings.append(value)
+        return string_id
+
+    # --- Records ---
+
+    def add(self, text: str) -> int:
+        """Stores a rendered record (or any other text, as a single message field) and returns its ID."""
+        pairs = parse_rendered(text) or [(MESSAGE, text)]
+        for key, value in pairs:
+            self._keys.append(self._intern(key))
+            self._values.append(self._intern(value))
+        self._offsets.append(len(self._base_keys) + len(self._keys))
+        return self._base_next_id + len(self._offsets) - 1
+
+    def release(self, record_ids: Iterable[int]):
+        """Marks records as no longer referenced, so a later compaction drops them."""
+        self._released.extend(record_ids)
+
+    def _row(self, record_id: int) -> int:
+        """Row holding a record: new records follow the loaded ones, which are looked up by ID."""
+        if record_id >= self._base_next_id:
+            return self._base_records + record_id - self._base_next_id
+        if not len(self._base_record_ids):
+            if record_id < self._base_records:
+                return record_id
+            raise KeyError(record_id)
+        row = int(np.searchsorted(self._base_record_ids, record_id))
+        if row == len(self._base_record_ids) or self._base_record_ids[row] != record_id:
+            raise KeyError(record_id)  # released and compacted away
+        return row
+
+    def fields(self, record_id: int) -> Pairs:
+        row, base = self._row(record_id), self._base_records
+        if row < base:
+            start, end = int(self._base_offsets[row]), int(self._base_offsets[row + 1])
+            keys, values = self._base_keys[start:end], self._base_values[start:end]
+        else:
+            i = row - base
+            start = int(self._offsets[i - 1]) if i else len(self._base_keys)
+            start, end = start - len(self._base_keys), int(self._offsets[i]) - len(self._base_keys)
+            keys, values = self._keys[start:end], self._values[start:end]
+        return [(self._string(int(k)), self._string(int(v))) for k, v in zip(keys, values)]
+
+    def as_dict(self, record_id: int) -> Dict[str, str]:
+        return dict(self.fields(record_id))
+
+    def text(self, record_id: int) -> str:
+        return render(self.fields(record_id))
+
+    def nbytes(self) -> int:
+        """Bytes held by the columns and strings (mapped or in memory)."""
+        loaded = sum(column.nbytes for column in self._columns().values())
+        added = sum(a.itemsize * len(a) for a in (self._offsets, self._keys, self._values, self._released))
+        return loaded + added + sum(len(s.encode("utf-8")) for s in self._strings)
+
+    # --- Persistence ---
+
+    def _columns(self) -> Dict[str, np.ndarray]:
+        """The loaded columns, by file name."""
+        return {"offsets": self._base_offsets, "keys": self._base_keys, "values": self._base_values,
+                "strings": self._base_blob, "string_offsets": self._base_string_offsets,
+                "record_ids": self._base_record_ids, "released": self._base_released}
+
+    def _committed(self) -> Dict[str, int]:
+        """What meta.json says about the loaded part: the length of each column and the next record ID."""
+        return {**{name: len(column) for name, column in self._columns().items()}, "next_id": self._base_next_id}
+
+    def _added(self) -> Dict[str, np.ndarray]:
+        """What each column gains from the records and strings added (and records released) since loading or saving."""
+        encoded = [s.encode("utf-8") for s in self._strings]
+        lengths = np.fromiter((len(b) for b in encoded), dtype=np.uint64, count=len(encoded))
+        new_ids = self._base_next_id + np.arange(len(self._offsets), dtype=np.uint64)
+        return {
+            "offsets": np.frombuffer(self._offsets, dtype=np.uint64),
+            "keys": np.frombuffer(self._keys, dtype=np.uint32),
+            "values": np.frombuffer(self._values, dtype=np.uint32),
+            "strings": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+            "string_offsets": self._base_string_offsets[-1] + np.cumsum(lengths, dtype=np.uint64),
+            "record_ids": new_ids if self._gapped else np.empty(0, dtype=np.uint64),
+            "released": np.frombuffer(self._released, dtype=np.uint64),
+        }
+
+    def save(self, directory: str, compact: bool = True):
+        """
+        Appends what was added since the last save to the table in `directory`
+        and maps it back in. A directory this store didn't load or save (or one
+        changed since) gets the whole table, written aside and swapped in. So
+        does a table whose released records have reached COMPACT_RELEASED of
+        it, unless `compact` is false: it is written without them, and without
+        strings only they used.
+        """
+        committed = self._committed()
+        next_id = self._base_next_id + len(self._offsets)
+        compact = compact and self.released and self.released >= COMPACT_RELEASED * len(self)
+        ids = self._ids
+        if not compact and self._directory == directory and _read_meta(directory) == committed:
+            if not self._offsets and not self._strings and not self._released:
+                return
+            for name, data in self._added().items():
+                if not len(data):
+                    continue
+                with open(os.path.join(directory, name), "r+b") as f:
+                    f.seek(committed[name] * COLUMNS[name].itemsize)
+                    f.truncate()
+                    f.write(data.astype(COLUMNS[name], copy=False).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+                committed[name] += len(data)
+            _write_meta(directory, {**committed, "next_id": next_id})
+        else:
+            added = self._added()
+            columns = {name: np.concatenate([column, added[name]]) for name, column in self._columns().items()}
+            if compact:
+                record_ids = columns["record_ids"] if self._gapped else np.arange(next_id, dtype=np.uint64)
+                columns = _without_released(columns, record_ids)
+                ids = None  # strings were renumbered
+            lengths = {"next_id": next_id}
+            tmp = directory + ".tmp"
+            shutil.rmtree(tmp, ignore_errors=True)
+            os.makedirs(tmp)
+            for name, column in columns.items():
+                column.astype(COLUMNS[name], copy=False).tofile(os.path.join(tmp, name))
+                lengths[name] = len(column)
+            _write_meta(tmp, lengths)
+            if os.path.isdir(directory):
+                old = directory + ".old"
+                shutil.rmtree(old, ignore_errors=True)
+                os.rename(directory, old)
+                os.rename(tmp, directory)
+                shutil.rmtree(old)
+            else:
+                os.rename(tmp, directory)
+
+        self._map(directory)
+        self._ids = ids  # string IDs only change when compacting
+
+    def _map(self, directory: str):
+        lengths = _read_meta(directory)
+        if lengths is None:
+            raise FileNotFoundError(os.path.join(directory, META_FILE))
+
+        def load(name):
+            if not lengths[name]:
+                return np.empty(0, dtype=COLUMNS[name])
+            return np.memmap(os.path.join(directory, name), dtype=COLUMNS[name], mode="r", shape=(lengths[name],))
+
+        self._directory = directory
+        self._base_offsets, self._base_keys, self._base_values = load("offsets"), load("keys"), load("values")
+        self._base_blob, self._base_string_offsets = load("strings"), load("string_offsets")
+        self._base_record_ids, self._base_released = load("record_ids"), load("released")
+        self._base_next_id = lengths["next_id"]
+        self._offsets, self._keys, self._values = array("Q"), array("I"), array("I")
+        self._strings, self._released = [], array("Q")
+        self._ids = None
+
+    def follow(self, directory: str) -> bool:
+        """
+        Maps in what another process has saved to `directory` since this store
+        last looked (appended or compacted); returns whether anything changed.
+        Only for stores with nothing added locally.
+        """
+        lengths = _read_meta(directory)
+        if lengths is None or (self._directory == directory and lengths == self._committed()):
+            return False
+        self._map(directory)
+        return True
+
+    @classmethod
+    def load(cls, directory: str) -> "RecordStore":
+        """Maps a saved table; an empty store if `directory` doesn't exist."""
+        store = cls()
+        if os.path.isdir(directory):
+            store._map(directory)
+        return store
+
+
+def _ranges(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Indexes covering [start, start + length) for each pair, concatenated."""
+    starts, lengths = starts.astype(np.int64), lengths.astype(np.int64)
+    ends = np.cumsum(lengths)
+    if not len(ends):
+        return np.empty(0, dtype=np.int64)
+    return np.arange(ends[-1]) + np.repeat(starts - (ends - lengths), lengths)
+
+
+def _without_released(columns: Dict[str, np.ndarray], record_ids: np.ndarray) -> Dict[str, np.ndarray]:
+    """A table's columns with its released records, and the strings only they used, left out."""
+    offsets, string_offsets = columns["offsets"], columns["string_offsets"]
+    keep = ~np.isin(record_ids, columns["released"])
+    sizes = np.diff(offsets)[keep]
+    pairs = _ranges(offsets[:-1][keep], sizes)
+    keys, values = columns["keys"][pairs], columns["values"][pairs]
+    used = np.unique(np.concatenate([keys, values]))
+    string_sizes = np.diff(string_offsets)[used]
+    return {
+        "offsets": np.concatenate([np.zeros(1, dtype=np.uint64), np.cumsum(sizes, dtype=np.uint64)]),
+        "keys": np.searchsorted(used, keys),
+        "values": np.searchsorted(used, values),
+        "strings": columns["strings"][_ranges(string_offsets[:-1][used], string_sizes)],
+        "string_offsets": np.concatenate([np.zeros(1, dtype=np.uint64), np.cumsum(string_sizes, dtype=np.uint64)]),
+        "record_ids": record_ids[keep],
+        "released": np.empty(0, dtype=np.uint64),
+    }
+
+
+def _read_meta(directory: str) -> Optional[Dict[str, int]]:
+    """The committed length of each column and the next record ID, or None if `directory` holds no table."""
+    try:
+        with open(os.path.join(directory, META_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_meta(directory: str, lengths: Dict[str, int]):
+    tmp = os.path.join(directory, META_FILE + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(lengths, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(directory, META_FILE))
@@ -0,0 +1,284 @@
+"""
+Precomputed counts for aggregation questions.
+
+Every parsed log entry is counted as it is ingested, keyed by its time bucket
+(ROLLUP_BUCKET_SECONDS) and its level, status, pod, event, reason and node.
+Counts are kept per source file so a rotated-away, truncated or deleted file
+can be subtracted again. Questions such as "how many 500s per pod in the last
+hour" or "top 5 pods by error count" are answered from these counts in
+milliseconds, exactly, where retrieval would only ever see k chunks.
+
+The router is deliberately conservative: a question is only answered here if
+it asks for a count or ranking and every word in it is understood (counting
+words, dimension names, known field values, a time range). Anything else,
+including any "why" question, goes to the RAG chain.
+"""
+import math
+import re
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from hybrid_index import LEVEL_ALIASES, IP_PATTERN, tokenize
+from journaled import Journaled, load_journaled
+from time_range import (
+    BETWEEN_PATTERN, DAY_PATTERN, RELATIVE_PATTERN, SINCE_PATTERN, UNTIL_PATTERN, TimeRange, parse_time_range,
+)
+
+# Counted dimensions; IPs are left out (masked at ingest, and unbounded otherwise).
+DIMENSIONS = ("level", "status", "pod", "event", "reason", "node")
+TIME_UNITS = {"minute": 60, "hour": 3600, "day": 86400}
+
+DIMENSION_WORDS = {
+    "level": "level", "levels": "level", "severity": "level", "severities": "level",
+    "status": "status", "statuses": "status", "code": "status", "codes": "status",
+    "pod": "pod", "pods": "pod", "event": "event", "events": "event",
+    "reason": "reason", "reasons": "reason", "node": "node", "nodes": "node",
+    "minute": "minute", "minutes": "minute", "hour": "hour", "hours": "hour", "hourly": "hour",
+    "day": "day", "days": "day", "daily": "day",
+}
+# Counting and filler words a question may contain and still be answered from counts alone.
+AGGREGATION_WORDS = {
+    "how", "many", "count", "counts", "number", "numbers", "total", "totals", "top", "most", "least", "fewest",
+    "common", "frequent", "breakdown", "distribution", "per", "by", "each", "every", "across", "group", "grouped",
+    "which", "what", "were", "was", "are", "is", "there", "did", "do", "does", "have", "has", "had", "got",
+    "the", "a", "an", "in", "on", "at", "for", "with", "from", "of", "to", "and", "or", "all", "me", "show",
+    "give", "list", "logged", "log", "logs", "entries", "entry", "lines", "line", "messages", "message",
+    "records", "occurrences", "times", "requests", "request", "responses", "response", "returned", "seen",
+    "last", "past", "previous", "between", "since", "after", "before", "until", "today", "yesterday",
+    "second", "seconds", "sec", "min", "mins", "hr", "hrs", "week", "weeks", "one",
+}
+COUNT_INTENT = re.compile(r"\b(how many|count|number of|top|most|least|fewest|breakdown|distribution|per|by)\b", re.I)
+OPEN_ENDED = re.compile(r"\b(why|explain|cause[ds]?|what happened|how come|describe|summari[sz]e)\b", re.I)
+GROUP_PATTERN = re.compile(
+    r"\b(?:per|by|each|every|across|which|top(?:\s+\d+)?|most\s+common|least\s+common)\s+(status\s+codes?|\w+)", re.I
+)
+TOP_PATTERN = re.compile(r"\btop\s+(\d+)\b", re.I)
+STATUS_PATTERN = re.compile(r"\b([1-5])(\d\d|xx)s?\b", re.I)
+NUMERIC_TOKEN = re.compile(r"[\d:.\-+tz]+")
+
+# (bucket start in epoch seconds or None when undated, (level, status, pod, event, reason, node))
+Key = Tuple[Optional[int], Tuple[str, ...]]
+
+
+class Aggregation(NamedTuple):
+    """A question understood as a count: filters, an optional grouping and ordering."""
+    filters: Dict[str, Set[str]]
+    group_by: Optional[str]  # a dimension, a time unit, or None for a single total
+    limit: Optional[int]
+    ascending: bool
+
+
+class Rollups(Journaled):
+    """Entry counts per source file, time bucket and dimension values."""
+
+    def __init__(self, bucket_seconds: int = 60):
+        self.bucket_seconds = bucket_seconds
+        self.files: Dict[str, Counter] = {}
+        # Every value seen per dimension, for recognising them in questions.
+        self.values: Dict[str, Set[str]] = {dimension: set() for dimension in DIMENSIONS}
+        self._lock = threading.Lock()
+        self._init_journal()
+
+    def __getstate__(self):
+        state = self._journal_state(self.__dict__.copy())
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._init_journal()
+
+    def _apply(self, op):
+        if op[0] == "add":
+            self._count(op[1], op[2], op[3])
+        elif op[0] == "subtract":
+            self._uncount(op[1], op[2])
+        else:
+            self.drop(op[1])
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(sum(counts.values()) for counts in self.files.values())
+
+    # --- Maintenance ---
+
+    def _key(self, metadata: Dict) -> Key:
+        ts = metadata.get("timestamp")
+        bucket = None
+        if ts:
+            epoch = datetime.fromisoformat(ts).timestamp()
+            bucket = int(epoch // self.bucket_seconds) * self.bucket_seconds
+        return bucket, tuple(str(metadata.get(dimension, "")).lower() for dimension in DIMENSIONS)
+
+    def add(self, file_key: str, metadata: Dict, count: int = 1):
+        """Counts one parsed entry (its Document metadata) from the file with manifest key `file_key`."""
+        self._count(file_key, self._key(metadata), count)
+
+    def _count(self, file_key: str, key: Key, count: int):
+        with self._lock:
+            self._record(("add", file_key, key, count))
+            self.files.setdefault(file_key, Counter())[key] += count
+            for dimension, value in zip(DIMENSIONS, key[1]):
+                if value:
+                    self.values[dimension].add(value)
+
+    def subtract(self, file_key: str, metadata: Dict):
+        """Uncounts an entry that will be parsed (and counted) again."""
+        self._uncount(file_key, self._key(metadata))
+
+    def _uncount(self, file_key: str, key: Key):
+        with self._lock:
+            self._record(("subtract", file_key, key))
+            counts = self.files.get(file_key)
+            if counts is not None and counts[key] > 0:
+                counts[key] -= 1
+                if not counts[key]:
+                    del counts[key]
+
+    def drop(self, file_keys: Iterable[str]):
+        """Forgets every count from the given files."""
+        file_keys = list(file_keys)
+        with self._lock:
+            self._record(("drop", file_keys))
+            for file_key in file_keys:
+                self.files.pop(file_key, None)
+
+    # --- Querying ---
+
+    def count(self, filters: Dict[str, Set[str]], time_range: Optional[TimeRange] = None,
+              group_by: Optional[str] = None, utc_offset: float = 0.0) -> Counter:
+        """
+        Entries matching every filter (any value within a field) and, if given,
+        in a bucket overlapping `time_range`, per value of `group_by`: a
+        dimension (entries without a value are left out), a time unit (group
+        start in epoch seconds, aligned in the logs' `utc_offset`), or None for
+        a single total under "".
+        """
+        positions = [(DIMENSIONS.index(field), values) for field, values in filters.items()]
+        dimension = DIMENSIONS.index(group_by) if group_by in DIMENSIONS else None
+        unit = max(TIME_UNITS[group_by], self.bucket_seconds) if group_by in TIME_UNITS else None
+        result = Counter()
+        with self._lock:
+            for counts in self.files.values():
+                for (bucket, values), n in counts.items():
+                    if time_range is not None and (
+                            bucket is None or bucket > time_range[1] or bucket + self.bucket_seconds <= time_range[0]):
+                        continue
+                    if any(values[i] not in allowed for i, allowed in positions):
+                        continue
+                    if dimension is not None:
+                        if values[dimension]:
+                            result[values[dimension]] += n
+                    elif unit is not None:
+                        if bucket is not None:
+                            result[(bucket + utc_offset) // unit * unit - utc_offset] += n
+                    else:
+                        result[""] += n
+        return result
+
+    def parse(self, question: str) -> Optional[Aggregation]:
+        """Reads a count or top-N question, or returns None if it needs the RAG chain."""
+        if not COUNT_INTENT.search(question) or OPEN_ENDED.search(question) or IP_PATTERN.search(question):
+            return None
+        # Time expressions are handled by parse_time_range; their words aren't filters.
+        text = question
+        for pattern in (BETWEEN_PATTERN, RELATIVE_PATTERN, SINCE_PATTERN, UNTIL_PATTERN, DAY_PATTERN):
+            text = pattern.sub(" ", text)
+
+        group_by = None
+        for match in GROUP_PATTERN.finditer(text):
+            word = match.group(1).lower().split()[0]
+            if word in DIMENSION_WORDS:
+                group_by = DIMENSION_WORDS[word]
+                break
+
+        filters: Dict[str, Set[str]] = {}
+        statuses = set()
+        for klass, rest in STATUS_PATTERN.findall(text):
+            if rest.lower() == "xx":
+                statuses.update(v for v in self.values["status"] if v.startswith(klass))
+                statuses.add(f"{klass}xx")  # keeps the filter (matching nothing) when no such status was seen
+            else:
+                statuses.add(klass + rest)
+        text = STATUS_PATTERN.sub(" ", text)
+
+        for token in tokenize(text):
+            if token in LEVEL_ALIASES:
+                filters.setdefault("level", set()).add(LEVEL_ALIASES[token])
+            elif token in AGGREGATION_WORDS or token in DIMENSION_WORDS or NUMERIC_TOKEN.fullmatch(token):
+                continue
+            else:
+                fields = [field for field in ("pod", "event", "reason", "node") if token in self.values[field]]
+                if not fields:
+                    return None  # a word counts can't account for
+                for field in fields:
+                    filters.setdefault(field, set()).add(token)
+        if statuses:
+            filters["status"] = statuses
+
+        top = TOP_PATTERN.search(question)
+        return Aggregation(filters, group_by, int(top.group(1)) if top else None,
+                           bool(re.search(r"\b(least|fewest)\b", question, re.I)))
+
+    def answer(self, question: str, time_range: Optional[TimeRange], reference: Optional[datetime],
+               default_limit: int = 10) -> Optional[Dict]:
+        """
+        Answers an aggregation question as a QueryResponse with a table of
+        counts, or returns None if it isn't one. `reference` anchors relative
+        time ranges, as in retrieval.
+        """
+        aggregation = self.parse(question)
+        if aggregation is None:
+            return None
+        if time_range is None and reference is not None:
+            time_range = parse_time_range(question, reference)
+        tz = reference.tzinfo if reference is not None else timezone.utc
+        utc_offset = reference.utcoffset().total_seconds() if reference is not None else 0.0
+        counts = self.count(aggregation.filters, time_range, aggregation.group_by, utc_offset)
+        total = sum(counts.values())
+
+        scope = ", ".join(f"{field}={'|'.join(sorted(values))}" for field, values in aggregation.filters.items())
+        scope = f" matching {scope}" if scope else ""
+        if time_range is not None:
+            scope += f" {_describe_range(time_range, tz)}"
+        summary = f"{total} log entries{scope}."
+
+        group_by = aggregation.group_by
+        if group_by is None:
+            return {"summary": summary, "evidence": [_table(["entries"], [[total]])]}
+
+        if group_by in TIME_UNITS:
+            rows = [[_format_time(start, tz), n] for start, n in sorted(counts.items())]
+        else:
+            ordered = sorted(counts.items(), key=lambda item: (item[1], item[0]) if aggregation.ascending
+                             else (-item[1], item[0]))
+            rows = [[value, n] for value, n in ordered]
+        if aggregation.limit is not None or group_by not in TIME_UNITS:
+            rows = rows[:aggregation.limit or default_limit]
+        if rows and group_by not in TIME_UNITS:
+            summary += " " + ", ".join(f"{value}: {n}" for value, n in rows[:5]) + "."
+        return {"summary": summary, "evidence": [_table([group_by, "entries"], rows)]}
+
+    @staticmethod
+    def load(path: str) -> "Rollups":
+        return load_journaled(path)
+
+
+def _table(headers: List[str], rows: List[List]) -> Dict:
+    return {"type": "table", "content": {"headers": headers, "rows": rows}}
+
+
+def _format_time(epoch: float, tz) -> str:
+    return datetime.fromtimestamp(epoch, tz).isoformat(timespec="minutes")
+
+
+def _describe_range(time_range: TimeRange, tz) -> str:
+    start, end = time_range
+    if math.isinf(start):
+        return f"until {_format_time(end, tz)}"
+    if math.isinf(end):
+        return f"since {_format_time(start, tz)}"
+    return f"between {_format_time(start, tz)} and {_format_time(end, tz)}"
@@ -1,11 +1,17 @@
 from pydantic import BaseModel
-from typing import List, Dict, Any, Union
+from typing import List, Dict, Any, Literal, Optional, Union
 
 class QueryRequest(BaseModel):
     query: str
+    # Optional ISO 8601 bounds; without them a range is parsed from the query text, if it names one.
+    start_time: Optional[str] = None
+    end_time: Optional[str] = None
+    # LLM scheduling priority; by default "high" for streamed queries and "normal" otherwise.
+    priority: Optional[Literal["high", "normal", "low"]] = None
 
 class Evidence(BaseModel):
     type: str  # e.g., 'log', 'table'
+    # Tables carry {"headers": [...], "rows": [[...], ...]}.
     content: Union[str, Dict[str, Any]]
 
 class QueryResponse(BaseModel):
@@ -1,4 +1,12 @@
+import hashlib
+import hmac
+import json
+import os
 import re
+import secrets
+from typing import Dict, Iterable, List, Mapping, Optional
+
+from config import REDACTION_KEY, REDACTION_KEY_FILE, REDACTION_PATTERNS
 
 # Simple regex patterns for common sensitive data
 PATTERNS = {
@@ -7,8 +15,163 @@ PATTERNS = {
     "uuid": r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b"
 }
 
+
+def _has_top_level_branch(pattern: str) -> bool:
+    """Whether a regex has a "|" outside any group or character class."""
+    depth, in_class, i = 0, False, 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\":
+            i += 1
+        elif in_class:
+            in_class = c != "]"
+        elif c == "[":
+            in_class = True
+            if pattern[i + 1:i + 2] == "]":
+                i += 1  # a leading "]" is a literal
+        elif c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c == "|" and depth == 0:
+            return True
+        i += 1
+    return False
+
+
+class Redactor:
+    """
+    Masks every pattern of a set in one scan. The patterns are compiled into a
+    single alternation of named groups, so each string is read once however
+    many patterns there are; where two patterns match at the same position,
+    the one listed first wins. Each match becomes "[NAME_MASKED]".
+    """
+
+    def __init__(self, patterns: Mapping[str, str]):
+        if not patterns:
+            raise ValueError("Redactor needs at least one pattern.")
+        self._labels: Dict[str, str] = {}
+        alternatives: List[str] = []
+        bounded: List[str] = []
+        for i, (name, pattern) in enumerate(patterns.items()):
+            re.compile(pattern)  # report a bad pattern by itself rather than inside the alternation
+            group = f"_p{i}"
+            self._labels[group] = f"[{name.upper()}_MASKED]"
+            # Neighbouring patterns that start with \b share one boundary test, which
+            # roughly halves the work at each position for the built-in set.
+            if pattern.startswith(r"\b") and not _has_top_level_branch(pattern):
+                bounded.append(f"(?P<{group}>{pattern[2:]})")
+                continue
+            if bounded:
+                alternatives.append(r"\b(?:" + "|".join(bounded) + ")")
+                bounded = []
+            alternatives.append(f"(?P<{group}>{pattern})")
+        if bounded:
+            alternatives.append(r"\b(?:" + "|".join(bounded) + ")")
+        self.pattern = re.compile("|".join(alternatives))
+        self._sub = self.pattern.sub
+
+    def _replace(self, match: "re.Match") -> str:
+        return self._labels[match.lastgroup]
+
+    def redact(self, text: str) -> str:
+        return self._sub(self._replace, text)
+
+    def redact_batch(self, texts: Iterable[str]) -> List[str]:
+        """Redacts a list of strings."""
+        sub, replace = self._sub, self._replace
+        return [sub(replace, text) for text in texts]
+
+
+def load_patterns(extra: Optional[str] = REDACTION_PATTERNS) -> Dict[str, str]:
+    """
+    The built-in patterns plus user-defined ones. `extra` is a JSON object of
+    {name: regex}, or a path to a JSON file holding one; a name that already
+    exists replaces that built-in pattern.
+    """
+    patterns = dict(PATTERNS)
+    if extra:
+        extra = extra.strip()
+        if not extra.startswith("{"):
+            with open(extra, encoding="utf-8") as f:
+                extra = f.read()
+        patterns.update(json.loads(extra))
+    return patterns
+
+
+default_redactor = Redactor(load_patterns())
+
+
 def mask_sensitive_data(text: str) -> str:
     """Masks common sensitive data patterns in a string."""
-    for key, pattern in PATTERNS.items():
-        text = re.sub(pattern, f"[{key.upper()}_MASKED]", text)
-    return text
\ No newline at end of file
+    return default_redactor.redact(text)
+
+
+def mask_sensitive_batch(texts: Iterable[str]) -> List[str]:
+    """Masks common sensitive data patterns in each of a list of strings."""
+    return default_redactor.redact_batch(texts)
+
+
+_ip_key: Optional[bytes] = None
+
+
+def _load_ip_key() -> bytes:
+    """REDACTION_KEY, or the key in REDACTION_KEY_FILE, creating that file if it doesn't exist yet."""
+    if REDACTION_KEY:
+        return REDACTION_KEY.encode("utf-8")
+    if not os.path.exists(REDACTION_KEY_FILE):
+        os.makedirs(os.path.dirname(REDACTION_KEY_FILE) or ".", exist_ok=True)
+        tmp = f"{REDACTION_KEY_FILE}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(secrets.token_hex(32))
+        os.chmod(tmp, 0o600)
+        try:
+            # link() fails if another process got there first, so every process ends up with one key.
+            os.link(tmp, REDACTION_KEY_FILE)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp)
+    with open(REDACTION_KEY_FILE, encoding="utf-8") as f:
+        return f.read().strip().encode("utf-8")
+
+
+def ip_token(ip: str) -> str:
+    """
+    A stable stand-in for an IP address: the same address always gives the
+    same token, but the address can't be read back (or brute-forced) without
+    the key. Used for the indexed `ip` field, and for IPs in questions.
+    """
+    global _ip_key
+    if _ip_key is None:
+        _ip_key = _load_ip_key()
+    return "ip-" + hmac.new(_ip_key, ip.encode("utf-8"), hashlib.sha256).hexdigest()[:16]
+
+
+# Characters that can appear inside a masked pattern. A secret never spans any
+# other character, so text up to the last such "break" can be masked safely.
+_SECRET_CHARS = re.compile(r"[A-Za-z0-9._%+\-@|]*\Z")
+
+
+class StreamMasker:
+    """
+    Masks a text stream chunk by chunk. The trailing run of characters that
+    could still be the start of an IP, email or UUID is held back until a
+    character that can't belong to one arrives (or the stream ends), so a
+    secret split across chunks is never emitted partially unmasked.
+    """
+
+    def __init__(self):
+        self._pending = ""
+
+    def feed(self, text: str) -> str:
+        """Adds a chunk and returns whatever is now safe to emit, masked."""
+        self._pending += text
+        cut = _SECRET_CHARS.search(self._pending).start()
+        ready, self._pending = self._pending[:cut], self._pending[cut:]
+        return mask_sensitive_data(ready) if ready else ""
+
+    def flush(self) -> str:
+        """Returns the held-back remainder, masked, at the end of the stream."""
+        ready, self._pending = self._pending, ""
+        return mask_sensitive_data(ready) if ready else ""
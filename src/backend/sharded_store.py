@@ -0,0 +1,420 @@
+"""
+Time-partitioned vector storage.
+
+Vectors are kept in one FAISS index per time bucket (an hour or a day of log
+time, in UTC), saved under `<store>/shards/<bucket>/`. Entries without a
+timestamp share an "undated" shard. Shards are loaded on first use and the
+least recently used clean ones are dropped once more than `max_loaded` are in
+memory, so memory follows the shards queries actually touch rather than the
+whole history. A shard is saved as its FAISS index plus a docstore in the
+mapped layout of mapped_docstore.py. With `mmap`, shards are opened read-only
+through memory maps and only copied into private memory when they are written
+to, so several processes serving one store share its pages. A small catalog
+records each shard's size, index type and generation (a new one per write),
+and which shard holds every vector ID; a process following another's saves
+rereads it and drops only the shards whose generation changed.
+
+Each shard starts as an exact flat index, or directly as the configured index
+type if that needs no training (e.g. HNSW). Once a shard holds `train_min`
+vectors it is rebuilt as the configured type, trained on a sample of its own
+vectors.
+"""
+import math
+import os
+import pickle
+import shutil
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence, Set, Tuple
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from mapped_docstore import MappedDocstore, MappedIds, MappedPositions, save_mapped
+from ann_index import (
+    FLAT, build_index, compacts_on_remove, needs_training, rebuild_without, reconstruct_all, search_parameters,
+)
+
+SHARDS_DIR = "shards"
+CATALOG_FILE = "shards.pkl"
+UNDATED = "undated"
+
+# A lazy open that races a save in another process tries this often before giving up.
+READ_ATTEMPTS = 50
+READ_RETRY_SECONDS = 0.02
+
+_BUCKET_FORMATS = {"hour": ("%Y%m%dT%H", timedelta(hours=1)), "day": ("%Y%m%d", timedelta(days=1))}
+
+
+class _Shard:
+    """One bucket's FAISS store, which may or may not currently be in memory."""
+
+    def __init__(self, name: str, factory: str = FLAT):
+        self.name = name
+        self.factory = factory  # FAISS index type currently in use
+        self.count = 0
+        self.generation: Optional[str] = None  # changes every time the shard is written
+        self.dirty = False
+        self.store: Optional[FAISS] = None
+        self.mapped = False  # store is read-only, backed by the saved files
+        # Docstore ID -> FAISS row, for restricting searches to candidate IDs.
+        self.positions: Mapping[str, int] = {}
+
+    def index_positions(self):
+        self.positions = {doc_id: row for row, doc_id in self.store.index_to_docstore_id.items()}
+
+    def __getstate__(self):
+        return {"name": self.name, "factory": self.factory, "count": self.count, "generation": self.generation}
+
+    def __setstate__(self, state):
+        self.__init__(state["name"], state.get("factory", FLAT))
+        self.count = state["count"]
+        self.generation = state.get("generation")
+
+
+class ShardedVectorStore:
+    """A set of per-time-bucket FAISS stores behind one add/delete/search interface."""
+
+    def __init__(self, path: str, embeddings, granularity: str = "hour", max_loaded: int = 8,
+                 index_factory: str = FLAT, train_min: int = 50000, train_sample: int = 100000,
+                 nprobe: int = 16, ef_search: int = 64, mmap: bool = False):
+        if granularity not in _BUCKET_FORMATS:
+            raise ValueError(f"Unknown shard granularity '{granularity}'; use 'hour' or 'day'.")
+        self.path = path
+        self.embeddings = embeddings
+        self.granularity = granularity
+        self.max_loaded = max_loaded
+        self.index_factory = index_factory
+        self.train_min = train_min
+        self.train_sample = train_sample
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.mmap = mmap
+        self.shards: Dict[str, _Shard] = {}
+        self.locations: Dict[str, str] = {}
+        self._loaded: "OrderedDict[str, _Shard]" = OrderedDict()
+        self._removed: List[str] = []
+        self._catalog_seen: Optional[int] = None  # mtime of the catalog last read or written
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, CATALOG_FILE))
+
+    @classmethod
+    def load(cls, path: str, embeddings, granularity: str = "hour", max_loaded: int = 8, **options) -> "ShardedVectorStore":
+        """
+        Reads the catalog only; shard data is loaded lazily. Shards keep the index
+        type they were saved with until they are next rebuilt.
+        """
+        store = cls(path, embeddings, granularity, max_loaded, **options)
+        catalog = store._read_catalog()
+        store.shards = {shard.name: shard for shard in catalog["shards"]}
+        store.locations = catalog["locations"]
+        return store
+
+    def _read_catalog(self) -> Dict:
+        catalog_path = os.path.join(self.path, CATALOG_FILE)
+        with open(catalog_path, "rb") as f:
+            self._catalog_seen = os.fstat(f.fileno()).st_mtime_ns
+            catalog = pickle.load(f)
+        if catalog["granularity"] != self.granularity:
+            raise ValueError(f"Store was sharded by {catalog['granularity']}, not {self.granularity}; rebuild it to change.")
+        return catalog
+
+    def follow(self) -> bool:
+        """
+        Picks up a save made by another process: rereads the catalog and drops
+        the shards it rewrote or removed, which are read again on next use.
+        Returns whether any shard changed. Only for stores not written locally.
+        """
+        try:
+            if os.stat(os.path.join(self.path, CATALOG_FILE)).st_mtime_ns == self._catalog_seen:
+                return False
+        except FileNotFoundError:
+            return False
+        catalog = self._read_catalog()
+        shards = {}
+        for shard in catalog["shards"]:
+            current = self.shards.get(shard.name)
+            keep = current is not None and current.generation == shard.generation and current.count == shard.count
+            shards[shard.name] = current if keep else shard
+        changed = shards.keys() != self.shards.keys() or any(shards[name] is not self.shards[name] for name in shards)
+        for name in list(self._loaded):
+            if shards.get(name) is not self._loaded[name]:
+                del self._loaded[name]
+        self.shards, self.locations = shards, catalog["locations"]
+        return changed
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.locations
+
+    # --- Buckets ---
+
+    def bucket_of(self, metadata: Dict) -> str:
+        ts = metadata.get("timestamp")
+        if not ts:
+            return UNDATED
+        fmt, _ = _BUCKET_FORMATS[self.granularity]
+        return datetime.fromisoformat(ts).astimezone(timezone.utc).strftime(fmt)
+
+    def bucket_bounds(self, name: str) -> Tuple[float, float]:
+        """Epoch-second span covered by a bucket (unbounded for the undated shard)."""
+        if name == UNDATED:
+            return -math.inf, math.inf
+        fmt, width = _BUCKET_FORMATS[self.granularity]
+        start = datetime.strptime(name, fmt).replace(tzinfo=timezone.utc)
+        return start.timestamp(), (start + width).timestamp()
+
+    def overlapping(self, start: float, end: float) -> List[str]:
+        """Dated shards whose span intersects [start, end]."""
+        names = []
+        for name in self.shards:
+            if name == UNDATED:
+                continue
+            low, high = self.bucket_bounds(name)
+            if low <= end and high > start:
+                names.append(name)
+        return names
+
+    # --- Shard cache ---
+
+    def _shard_dir(self, name: str) -> str:
+        return os.path.join(self.path, SHARDS_DIR, name)
+
+    def _open(self, name: str, writable: bool = False) -> _Shard:
+        """
+        Returns a shard with its store in memory, loading it and evicting cold
+        shards as needed. Reads get the mapped store when `mmap` is set; a
+        `writable` open replaces it with a private copy.
+        """
+        shard = self.shards.get(name)
+        if shard is None:
+            shard = self.shards[name] = _Shard(name)
+        if shard.mapped and writable:
+            shard.store, shard.mapped = None, False
+        if shard.store is None and shard.count:
+            self._read_shard(shard, mapped=self.mmap and not writable)
+        self._loaded[name] = shard
+        self._loaded.move_to_end(name)
+        self._evict()
+        return shard
+
+    def _read_shard(self, shard: _Shard, mapped: bool):
+        """
+        Loads a shard's saved files, mapped read-only or into private memory.
+        Another process may be swapping in a newer copy (see _write_shard): if
+        the directory is missing or changes while it is read, it is read again.
+        """
+        directory = self._shard_dir(shard.name)
+        for attempt in range(READ_ATTEMPTS):
+            try:
+                before = os.stat(directory).st_ino
+                docstore = MappedDocstore(directory)
+                flags = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY if mapped else 0
+                index = faiss.read_index(os.path.join(directory, "index.faiss"), flags)
+                if os.stat(directory).st_ino == before:
+                    break
+            except (FileNotFoundError, RuntimeError):  # faiss raises RuntimeError for a missing file
+                if attempt == READ_ATTEMPTS - 1:
+                    raise
+            time.sleep(READ_RETRY_SECONDS)
+        else:
+            raise RuntimeError(f"Shard {shard.name} kept changing while it was read.")
+
+        if mapped:
+            shard.store = FAISS(self.embeddings, index, docstore, MappedIds(docstore))
+            shard.positions = MappedPositions(docstore)
+        else:
+            ids = {row: docstore.id_at(row) for row in range(len(docstore))}
+            documents = InMemoryDocstore({doc_id: docstore.document(row) for row, doc_id in ids.items()})
+            shard.store = FAISS(self.embeddings, index, documents, ids)
+            shard.index_positions()
+        shard.mapped = mapped
+
+    def _evict(self):
+        # Shards with unsaved changes stay resident until the next save().
+        for name in list(self._loaded):
+            if len(self._loaded) <= self.max_loaded:
+                break
+            shard = self._loaded[name]
+            if not shard.dirty:
+                shard.store, shard.positions, shard.mapped = None, {}, False
+                del self._loaded[name]
+
+    def loaded_shards(self) -> List[str]:
+        return list(self._loaded)
+
+    # --- Data ---
+
+    def add(self, ids: Sequence[str], chunks: Sequence[Document], vectors: Sequence[Sequence[float]]):
+        groups: Dict[str, List[int]] = {}
+        for i, chunk in enumerate(chunks):
+            groups.setdefault(self.bucket_of(chunk.metadata), []).append(i)
+
+        for name, members in groups.items():
+            shard = self._open(name, writable=True)
+            group_ids = [ids[i] for i in members]
+            text_embeddings = [(chunks[i].page_content, vectors[i]) for i in members]
+            metadatas = [chunks[i].metadata for i in members]
+            if shard.store is None:
+                dim = len(vectors[members[0]])
+                shard.factory = FLAT if needs_training(self.index_factory, dim) else self.index_factory
+                shard.store = FAISS(self.embeddings, faiss.index_factory(dim, shard.factory), InMemoryDocstore(), {})
+            start = shard.store.index.ntotal
+            shard.store.add_embeddings(text_embeddings, metadatas=metadatas, ids=group_ids)
+            shard.positions.update((doc_id, start + i) for i, doc_id in enumerate(group_ids))
+            shard.count += len(group_ids)
+            shard.dirty = True
+            self.locations.update((doc_id, name) for doc_id in group_ids)
+            if shard.factory != self.index_factory and shard.count >= self.train_min:
+                self._convert(shard)
+
+    def _convert(self, shard: _Shard):
+        """Rebuilds a shard's index as the configured type, trained on its own vectors."""
+        vectors = reconstruct_all(shard.store.index)
+        shard.store.index = build_index(self.index_factory, vectors, self.train_sample)
+        print(f"Shard {shard.name}: rebuilt {shard.count} vectors from {shard.factory} as {self.index_factory}.")
+        shard.factory = self.index_factory
+
+    def get(self, doc_id: str) -> Optional[Document]:
+        name = self.locations.get(doc_id)
+        if name is None:
+            return None
+        doc = self._open(name).store.docstore.search(doc_id)
+        return doc if isinstance(doc, Document) else None
+
+    def delete(self, ids: Sequence[str]) -> List[Document]:
+        """Removes vectors by ID, returning the deleted Documents. Unknown IDs are ignored."""
+        groups: Dict[str, List[str]] = {}
+        for doc_id in ids:
+            name = self.locations.get(doc_id)
+            if name is not None:
+                groups.setdefault(name, []).append(doc_id)
+
+        deleted = []
+        for name, group_ids in groups.items():
+            shard = self._open(name, writable=True)
+            deleted.extend(d for d in (shard.store.docstore.search(i) for i in group_ids) if isinstance(d, Document))
+            if compacts_on_remove(shard.store.index):
+                shard.store.delete(group_ids)
+            else:
+                self._delete_by_rebuild(shard, set(group_ids))
+            # FAISS compacts its rows on removal, so every later position shifts.
+            shard.index_positions()
+            shard.count -= len(group_ids)
+            shard.dirty = True
+            for doc_id in group_ids:
+                del self.locations[doc_id]
+            if not shard.count:
+                del self.shards[name]
+                self._loaded.pop(name, None)
+                self._removed.append(name)
+        return deleted
+
+    @staticmethod
+    def _delete_by_rebuild(shard: _Shard, ids: Set[str]):
+        """Deletes from index types that can't renumber rows on removal by re-adding the survivors."""
+        store = shard.store
+        keep = [row for row in range(store.index.ntotal) if store.index_to_docstore_id[row] not in ids]
+        rebuild_without(store.index, keep)
+        store.index_to_docstore_id = {i: store.index_to_docstore_id[row] for i, row in enumerate(keep)}
+        store.docstore.delete(list(ids))
+
+    def iter_documents(self) -> Iterator[Tuple[str, Document]]:
+        """Yields every (ID, Document), one shard at a time."""
+        for name in list(self.shards):
+            store = self._open(name).store
+            for row in range(store.index.ntotal):
+                doc_id = store.index_to_docstore_id[row]
+                yield doc_id, store.docstore.search(doc_id)
+
+    def search(self, embedding: Sequence[float], k: int, buckets: Optional[Sequence[str]] = None,
+               candidate_ids: Optional[Sequence[str]] = None) -> List[str]:
+        """
+        Nearest IDs to `embedding` across the given buckets (all by default),
+        optionally restricted to `candidate_ids`. Each shard returns its own top
+        `k` and the lists are merged by distance.
+        """
+        allowed: Optional[Dict[str, List[str]]] = None
+        if candidate_ids is not None:
+            allowed = {}
+            for doc_id in candidate_ids:
+                name = self.locations.get(doc_id)
+                if name is not None:
+                    allowed.setdefault(name, []).append(doc_id)
+        names = list(buckets) if buckets is not None else list(self.shards)
+        if allowed is not None:
+            names = [name for name in names if name in allowed]
+
+        query = np.array([embedding], dtype=np.float32)
+        results: List[Tuple[float, str]] = []
+        for name in names:
+            if name not in self.shards:
+                continue
+            shard = self._open(name)
+            if shard.store._normalize_L2:
+                query = query.copy()
+                faiss.normalize_L2(query)
+            selector, shard_k = None, min(k, shard.store.index.ntotal)
+            if allowed is not None:
+                rows = np.array([shard.positions[doc_id] for doc_id in allowed[name]], dtype=np.int64)
+                selector = faiss.IDSelectorBatch(rows)
+                shard_k = min(shard_k, len(rows))
+            if shard_k <= 0:
+                continue
+            params = search_parameters(shard.store.index, self.nprobe, self.ef_search, selector)
+            distances, rows = shard.store.index.search(query, shard_k, params=params)
+            results.extend((float(d), shard.store.index_to_docstore_id[int(r)])
+                           for d, r in zip(distances[0], rows[0]) if r != -1)
+        # Every shard is a default (L2) FAISS store, so smaller distances are closer.
+        results.sort(key=lambda item: item[0])
+        return [doc_id for _, doc_id in results[:k]]
+
+    # --- Persistence ---
+
+    def save(self):
+        """Writes changed shards, drops emptied ones, then writes the catalog."""
+        os.makedirs(self.path, exist_ok=True)
+        for shard in self.shards.values():
+            if shard.dirty and shard.store is not None:
+                self._write_shard(shard)
+                shard.dirty = False
+        for name in self._removed:
+            if name not in self.shards:
+                shutil.rmtree(self._shard_dir(name), ignore_errors=True)
+        self._removed = []
+
+        catalog = {"granularity": self.granularity, "index_factory": self.index_factory, "shards": list(self.shards.values()), "locations": self.locations}
+        tmp_path = os.path.join(self.path, CATALOG_FILE + ".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(catalog, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, os.path.join(self.path, CATALOG_FILE))
+        self._catalog_seen = os.stat(os.path.join(self.path, CATALOG_FILE)).st_mtime_ns
+        self._evict()
+
+    def _write_shard(self, shard: _Shard):
+        """
+        Saves a shard (its FAISS index and mapped docstore) beside its old
+        files and swaps the directories, so other processes that have the old
+        files mapped keep reading a consistent copy.
+        """
+        directory = self._shard_dir(shard.name)
+        tmp, old = directory + ".tmp", directory + ".old"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        shard.generation = uuid.uuid4().hex
+        faiss.write_index(shard.store.index, os.path.join(tmp, "index.faiss"))
+        save_mapped(tmp, shard.store)
+        if os.path.exists(directory):
+            shutil.rmtree(old, ignore_errors=True)
+            os.rename(directory, old)
+        os.rename(tmp, directory)
+        shutil.rmtree(old, ignore_errors=True)
@@ -0,0 +1,92 @@
+"""
+Synthetic logs in the five formats the parser supports, for the benchmarks.
+
+Entries are generated from a seeded RNG in the shapes our services emit, so a
+given seed and scale always produce the same corpus. About one entry in a
+hundred is unusual (quoted values, values with spaces) to exercise the
+parsers' fallbacks, and about a third carry an IP, email or UUID to redact.
+"""
+import json
+import os
+import random
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional
+
+LEVELS = ("DEBUG", "INFO", "INFO", "INFO", "WARN", "ERROR")
+EVENTS = ("dispatch", "db_save", "cache_miss", "retry", "kube_event")
+
+
+def _timestamp(rng: random.Random) -> str:
+    return f"2025-09-13T{rng.randrange(24):02d}:{rng.randrange(60):02d}:{rng.randrange(60):02d}.{rng.randrange(10**6):06d}+05:30"
+
+
+def _ip(rng: random.Random) -> str:
+    return ".".join(str(rng.randrange(256)) for _ in range(4))
+
+
+def apache(rng: random.Random, i: int) -> str:
+    request = f"GET /api/v1/items/{i} HTTP/1.1"
+    if i % 100 == 0:
+        request = 'GET /search?q="a" b HTTP/1.1'  # quoted request: regex fallback
+    return (f'{_ip(rng)} - - [12/Sep/2025:{rng.randrange(24):02d}:{rng.randrange(60):02d}:{rng.randrange(60):02d} +0530] '
+            f'"{request}" {rng.choice((200, 200, 201, 404, 500, 503))} {rng.randrange(99999)} "web-ui-{i % 40}" "{rng.choice(LEVELS)}"')
+
+
+def singleline(rng: random.Random, i: int) -> str:
+    details = f"event={rng.choice(EVENTS)} | job=job-{i} | to=python-infer | attempts={rng.randrange(5)}"
+    if i % 100 == 0:
+        details += " | msg=took 3 retries"  # value with spaces: regex fallback
+    return f"{_timestamp(rng)} | orchestrator-eval-{i % 90} | {rng.choice(LEVELS)} | {details}"
+
+
+def keyval(rng: random.Random, i: int) -> str:
+    line = (f"ts={_timestamp(rng)} level={rng.choice(LEVELS)} pod=api-{i % 30} event={rng.choice(EVENTS)} "
+            f"status={rng.choice((200, 503))} latency_ms={rng.randrange(900)}")
+    if i % 3 == 0:
+        line += f" user=user{i}@example.com request_id={uuid.UUID(int=rng.getrandbits(128))}"
+    if i % 100 == 0:
+        line += ' user="o\'brien"'  # quoted value: regex fallback
+    return line
+
+
+def jsonl(rng: random.Random, i: int) -> str:
+    entry = {"timestamp": _timestamp(rng), "level": rng.choice(LEVELS), "service": f"billing-{i % 12}",
+             "event": rng.choice(EVENTS), "duration_ms": rng.randrange(2000), "client": {"ip": _ip(rng)}}
+    if i % 100 == 0:
+        entry["message"] = "payment retried after gateway timeout"
+    return json.dumps(entry)
+
+
+def pretty(rng: random.Random, i: int) -> str:
+    return (f"TIMESTAMP: {_timestamp(rng)}\nPOD: kube-agent-eval-{i % 200}\nLEVEL: {rng.choice(LEVELS)}\n"
+            f"EVENT: kube_event\nREASON: {rng.choice(('Evicted', 'OOMKilled', 'BackOff'))}\nNODE: node-{i % 8}")
+
+
+GENERATORS: Dict[str, Callable[[random.Random, int], str]] = {
+    "jsonl": jsonl, "apache": apache, "singleline": singleline, "keyval": keyval, "pretty": pretty,
+}
+# Named the way the services name them; detection sniffs the content either way.
+FILE_NAMES = {
+    "jsonl": "billing.jsonl", "apache": "access.apache", "singleline": "orchestrator-singleline.log",
+    "keyval": "api-keyval.log", "pretty": "kube-pretty.log",
+}
+
+
+def generate(fmt: str, count: int, seed: int = 0) -> List[str]:
+    """`count` entries of one format; pretty entries are multi-line blocks."""
+    rng = random.Random(seed)
+    make = GENERATORS[fmt]
+    return [make(rng, i) for i in range(count)]
+
+
+def write_corpus(directory: str, count: int, formats: Optional[Iterable[str]] = None, seed: int = 0) -> Dict[str, str]:
+    """Writes `count` entries of each format to its own file under `directory`; returns format -> path."""
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+    for fmt in formats or GENERATORS:
+        paths[fmt] = os.path.join(directory, FILE_NAMES[fmt])
+        separator = "\n\n" if fmt == "pretty" else "\n"  # pretty blocks end at a blank line
+        with open(paths[fmt], "w", encoding="utf-8") as f:
+            for entry in generate(fmt, count, seed):
+                f.write(entry + separator)
+    return paths
@@ -0,0 +1,228 @@
+"""
+Online log template mining (Drain-style).
+
+Log entries that differ only in variable fields (job IDs, IPs, attempt counts,
+timestamps) are grouped into templates with parameter slots. Only the first
+entry of each template is embedded; every later match just appends a compact
+(source, line, timestamp) occurrence, so the vector count scales with the
+number of distinct event types rather than with raw line count.
+
+Entries are routed by token count, by the values of a few fields that define
+what an event *is* (level, status, event, reason) and by their first token,
+then compared position by position with the templates in that group. A match
+above the similarity threshold merges into the template, turning positions
+that differ into parameter slots.
+"""
+import re
+import math
+import threading
+from array import array
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from journaled import Journaled, load_journaled
+from log_parser import extract_timestamp
+from record_store import parse_rendered
+
+PARAM = "<*>"
+
+# Field values kept verbatim and used for routing, so e.g. 200s and 503s never merge.
+PRESERVED_KEYS = ("level", "status", "event", "reason")
+
+# Tokens that are almost always variable.
+VARIABLE_TOKEN = re.compile(r"""^(
+      \d{1,3}(\.\d{1,3}){3}(:\d+)?                  # IPv4, optionally with a port
+    | [0-9a-fA-F]{8}(-[0-9a-fA-F]{4}){3}-[0-9a-fA-F]{12}   # UUID
+    | (0x)?(?=[0-9a-fA-F]*\d)(?=[0-9a-fA-F]*[a-fA-F])[0-9a-fA-F]{8,}  # long hex IDs
+    | -?\d{4,}                                     # long numbers
+    | -?\d+\.\d+                                   # decimals
+    | \d{4}-\d{2}-\d{2}[T\s][\d:.+\-Z]*              # ISO 8601 timestamps
+    | \d{2}/\w{3}/\d{4}:[\d:]+                       # Apache timestamps
+    | [A-Za-z][\w.]*([-_][A-Za-z][\w.]*)*[-_]\d+([-_.]\w+)*   # IDs with numeric parts: job-423, orchestrator-eval-64
+)$""", re.VERBOSE)
+
+
+_KEY_PARAM = "=" + PARAM
+
+
+def _mask(value: str) -> str:
+    return PARAM if VARIABLE_TOKEN.match(value) else value
+
+
+def _merge_token(mine: str, theirs: str) -> str:
+    """Generalises two differing tokens, keeping the key of `key=value` tokens."""
+    if mine == theirs:
+        return mine
+    key, sep, _ = mine.partition("=")
+    if sep and theirs.startswith(key + "="):
+        return key + _KEY_PARAM
+    return PARAM
+
+
+def tokenize(content: str) -> Tuple[List[str], Tuple[str, ...], Optional[datetime]]:
+    """
+    Splits Document content into masked tokens. Structured entries (rendered
+    `key=value` records) become one token per field; plain lines are split on
+    whitespace. Returns the tokens, the preserved field values used for
+    routing, and the entry's timestamp.
+    """
+    pairs = parse_rendered(content)
+    if pairs is not None:
+        parsed = dict(pairs)
+        tokens = [f"{key}={value if key in PRESERVED_KEYS else _mask(value)}" for key, value in pairs]
+        preserved = tuple(parsed.get(key, "") for key in PRESERVED_KEYS)
+        return tokens, preserved, extract_timestamp(parsed)
+
+    return [_mask(token) for token in content.split()], (), None
+
+
+class LogTemplate:
+    """A cluster of log entries sharing one template, with a compact list of where each occurred."""
+
+    def __init__(self, template_id: int, tokens: List[str]):
+        self.id = template_id
+        self.tokens = tokens
+        # Whether the representative entry currently has a vector in the index.
+        self.indexed = False
+        self.sources = array("I")
+        self.units = array("I")
+        self.timestamps = array("d")  # epoch seconds, NaN when unknown
+        self.first_seen = math.inf
+        self.last_seen = -math.inf
+
+    @property
+    def count(self) -> int:
+        return len(self.units)
+
+    @property
+    def text(self) -> str:
+        return " ".join(self.tokens)
+
+    def similarity(self, tokens: List[str]) -> Tuple[float, int]:
+        """Fraction of positions that match exactly, and the number of parameter slots."""
+        same = params = 0
+        for mine, theirs in zip(self.tokens, tokens):
+            if mine == theirs:
+                same += 1
+            elif mine == PARAM or (mine.endswith(_KEY_PARAM) and theirs.startswith(mine[:-len(PARAM)])):
+                params += 1
+        return same / len(tokens), params
+
+    def merge(self, tokens: List[str]):
+        self.tokens = [_merge_token(mine, theirs) for mine, theirs in zip(self.tokens, tokens)]
+
+
+class TemplateMiner(Journaled):
+    """Online template clustering over a stream of parsed log Documents."""
+
+    def __init__(self, sim_threshold: float = 0.5):
+        self.sim_threshold = sim_threshold
+        self.templates: List[LogTemplate] = []
+        self._groups: Dict[Tuple, List[int]] = {}
+        self._source_names: List[str] = []
+        self._source_ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._init_journal()
+
+    def __len__(self) -> int:
+        return len(self.templates)
+
+    def __getstate__(self):
+        state = self._journal_state(self.__dict__.copy())
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._init_journal()
+
+    def _apply(self, op):
+        if op[0] == "add":
+            self._add(*op[1:])
+        else:
+            self.mark_unindexed(op[1])
+
+    def add(self, doc: Document) -> Tuple[LogTemplate, bool]:
+        """
+        Assigns a Document to a template and records the occurrence. Returns the
+        template and whether its representative still needs to be embedded.
+        """
+        tokens, preserved, ts = tokenize(doc.page_content)
+        unit = doc.metadata.get("line") or doc.metadata.get("block") or 0
+        epoch = ts.timestamp() if ts is not None else math.nan
+        return self._add(tokens or [PARAM], preserved, doc.metadata.get("source", ""), unit, epoch)
+
+    def _add(self, tokens: List[str], preserved: Tuple[str, ...], source: str, unit: int,
+             epoch: float) -> Tuple[LogTemplate, bool]:
+        group_key = (len(tokens), preserved, tokens[0])
+        with self._lock:
+            # Journaled as the masked tokens and the occurrence, not the whole entry.
+            self._record(("add", tokens, preserved, source, unit, epoch))
+            best, best_score = None, (-1.0, -1)
+            for template_id in self._groups.get(group_key, ()):
+                template = self.templates[template_id]
+                score = template.similarity(tokens)
+                if score > best_score:
+                    best, best_score = template, score
+
+            if best is not None and best_score[0] >= self.sim_threshold:
+                best.merge(tokens)
+                template = best
+            else:
+                template = LogTemplate(len(self.templates), tokens)
+                self.templates.append(template)
+                self._groups.setdefault(group_key, []).append(template.id)
+
+            source_id = self._source_ids.get(source)
+            if source_id is None:
+                source_id = self._source_ids[source] = len(self._source_names)
+                self._source_names.append(source)
+            template.sources.append(source_id)
+            template.units.append(unit)
+            template.timestamps.append(epoch)
+            if not math.isnan(epoch):
+                template.first_seen = min(template.first_seen, epoch)
+                template.last_seen = max(template.last_seen, epoch)
+
+            needs_vector = not template.indexed
+            template.indexed = True
+        return template, needs_vector
+
+    def expand(self, template_id: int, limit: int) -> List[Dict[str, Any]]:
+        """Returns up to `limit` of a template's most recent occurrences."""
+        template = self.templates[template_id]
+        occurrences = []
+        for i in range(template.count - 1, max(template.count - limit, 0) - 1, -1):
+            ts = template.timestamps[i]
+            occurrences.append({
+                "source": self._source_names[template.sources[i]],
+                "line": template.units[i],
+                "timestamp": None if math.isnan(ts) else datetime.fromtimestamp(ts, timezone.utc).isoformat(),
+            })
+        return occurrences
+
+    def describe(self, template_id: int, limit: int) -> str:
+        """One-paragraph summary of a template for the LLM context."""
+        template = self.templates[template_id]
+        text = f"Template seen {template.count} times: {template.text}"
+        if template.last_seen >= template.first_seen:
+            first = datetime.fromtimestamp(template.first_seen, timezone.utc).isoformat()
+            last = datetime.fromtimestamp(template.last_seen, timezone.utc).isoformat()
+            text += f"\nFirst seen {first}, last seen {last}"
+        examples = ", ".join(f"{o['source']}:{o['line']}" for o in self.expand(template_id, limit))
+        return text + f"\nRecent occurrences: {examples}"
+
+    def mark_unindexed(self, template_ids):
+        """Flags templates whose representative vector was deleted, so the next match re-embeds one."""
+        template_ids = list(template_ids)
+        with self._lock:
+            self._record(("unindexed", template_ids))
+            for template_id in template_ids:
+                self.templates[template_id].indexed = False
+
+    @staticmethod
+    def load(path: str) -> "TemplateMiner":
+        return load_journaled(path)
@@ -0,0 +1,102 @@
+"""
+Time ranges for scoping queries.
+
+Questions like "what happened in the last hour" or "between 00:10 and 00:20"
+are turned into an epoch-second range, so the index only searches the time
+shards (and entries) that overlap it. Relative and clock-only expressions are
+resolved against a reference time, normally the newest indexed log timestamp,
+so historical log sets behave the same as live ones.
+"""
+import math
+import re
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from log_parser import parse_timestamp
+
+# (start, end) in epoch seconds; open ends are -inf / inf.
+TimeRange = Tuple[float, float]
+
+_UNITS = {
+    "second": 1, "sec": 1, "minute": 60, "min": 60, "hour": 3600, "hr": 3600,
+    "day": 86400, "week": 7 * 86400,
+}
+
+_ISO = r"\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?(?:Z|[+-]\d{2}:?\d{2})?"
+_CLOCK = r"\d{1,2}:\d{2}(?::\d{2})?"
+_POINT = rf"({_ISO}|{_CLOCK})"
+
+RELATIVE_PATTERN = re.compile(
+    r"\b(?:last|past|previous)\s+(?:(\d+|an?|one)\s+)?(second|sec|minute|min|hour|hr|day|week)s?\b", re.IGNORECASE
+)
+BETWEEN_PATTERN = re.compile(rf"\b(?:between|from)\s+{_POINT}\s+(?:and|to|until|-)\s+{_POINT}", re.IGNORECASE)
+SINCE_PATTERN = re.compile(rf"\b(?:since|after)\s+{_POINT}", re.IGNORECASE)
+UNTIL_PATTERN = re.compile(rf"\b(?:before|until)\s+{_POINT}", re.IGNORECASE)
+DAY_PATTERN = re.compile(r"\b(today|yesterday)\b", re.IGNORECASE)
+
+
+def _resolve(point: str, reference: datetime) -> Optional[datetime]:
+    """Parses an ISO timestamp, or a bare clock time on the reference date in its timezone."""
+    if re.fullmatch(_CLOCK, point):
+        parts = [int(p) for p in point.split(":")]
+        if parts[0] > 23 or parts[1] > 59:
+            return None
+        return reference.replace(hour=parts[0], minute=parts[1], second=parts[2] if len(parts) > 2 else 0, microsecond=0)
+    if "T" not in point and " " not in point and len(point) == 10:
+        point += "T00:00:00"
+    ts = parse_timestamp(point)
+    if ts is not None and not re.search(r"(Z|[+-]\d{2}:?\d{2})$", point):
+        # No offset written: read it in the logs' timezone rather than UTC.
+        ts = ts.replace(tzinfo=reference.tzinfo)
+    return ts
+
+
+def parse_time_range(text: str, reference: datetime) -> Optional[TimeRange]:
+    """
+    Extracts a time range from a question, or returns None if it names none.
+    `reference` (timezone-aware) stands for "now".
+    """
+    match = BETWEEN_PATTERN.search(text)
+    if match:
+        start, end = _resolve(match.group(1), reference), _resolve(match.group(2), reference)
+        if start is not None and end is not None:
+            if end <= start and re.fullmatch(_CLOCK, match.group(2)):
+                end += timedelta(days=1)  # "between 23:50 and 00:10" crosses midnight
+            return start.timestamp(), end.timestamp()
+
+    match = RELATIVE_PATTERN.search(text)
+    if match:
+        count = match.group(1)
+        count = int(count) if count and count.isdigit() else 1
+        seconds = count * _UNITS[match.group(2).lower()]
+        end = reference.timestamp()
+        return end - seconds, end
+
+    start = end = None
+    match = SINCE_PATTERN.search(text)
+    if match:
+        start = _resolve(match.group(1), reference)
+    match = UNTIL_PATTERN.search(text)
+    if match:
+        end = _resolve(match.group(1), reference)
+    if start is not None or end is not None:
+        return (start.timestamp() if start else -math.inf), (end.timestamp() if end else math.inf)
+
+    match = DAY_PATTERN.search(text)
+    if match:
+        day = reference.replace(hour=0, minute=0, second=0, microsecond=0)
+        if match.group(1).lower() == "yesterday":
+            day -= timedelta(days=1)
+        return day.timestamp(), (day + timedelta(days=1)).timestamp()
+    return None
+
+
+def explicit_time_range(start_time: Optional[str], end_time: Optional[str]) -> Optional[TimeRange]:
+    """Builds a range from request fields (ISO 8601 strings); either end may be omitted."""
+    if not start_time and not end_time:
+        return None
+    start = parse_timestamp(start_time) if start_time else None
+    end = parse_timestamp(end_time) if end_time else None
+    if (start_time and start is None) or (end_time and end is None):
+        raise ValueError("start_time and end_time must be ISO 8601 timestamps.")
+    return (start.timestamp() if start else -math.inf), (end.timestamp() if end else math.inf)
@@ -2,7 +2,7 @@ import React, { useState, useEffect } from 'react';
 import Header from './components/Header';
 import ChatWindow from './components/ChatWindow';
 import InputBar from './components/InputBar';
-import { sendMessageToApi } from './api/chatService';
+import { streamMessageFromApi } from './api/chatService';
 import './App.css';
 
 function App() {
@@ -30,27 +30,27 @@ function App() {
     setMessages(prevMessages => [...prevMessages, userMessage]);
     setIsLoading(true);
 
+    const assistantId = Date.now() + 1;
+    // Replaces the assistant message once it exists, or appends it.
+    const showAssistant = (content) => {
+      setMessages(prevMessages => {
+        const others = prevMessages.filter(msg => msg.id !== assistantId);
+        return [...others, { id: assistantId, sender: 'assistant', content }];
+      });
+    };
+
     try {
-      // Send query to backend and get response
-      const assistantResponse = await sendMessageToApi(query);
-      
-      const assistantMessage = {
-        id: Date.now() + 1,
-        sender: 'assistant',
-        content: assistantResponse
-      };
-      setMessages(prevMessages => [...prevMessages, assistantMessage]);
+      // Stream the query: retrieved logs are shown right away, the answer replaces them when ready.
+      const assistantResponse = await streamMessageFromApi(query, {
+        onEvidence: (evidence) => showAssistant({ summary: "Found relevant log entries, analyzing...", evidence }),
+      });
+      showAssistant(assistantResponse);
 
     } catch (error) {
-      const errorMessage = {
-        id: Date.now() + 1,
-        sender: 'assistant',
-        content: {
-          summary: "Sorry, I encountered an error. Please check the backend connection or try again.",
-          evidence: [{ type: 'error', content: error.message }]
-        }
-      };
-      setMessages(prevMessages => [...prevMessages, errorMessage]);
+      showAssistant({
+        summary: "Sorry, I encountered an error. Please check the backend connection or try again.",
+        evidence: [{ type: 'error', content: error.message }]
+      });
     } finally {
       setIsLoading(false);
     }
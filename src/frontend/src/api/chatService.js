@@ -1,35 +1,86 @@
-/**
- * Sends a query to the backend API and returns the structured response.
- * @param {string} query The user's natural language query.
- * @returns {Promise<object>} A promise that resolves to the assistant's structured response.
- */
-export const sendMessageToApi = async (query) => {
-  try {
-    const response = await fetch('/api/query', {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-      },
-      body: JSON.stringify({ query }),
-    });
-
-    if (!response.ok) {
-      const errorData = await response.json();
-      throw new Error(errorData.detail || `HTTP error! Status: ${response.status}`);
-    }
-
-    // The backend should return a structured JSON object like:
-    // {
-    //   "summary": "Natural language answer.",
-    //   "evidence": [
-    //     { "type": "log", "content": "Log line details..." },
-    //     { "type": "table", "headers": ["Col1", "Col2"], "rows": [["val1", "val2"]] }
-    //   ]
-    // }
-    return await response.json();
-
-  } catch (error) {
-    console.error("Failed to send message to API:", error);
-    throw error; // Re-throw to be caught by the UI component
-  }
-};
\ No newline at end of file
+/**
+ * Sends a query to the backend API and returns the structured response.
+ * @param {string} query The user's natural language query.
+ * @returns {Promise<object>} A promise that resolves to the assistant's structured response.
+ */
+export const sendMessageToApi = async (query) => {
+  try {
+    const response = await fetch('/api/query', {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({ query }),
+    });
+
+    if (!response.ok) {
+      const errorData = await response.json();
+      throw new Error(errorData.detail || `HTTP error! Status: ${response.status}`);
+    }
+
+    // The backend should return a structured JSON object like:
+    // {
+    //   "summary": "Natural language answer.",
+    //   "evidence": [
+    //     { "type": "log", "content": "Log line details..." },
+    //     { "type": "table", "content": { "headers": ["Col1", "Col2"], "rows": [["val1", "val2"]] } }
+    //   ]
+    // }
+    return await response.json();
+
+  } catch (error) {
+    console.error("Failed to send message to API:", error);
+    throw error; // Re-throw to be caught by the UI component
+  }
+};
+
+/**
+ * Sends a query to the streaming endpoint and reports Server-Sent Events as they arrive.
+ * @param {string} query The user's natural language query.
+ * @param {object} handlers Callbacks: onEvidence(evidence) when retrieval finishes, onToken(text) per generated chunk.
+ * @returns {Promise<object>} A promise that resolves to the final structured response.
+ */
+export const streamMessageFromApi = async (query, { onEvidence, onToken } = {}) => {
+  const response = await fetch('/api/query/stream', {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({ query }),
+  });
+
+  if (!response.ok) {
+    const errorData = await response.json();
+    throw new Error(errorData.detail || `HTTP error! Status: ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let result = null;
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    // Events are separated by a blank line.
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const raw = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      const event = raw.match(/^event: (.*)$/m)?.[1];
+      const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] ?? 'null');
+      if (event === 'evidence') onEvidence?.(data);
+      else if (event === 'token') onToken?.(data);
+      else if (event === 'result') result = data;
+      else if (event === 'error') throw new Error(data.detail);
+    }
+  }
+
+  if (!result) {
+    throw new Error('The response stream ended before a result was received.');
+  }
+  return result;
+};
@@ -0,0 +1,8 @@
+import sys, os
+
+# Tests import backend modules by bare name, the way they import each other
+# (the API runs from src/backend).
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'backend')))
+
+# A fixed key, so tests never create a redaction key file in the working tree.
+os.environ.setdefault("REDACTION_KEY", "test-redaction-key")
@@ -0,0 +1,26 @@
+import numpy as np
+from ann_index import build_index, compacts_on_remove, rebuild_without
+from index_eval import default_factories, evaluate
+
+VECTORS = np.random.default_rng(0).random((600, 16), dtype=np.float32)
+
+def test_rebuild_without_keeps_training_and_renumbers_rows():
+    """Tests that HNSW (which can't remove ids) is re-filled with only the surviving rows."""
+    index = build_index("HNSW8", VECTORS, train_sample=1000)
+    assert not compacts_on_remove(index)
+
+    rebuild_without(index, list(range(100, 600)))
+    assert index.ntotal == 500
+    _, rows = index.search(VECTORS[100:101], 1)
+    assert rows[0][0] == 0
+
+def test_evaluate_reports_exact_recall_for_flat():
+    """Tests that the evaluation tool scores flat search as perfect recall."""
+    result = evaluate(VECTORS[50:], VECTORS[:50], "Flat", k=5, nprobe=1, ef_search=16, train_sample=1000)
+    assert result["recall"] == 1.0
+    assert result["bytes"] > 0
+
+def test_default_factories_fit_dimensions():
+    """Tests that the default PQ code size divides the vector dimension."""
+    factories = default_factories(1_000_000, 384)
+    assert factories[0] == "Flat" and "IVF4096,PQ48" in factories
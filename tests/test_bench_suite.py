@@ -0,0 +1,37 @@
+from langchain_ollama import ChatOllama
+from bench_suite import compare
+from fake_ollama import CANNED_ANSWER, FakeOllama
+from log_parser import detect_file_format, iter_file_documents
+from synthetic_logs import GENERATORS, write_corpus
+
+def test_synthetic_corpus_is_detected_and_parsed(tmp_path):
+    """Tests that each generated file sniffs as its own format and yields one entry per generated entry."""
+    paths = write_corpus(str(tmp_path), 50)
+    assert set(paths) == set(GENERATORS)
+    for fmt, path in paths.items():
+        assert detect_file_format(path) == fmt
+        assert sum(1 for _ in iter_file_documents(path)) == 50
+
+def test_compare_flags_slower_rates_and_times():
+    """Tests that regressions are reported for lower rates and higher latencies only."""
+    baseline = {"benchmarks": {"masking": {"mb_per_second": 100.0}, "retrieval": {"p99_ms": 10.0, "p50_ms": 5.0}}}
+    results = {"benchmarks": {"masking": {"mb_per_second": 80.0}, "retrieval": {"p99_ms": 12.0, "p50_ms": 4.0}}}
+    assert [line.split(":")[0] for line in compare(results, baseline, 0.1)] == ["masking.mb_per_second", "retrieval.p99_ms"]
+    assert compare(results, baseline, 0.25) == []
+
+def test_fake_ollama_serves_chat_model():
+    """Tests that ChatOllama gets the canned answer from the fake server, invoked and streamed."""
+    with FakeOllama() as fake:
+        llm = ChatOllama(model="fake", base_url=fake.url, format="json")
+        assert llm.invoke("question").content == CANNED_ANSWER
+        assert "".join(chunk.content for chunk in llm.stream("question")) == CANNED_ANSWER
+        assert fake.requests == 2
+
+def test_llm_bench_reports_coalesced_duplicate_burst():
+    """Tests that a burst of one question reaches the model once through the dispatcher and is counted as coalesced."""
+    from bench_suite import bench_llm
+    results = bench_llm(8, 4, 0.05, 0.0, burst=10)
+    assert results["dispatched"]["llm_requests"] <= results["direct"]["llm_requests"] == 8
+    burst = results["duplicate_burst"]
+    assert burst["requests"] == 10 and burst["direct"]["llm_requests"] == 10
+    assert burst["dispatched"]["llm_requests"] == 1 and burst["dispatched"]["coalesced"] == 9
@@ -0,0 +1,70 @@
+import os
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+import build_index
+import log_index
+from build_index import build, builds_directory, publish
+from log_index import LogIndex
+
+class _Crash(BaseException):
+    """Stands in for the process dying mid-build (not caught like ingestion errors)."""
+
+def _write_logs(directory, files=3, lines=40):
+    os.makedirs(directory)
+    for f in range(files):
+        with open(os.path.join(directory, f"app-{f}.log"), "w") as out:
+            for i in range(lines):
+                out.write(f"ts=2025-09-13T0{f}:{i // 60:02d}:{i % 60:02d}Z level=INFO pod=api-{f} request=r{f}-{i}\n")
+
+def test_interrupted_build_resumes_from_checkpoint(tmp_path, monkeypatch):
+    """Tests that a build resumed after a crash re-embeds only what wasn't checkpointed."""
+    logs, store = str(tmp_path / "logs"), str(tmp_path / "store")
+    _write_logs(logs)
+    monkeypatch.setattr(log_index, "INGEST_BATCH_SIZE", 8)
+    monkeypatch.setattr(log_index, "CHUNK_WINDOW_MAX_ENTRIES", 1)  # one vector per line
+    embeddings = DeterministicFakeEmbedding(size=8)
+    embedded = []
+    add_chunks = LogIndex.add_chunks
+
+    def crashing_add_chunks(self, pending):
+        if len(embedded) >= 48:  # six batches of eight, each checkpointed
+            raise _Crash()
+        embedded.extend(chunk.page_content for _, chunk in pending)
+        add_chunks(self, pending)
+
+    monkeypatch.setattr(LogIndex, "add_chunks", crashing_add_chunks)
+    with pytest.raises(_Crash):
+        build(embeddings, store, logs, checkpoint_seconds=0)
+    assert os.path.isdir(os.path.join(builds_directory(store), build_index.STAGING_DIR))
+
+    embedded.clear()
+    def counting_add_chunks(self, pending):
+        embedded.extend(chunk.page_content for _, chunk in pending)
+        add_chunks(self, pending)
+
+    monkeypatch.setattr(LogIndex, "add_chunks", counting_add_chunks)
+    finished = build(embeddings, store, logs, checkpoint_seconds=0)
+    assert len(embedded) == 120 - 48
+
+    index = LogIndex(embeddings, finished, logs)
+    index.load_or_build(refresh=False)
+    contents = [index._hydrate(doc).page_content for _, doc in index.store.iter_documents()]
+    assert len(contents) == len(set(contents)) == 120
+    assert len(index.rollups) == 120  # counts checkpointed with the entries they cover
+
+def test_publish_swaps_symlink_and_keeps_previous_build(tmp_path):
+    """Tests that publishing repoints the store path and prunes builds older than the previous one."""
+    store = str(tmp_path / "store")
+    os.makedirs(os.path.join(store, "shards"))  # a store built in place by the server
+    builds = builds_directory(store)
+    first, second = os.path.join(builds, "build-1"), os.path.join(builds, "build-2")
+    os.makedirs(first)
+
+    publish(first, store)
+    assert os.path.islink(store) and os.path.realpath(store) == os.path.realpath(first)
+    assert os.path.isdir(os.path.join(builds, "build-initial", "shards"))
+
+    os.makedirs(second)
+    publish(second, store)
+    assert os.path.realpath(store) == os.path.realpath(second)
+    assert sorted(os.listdir(builds)) == ["build-1", "build-2"]
@@ -0,0 +1,61 @@
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from chunking import LogChunker, approx_tokens, pack_context
+from log_index import LogIndex
+
+def _entry(line, pod, second, level="INFO"):
+    text = f"ts=2025-09-13T10:00:{second:02d}Z level={level} pod={pod} n={line}"
+    return Document(page_content=text, metadata={"source": "app.log", "line": line, "pod": pod, "level": level,
+                                                 "timestamp": f"2025-09-13T10:00:{second:02d}+00:00"})
+
+def test_windows_group_adjacent_entries_of_one_pod():
+    """Tests that windows break on a pod change, the time span, the size and the entry count."""
+    chunker = LogChunker(RecursiveCharacterTextSplitter(chunk_size=200, chunk_overlap=0), 200, 5, 3)
+    docs = [_entry(1, "api-1", 0), _entry(2, "api-1", 1, "ERROR"), _entry(3, "api-2", 1), _entry(4, "api-2", 9),
+            _entry(5, "api-2", 9), _entry(6, "api-2", 9), _entry(7, "api-2", 9)]
+    assert [[d.metadata["line"] for d in w] for w in chunker.windows(docs)] == [[1, 2], [3], [4, 5, 6], [7]]
+
+    chunk = chunker.chunk_all(docs)[0]
+    assert chunk.page_content.count("\n") == 1
+    assert chunk.metadata["line"] == 1 and chunk.metadata["end_line"] == 2
+    assert chunk.metadata["level"] == ["INFO", "ERROR"] and chunk.metadata["pod"] == "api-1"
+
+def test_packing_skips_duplicates_and_overlaps_within_budget():
+    """Tests that the packer keeps ranked chunks that add new lines and fit the token budget."""
+    window = Document(page_content="a\nb", metadata={"source": "app.log", "line": 10, "end_line": 11})
+    overlapping = Document(page_content="b", metadata={"source": "app.log", "line": 11})
+    duplicate = Document(page_content="a\nb", metadata={"source": "other.log", "line": 1})
+    large = Document(page_content="word " * 50, metadata={"source": "app.log", "line": 30})
+    small = Document(page_content="tail", metadata={"source": "app.log", "line": 40})
+    render = lambda doc: doc.page_content
+
+    packed = pack_context([window, overlapping, duplicate, large, small], render, budget_tokens=10)
+    assert packed == ["a\nb", "tail"]
+    assert pack_context([large], render, budget_tokens=10) == [large.page_content]  # the best hit always fits
+    assert approx_tokens("level=ERROR pod=api-1") == 8
+
+def test_packing_keeps_every_part_of_a_split_entry():
+    """Tests that the parts of one long entry, which share its line, are not dropped as overlapping."""
+    parts = [Document(page_content=f"part {i} of a long stack trace", metadata={"source": "app.log", "line": 7})
+             for i in range(3)]
+    window = Document(page_content="x\ny", metadata={"source": "app.log", "line": 6, "end_line": 7})
+    render = lambda doc: doc.page_content
+
+    assert pack_context(parts + [window], render, budget_tokens=100) == [p.page_content for p in parts]
+
+def test_index_stores_windows_as_record_ranges(tmp_path):
+    """Tests that a window is one vector whose content and fields come back from its records."""
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    (logs / "app.log").write_text("".join(_entry(i, "api-1", i, "ERROR" if i == 3 else "INFO").page_content + "\n"
+                                          for i in range(1, 6)))
+    index = LogIndex(DeterministicFakeEmbedding(size=8), str(tmp_path / "store"), str(logs))
+    index.build()
+    assert len(index.store) == 1
+
+    doc = index.search("ERROR on api-1", k=1)[0]
+    assert doc.page_content.splitlines() == (logs / "app.log").read_text().splitlines()
+    assert (doc.metadata["line"], doc.metadata["end_line"]) == (1, 5)
+    assert index.fields.extract_filters("ERROR entries") == {"level": {"error"}}
+    assert index._hydrate(next(index.store.iter_documents())[1], with_fields=True).metadata["level"] == ["INFO", "ERROR"]
@@ -0,0 +1,60 @@
+import asyncio
+import pytest
+from concurrency import ClientDisconnected, QueryLimiter, QueryRejected, run_until_disconnect
+
+def test_limiter_queues_then_rejects():
+    """Tests that queries beyond the slots wait, and beyond the wait queue are rejected."""
+    async def scenario():
+        limiter = QueryLimiter(max_concurrency=1, max_waiting=1)
+        release = asyncio.Event()
+
+        async def hold():
+            async with limiter.slot():
+                await release.wait()
+
+        first = asyncio.create_task(hold())
+        second = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        assert limiter.in_flight == 1 and limiter.waiting == 1
+
+        with pytest.raises(QueryRejected):
+            async with limiter.slot():
+                pass
+        release.set()
+        await asyncio.gather(first, second)
+        return limiter.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["in_flight"] == 0 and stats["waiting"] == 0 and stats["rejected"] == 1
+
+def test_run_until_disconnect_cancels_work():
+    """Tests that the underlying work is cancelled once the client disconnects."""
+    async def scenario():
+        cancelled = asyncio.Event()
+
+        async def slow():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        async def disconnected():
+            return True
+
+        with pytest.raises(ClientDisconnected):
+            await run_until_disconnect(slow(), disconnected, poll_interval=0.01)
+        await asyncio.sleep(0)
+        return cancelled.is_set()
+
+    assert asyncio.run(scenario())
+
+def test_run_until_disconnect_returns_result():
+    """Tests that completed work is returned while the client stays connected."""
+    async def connected():
+        return False
+
+    async def work():
+        return 42
+
+    assert asyncio.run(run_until_disconnect(work(), connected, poll_interval=0.01)) == 42
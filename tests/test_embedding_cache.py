@@ -0,0 +1,59 @@
+import pytest
+from langchain_core.embeddings import Embeddings
+from embedding_cache import CachedEmbeddings, EmbeddingCache
+
+class CountingEmbeddings(Embeddings):
+    """Deterministic stand-in for the real model that records what it was asked to embed."""
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(t)), float(sum(map(ord, t)) % 97)] for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+def _cached(tmp_path, max_entries=100, model_id="model-a"):
+    inner = CountingEmbeddings()
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"), model_id, max_entries)
+    return inner, CachedEmbeddings(inner, cache)
+
+def test_repeated_texts_are_embedded_once(tmp_path):
+    """Tests that duplicates within and across batches skip the model."""
+    inner, embeddings = _cached(tmp_path)
+
+    first = embeddings.embed_documents(["GET /health 200", "GET /health 200", "error"])
+    second = embeddings.embed_documents(["GET  /health   200", "error"])
+
+    assert inner.calls == [["GET /health 200", "error"]]
+    assert first[0] == first[1] == second[0]
+    assert first[2] == second[1]
+    assert embeddings.hits == 3 and embeddings.misses == 2
+
+def test_cache_persists_and_is_keyed_by_model(tmp_path):
+    """Tests that vectors survive reopening the file but are not shared across models."""
+    _, embeddings = _cached(tmp_path)
+    embeddings.embed_documents(["event=dispatch"])
+
+    inner, reopened = _cached(tmp_path)
+    reopened.embed_documents(["event=dispatch"])
+    assert inner.calls == []
+
+    inner, other_model = _cached(tmp_path, model_id="model-b")
+    other_model.embed_documents(["event=dispatch"])
+    assert inner.calls == [["event=dispatch"]]
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    """Tests that the size cap evicts the entry that was used least recently."""
+    inner, embeddings = _cached(tmp_path, max_entries=2)
+    embeddings.embed_documents(["a"])
+    embeddings.embed_documents(["b"])
+    embeddings.embed_documents(["a"])  # touch "a" so "b" becomes the oldest
+    embeddings.embed_documents(["c"])
+    assert len(embeddings.cache) == 2
+
+    inner.calls.clear()
+    embeddings.embed_documents(["a", "b", "c"])
+    assert inner.calls == [["b"]]
@@ -0,0 +1,95 @@
+import os
+from langchain_core.documents import Document
+from hybrid_index import FieldIndex, reciprocal_rank_fusion
+
+def _index():
+    index = FieldIndex()
+    entries = [
+        ("a", "ERROR", "orchestrator-eval-64", "503", "upstream timeout talking to db"),
+        ("b", "ERROR", "orchestrator-eval-12", "503", "upstream timeout talking to db"),
+        ("c", "INFO", "orchestrator-eval-64", "200", "health check ok"),
+        ("d", "ERROR", "orchestrator-eval-64", "500", "null pointer in handler"),
+    ]
+    index.add([e[0] for e in entries], [
+        Document(page_content=text, metadata={"source": "app.log", "level": level, "pod": pod, "status": status})
+        for _, level, pod, status, text in entries
+    ])
+    return index
+
+def test_filters_are_extracted_from_known_field_values():
+    """Tests that levels, status codes and known pod names in a question become filters."""
+    index = _index()
+    filters = index.extract_filters("ERROR logs from orchestrator-eval-64 with status 503")
+    assert filters == {"level": {"error"}, "status": {"503"}, "pod": {"orchestrator-eval-64"}}
+
+    # Status classes expand to the codes actually present; unknown values are ignored.
+    assert index.extract_filters("any 5xx from orchestrator-eval-99?") == {"status": {"500", "503"}}
+
+def test_candidates_intersect_fields_and_skip_deleted():
+    """Tests that postings are intersected across fields and tombstoned documents drop out."""
+    index = _index()
+    filters = {"level": {"error"}, "pod": {"orchestrator-eval-64"}}
+    assert index.ids_for(index.candidates(filters)) == ["a", "d"]
+
+    index.remove(["a"])
+    assert index.ids_for(index.candidates(filters)) == ["d"]
+    assert len(index) == 3
+
+def test_bm25_ranks_within_candidates():
+    """Tests that keyword ranking favours matching terms and respects the candidate set."""
+    index = _index()
+    assert index.bm25("null pointer", limit=2) == ["d"]
+    assert index.bm25("upstream timeout", limit=5, candidates=[1, 2]) == ["b"]
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    """Tests that an ID ranked well by both lists beats one ranked first by only one."""
+    fused = reciprocal_rank_fusion([["x", "y", "z"], ["y", "z", "w"]])
+    assert fused[0] == "y"
+    assert set(fused) == {"x", "y", "z", "w"}
+
+def test_candidates_honour_time_range():
+    """Tests that the timestamp column limits candidates, excluding undated entries."""
+    index = FieldIndex()
+    index.add(["early", "late", "undated"], [
+        Document(page_content="x", metadata={"level": "ERROR", "timestamp": "2025-09-13T00:05:00+00:00"}),
+        Document(page_content="x", metadata={"level": "ERROR", "timestamp": "2025-09-13T00:25:00+00:00"}),
+        Document(page_content="x", metadata={"level": "ERROR"}),
+    ])
+    start = index.reference_time().timestamp() - 600
+    assert index.ids_for(index.candidates({}, (start, float("inf")))) == ["late"]
+    assert index.ids_for(index.candidates({"level": {"error"}}, (0, float("inf")))) == ["early", "late"]
+
+def test_saves_journal_changes_and_replay_them(tmp_path):
+    """Tests that saves after the first append only the changes, and that loading replays them."""
+    path = str(tmp_path / "fields.pkl")
+    index = _index()
+    index.save(path)
+    snapshot = os.path.getsize(path)
+
+    loaded = FieldIndex.load(path)
+    loaded.remove(["b"])
+    loaded.add(["e"], [Document(page_content="disk full on node", metadata={"level": "ERROR", "pod": "db-1"})])
+    loaded.save(path)
+    journal = os.path.getsize(path + ".log")
+    loaded.save(path)  # nothing changed: nothing written
+    assert os.path.getsize(path) == snapshot and os.path.getsize(path + ".log") == journal
+
+    replayed = FieldIndex.load(path)
+    assert len(replayed) == 4
+    assert replayed.extract_filters("errors on db-1") == {"level": {"error"}, "pod": {"db-1"}}
+    assert replayed.ids_for(replayed.candidates({"status": {"503"}})) == ["a"]
+
+def test_tombstones_are_compacted_on_save(tmp_path):
+    """Tests that a save renumbers the live documents once enough are tombstoned, keeping every lookup."""
+    path = str(tmp_path / "fields.pkl")
+    index = _index()
+    index.save(path)
+    index.remove(["a", "c"])
+    index.save(path)
+
+    loaded = FieldIndex.load(path)
+    assert loaded.doc_ids == ["b", "d"] and len(loaded) == 2
+    assert loaded.ids_for(loaded.candidates({"level": {"error"}})) == ["b", "d"]
+    assert loaded.extract_filters("health checks on orchestrator-eval-12") == {"pod": {"orchestrator-eval-12"}}
+    assert "health" not in loaded.term_docs
+    assert loaded.bm25("null pointer", 5) == ["d"]
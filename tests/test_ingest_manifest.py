@@ -0,0 +1,74 @@
+import os
+import pytest
+from ingest_manifest import IngestManifest
+
+def _ingest_all(manifest, directory):
+    """Marks every file with new data as fully ingested, one vector per file."""
+    scan = manifest.scan(directory)
+    for entry, size in scan.work:
+        entry.new_ids(1)
+        entry.size = entry.offset = size
+    return scan
+
+def test_scan_reports_new_and_appended_files(tmp_path):
+    """Tests that only new or grown files are scheduled for ingestion."""
+    log_file = tmp_path / "app.log"
+    log_file.write_text("line 1\n")
+    manifest = IngestManifest(str(tmp_path / "manifest.json"))
+
+    scan = _ingest_all(manifest, str(tmp_path))
+    assert scan.new_files == 1 and len(scan.work) == 1
+
+    assert manifest.scan(str(tmp_path)).work == []
+
+    with open(log_file, "a") as f:
+        f.write("line 2\n")
+    scan = manifest.scan(str(tmp_path))
+    [(entry, size)] = scan.work
+    assert entry.offset == len("line 1\n")
+    assert size == len("line 1\nline 2\n")
+
+def test_scan_follows_renamed_file_by_inode(tmp_path):
+    """Tests that a rotated (renamed) file keeps its entry instead of being re-ingested."""
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    (logs / "app.log").write_text("line 1\n")
+    manifest = IngestManifest(str(tmp_path / "manifest.json"))
+    _ingest_all(manifest, str(logs))
+    key = manifest.entries[str(logs / "app.log")].key
+
+    os.rename(logs / "app.log", logs / "app.log.1")
+    scan = manifest.scan(str(logs))
+
+    assert scan.rotated_files == 1 and scan.stale_ids == [] and scan.work == []
+    assert manifest.entries[str(logs / "app.log.1")].key == key
+
+def test_scan_marks_truncated_and_deleted_files_stale(tmp_path):
+    """Tests that truncated and deleted files have their vector IDs listed for removal."""
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    (logs / "a.log").write_text("some long line\n")
+    (logs / "b.log").write_text("another line\n")
+    manifest = IngestManifest(str(tmp_path / "manifest.json"))
+    _ingest_all(manifest, str(logs))
+    a_ids = manifest.entries[str(logs / "a.log")].all_ids()
+    b_ids = manifest.entries[str(logs / "b.log")].all_ids()
+
+    (logs / "a.log").write_text("short\n")
+    os.remove(logs / "b.log")
+    scan = manifest.scan(str(logs))
+
+    assert sorted(scan.stale_ids) == sorted(a_ids + b_ids)
+    assert scan.removed_files == 1
+    [(entry, _)] = scan.work
+    assert entry.offset == 0 and entry.unit == 1
+
+def test_manifest_round_trips_through_json(tmp_path):
+    """Tests that a saved manifest loads back with the same entries."""
+    (tmp_path / "app.log").write_text("line 1\n")
+    manifest = IngestManifest(str(tmp_path / "store" / "manifest.json"))
+    _ingest_all(manifest, str(tmp_path))
+    manifest.save()
+
+    loaded = IngestManifest.load(manifest.path)
+    assert [e.to_dict() for e in loaded.entries.values()] == [e.to_dict() for e in manifest.entries.values()]
@@ -0,0 +1,151 @@
+import os
+import queue
+import threading
+import time
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from live_ingest import IndexFollower, LiveIngestor
+from log_index import LogIndex, try_ingest_lease
+
+def test_only_one_process_holds_the_ingest_lease(tmp_path):
+    """Tests that the ingestion lease is exclusive until its holder releases it."""
+    store = str(tmp_path / "store")
+    lease = try_ingest_lease(store)
+    assert lease is not None
+    assert try_ingest_lease(store) is None  # a second open file description, as in another worker
+    lease.close()
+    again = try_ingest_lease(store)
+    assert again is not None
+    again.close()
+
+def test_follower_reloads_when_the_store_is_saved(tmp_path):
+    """Tests that a follower reloads once per save of the manifest and retries skipped reloads."""
+    store = tmp_path / "store"
+    store.mkdir()
+    manifest = store / "manifest.json"
+    manifest.write_text("{}")
+    results = [False, None]
+    follower = IndexFollower(str(store), lambda: results.pop(0), poll_interval=60)
+
+    assert not follower.check()  # nothing saved since it started
+    os.utime(manifest, ns=(0, manifest.stat().st_mtime_ns + 1_000_000))
+    assert not follower.check()  # reload skipped, e.g. another reload in progress
+    assert follower.check()
+    assert not follower.check()
+    assert follower.reloads == 1 and results == []
+
+def _index(tmp_path):
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    (logs / "seed.log").write_text("level=INFO pod=seed msg=ready\n")
+    index = LogIndex(DeterministicFakeEmbedding(size=8), str(tmp_path / "store"), str(logs))
+    index.build()
+    return index, logs
+
+def _ingestor(index, **overrides):
+    options = dict(poll_interval=0.05, batch_size=1000, flush_seconds=0.2, queue_size=100, save_interval=3600)
+    options.update(overrides)
+    return LiveIngestor(index, **options)
+
+def _contents(index):
+    return sorted(index._hydrate(doc).page_content for _, doc in index.store.iter_documents())
+
+def _drain(ingestor):
+    """Runs the embedder on the calling thread until everything queued is indexed."""
+    ingestor._stop.set()
+    ingestor._embed_loop()
+    ingestor._stop.clear()
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+def test_tailer_blocks_when_the_queue_is_full(tmp_path):
+    """Tests that the tailer waits (backpressure) instead of dropping entries when the queue is full."""
+    index, logs = _index(tmp_path)
+    ingestor = _ingestor(index, queue_size=1)
+    (logs / "app.log").write_text("".join(f"level=INFO pod=api-{i} msg=m{i}\n" for i in range(3)))  # three windows
+
+    tailer = threading.Thread(target=ingestor._poll)
+    tailer.start()
+    _wait_for(lambda: ingestor.backpressure_active)
+    assert ingestor.queue.full() and tailer.is_alive()
+
+    items = []
+    while tailer.is_alive() or not ingestor.queue.empty():
+        try:
+            items.append(ingestor.queue.get(timeout=0.1))
+        except queue.Empty:
+            pass
+    tailer.join()
+    assert [kind for kind, *_ in items] == ["add"] * 3
+    assert not ingestor.backpressure_active and ingestor.backpressure_seconds > 0
+
+def test_partial_batch_is_flushed_at_the_deadline(tmp_path):
+    """Tests that a batch far below batch_size is indexed once its oldest entry reaches flush_seconds."""
+    index, logs = _index(tmp_path)
+    ingestor = _ingestor(index, flush_seconds=0.3)
+    ingestor.start()
+    try:
+        (logs / "app.log").write_text("level=ERROR pod=api-1 msg=disk_full\n")
+        ingestor.wake()
+        _wait_for(lambda: ingestor.vectors_added == 1)
+        assert ingestor.lag_seconds >= 0.3
+        assert ingestor.stats()["pending_batch"] == 0
+        assert "level=ERROR pod=api-1 msg=disk_full" in _contents(index)
+    finally:
+        ingestor.stop()
+
+def test_unterminated_last_line_is_replaced_once_complete(tmp_path):
+    """Tests that a last line still being written is indexed, then replaced when its newline arrives."""
+    index, logs = _index(tmp_path)
+    ingestor = _ingestor(index)
+    log_file = logs / "app.log"
+    log_file.write_text("level=INFO pod=api-1 msg=first\nlevel=INFO pod=api-2 msg=partial")
+
+    ingestor._poll()
+    _drain(ingestor)
+    assert "level=INFO pod=api-2 msg=partial" in _contents(index)
+
+    with open(log_file, "a") as f:
+        f.write("ly-written\n")
+    ingestor._poll()
+    _drain(ingestor)
+    assert _contents(index) == ["level=INFO pod=api-1 msg=first", "level=INFO pod=api-2 msg=partially-written",
+                                "level=INFO pod=seed msg=ready"]
+
+def test_deletes_never_overtake_queued_adds(tmp_path):
+    """Tests that a file deleted or truncated while its batches are still queued leaves none of its old vectors."""
+    index, logs = _index(tmp_path)
+    ingestor = _ingestor(index)
+    (logs / "gone.log").write_text("level=INFO pod=api-1 msg=a\nlevel=INFO pod=api-2 msg=b\n")
+    (logs / "app.log").write_text("level=INFO pod=api-3 msg=old entry\nlevel=INFO pod=api-4 msg=old\n")
+
+    ingestor._poll()  # adds for both files queued, not yet embedded
+    (logs / "gone.log").unlink()
+    (logs / "app.log").write_text("level=WARN pod=api-5 msg=new\n")  # truncated and rewritten
+    ingestor._poll()
+    _drain(ingestor)
+
+    assert _contents(index) == ["level=INFO pod=seed msg=ready", "level=WARN pod=api-5 msg=new"]
+    assert ingestor.vectors_added - ingestor.vectors_removed == 1
+
+def test_follower_reads_only_what_a_save_changed(tmp_path):
+    """Tests that a follower picks up a save by replaying journals and reopening only rewritten shards."""
+    holder, logs = _index(tmp_path)
+    follower = LogIndex(holder.embeddings, holder.store_path, str(logs))
+    follower.load_or_build(refresh=False)
+    assert not follower.follow() and follower.version == 0
+    undated, fields = follower.store._open("undated"), follower.fields
+
+    (logs / "app.log").write_text("2025-09-13T10:00:00Z level=ERROR pod=api-1 msg=boom\n")
+    holder.refresh()
+    assert follower.follow() and follower.version == 1
+    assert follower.store.shards["undated"] is undated and undated.store is not None  # not rewritten, still open
+    assert follower.fields is fields  # journal tail replayed in place
+    assert _contents(follower) == _contents(holder)
+    assert follower.fields.ids_for(follower.fields.candidates({"pod": {"api-1"}})) == holder.fields.ids_for(holder.fields.candidates({"pod": {"api-1"}}))
+
+    holder.save_locked()  # nothing new
+    assert not follower.follow() and follower.version == 1
@@ -0,0 +1,82 @@
+import asyncio
+import pytest
+from langchain_core.messages import AIMessageChunk
+from langchain_core.prompt_values import StringPromptValue
+from langchain_ollama import ChatOllama
+from fake_ollama import CANNED_ANSWER, FakeOllama
+from llm_dispatch import LLMDispatcher
+from llm_loader import warm_llm
+
+class _RecordingLLM:
+    """Answers each prompt with itself after a short delay, recording the order generations start in."""
+    def __init__(self):
+        self.started, self.cancelled = [], []
+
+    async def astream(self, prompt_value, config=None):
+        self.started.append(prompt_value.to_string())
+        try:
+            await asyncio.sleep(0.05)
+        except asyncio.CancelledError:
+            self.cancelled.append(prompt_value.to_string())
+            raise
+        yield AIMessageChunk(content=prompt_value.to_string())
+
+def test_identical_prompts_share_one_generation():
+    """Tests that concurrent identical prompts get the full answer from a single Ollama request over pooled connections."""
+    with FakeOllama(first_token_delay=0.1, token_delay=0.001) as fake:
+        llm = ChatOllama(model="fake", base_url=fake.url, format="json")
+        warm_llm(llm)
+        assert fake.loads == 1 and fake.requests == 0
+
+        async def scenario():
+            dispatcher = LLMDispatcher(llm, max_concurrency=2)
+            same = StringPromptValue(text="which pods failed?")
+            answers = await asyncio.gather(*(dispatcher.generate(same) for _ in range(5)),
+                                           dispatcher.generate(StringPromptValue(text="other")))
+            for _ in range(3):
+                await dispatcher.generate(StringPromptValue(text="sequential"))
+            return answers, dispatcher.stats()
+
+        answers, stats = asyncio.run(scenario())
+        assert answers == [CANNED_ANSWER] * 6
+        assert fake.requests == 5 and stats["generations"] == 5 and stats["coalesced"] == 4
+        assert fake.connections <= 3  # the warm-up's plus at most two pooled ones
+
+def test_queued_generations_start_by_priority_within_deadlines():
+    """Tests that a free slot goes to the most urgent request and expired requests never reach the model."""
+    async def scenario():
+        llm = _RecordingLLM()
+        dispatcher = LLMDispatcher(llm, max_concurrency=1)
+        loop = asyncio.get_running_loop()
+        busy = asyncio.create_task(dispatcher.generate(StringPromptValue(text="busy")))
+        await asyncio.sleep(0)
+        low = asyncio.create_task(dispatcher.generate(StringPromptValue(text="low"), "low"))
+        high = asyncio.create_task(dispatcher.generate(StringPromptValue(text="high"), "high"))
+        late = asyncio.create_task(dispatcher.generate(StringPromptValue(text="late"), "high", loop.time() + 0.01))
+        assert await asyncio.gather(busy, high, low) == ["busy", "high", "low"]
+        with pytest.raises(TimeoutError):
+            await late
+        return llm.started
+
+    assert asyncio.run(scenario()) == ["busy", "high", "low"]
+
+def test_generation_is_cancelled_when_its_last_request_leaves():
+    """Tests that a shared generation keeps running for remaining requests and stops once all are gone."""
+    async def scenario():
+        llm = _RecordingLLM()
+        dispatcher = LLMDispatcher(llm, max_concurrency=1)
+        prompt = StringPromptValue(text="shared")
+        first = asyncio.create_task(dispatcher.generate(prompt))
+        second = asyncio.create_task(dispatcher.generate(prompt))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == "shared" and llm.cancelled == []
+
+        third = asyncio.create_task(dispatcher.generate(prompt))
+        await asyncio.sleep(0.01)
+        third.cancel()
+        await asyncio.sleep(0.01)
+        return llm.cancelled, dispatcher.stats()
+
+    cancelled, stats = asyncio.run(scenario())
+    assert cancelled == ["shared"] and stats["running"] == 0 and stats["queued"] == 0
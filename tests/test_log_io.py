@@ -0,0 +1,69 @@
+import os
+import bz2
+import gzip
+import lzma
+
+import pytest
+import log_io
+from log_io import compression_of, iter_lines, list_log_files
+from log_parser import iter_file_documents
+
+LINES = [f"ts=2025-09-13T00:00:{i:02d}Z level=INFO event=e{i}" for i in range(5)]
+TEXT = "".join(line + "\n" for line in LINES)
+
+@pytest.mark.parametrize("name, opener", [("app.log.gz", gzip.open), ("app.log.bz2", bz2.open), ("app.log.xz", lzma.open)])
+def test_compressed_files_are_parsed(tmp_path, name, opener):
+    """Tests that compressed logs are decompressed and parsed like the plain file."""
+    plain, packed = tmp_path / "app.log", tmp_path / name
+    plain.write_text(TEXT)
+    with opener(packed, "wt") as f:
+        f.write(TEXT)
+
+    assert compression_of(str(plain)) is None
+    assert compression_of(str(packed)) is not None
+    expected = [doc.page_content for doc in iter_file_documents(str(plain))]
+    assert [doc.page_content for doc in iter_file_documents(str(packed))] == expected
+    assert len(expected) == len(LINES)
+
+def test_compressed_file_is_recognised_without_suffix(tmp_path):
+    """Tests that codecs are detected from magic bytes, not the file name."""
+    path = tmp_path / "app.log.1"
+    with gzip.open(path, "wt") as f:
+        f.write(TEXT)
+    assert compression_of(str(path)) == "gzip"
+    assert [line for line, _ in iter_lines(str(path))] == LINES
+
+def test_offsets_count_decompressed_bytes(tmp_path):
+    """Tests that reading resumes from an offset into the decompressed stream."""
+    path = tmp_path / "app.log.gz"
+    with gzip.open(path, "wt") as f:
+        f.write(TEXT)
+    _, first_end = next(iter_lines(str(path)))
+    assert [line for line, _ in iter_lines(str(path), start=first_end)] == LINES[1:]
+
+def test_truncated_gzip_stops_at_last_complete_line(tmp_path):
+    """Tests that an archive still being written yields what it holds so far."""
+    path = tmp_path / "app.log.gz"
+    with gzip.open(path, "wt") as f:
+        f.write(TEXT * 50)
+    data = path.read_bytes()
+    path.write_bytes(data[:-20])
+    lines = [line for line, _ in iter_lines(str(path))]
+    assert 0 < len(lines) <= 5 * 50
+    assert all(line in LINES for line in lines)
+
+def test_large_plain_files_are_memory_mapped(tmp_path, monkeypatch):
+    """Tests that mmap line scanning yields the same lines and offsets as buffered reading."""
+    path = tmp_path / "app.log"
+    path.write_text(TEXT + "no trailing newline")
+    buffered = list(iter_lines(str(path), start=10, end=120))
+    monkeypatch.setattr(log_io, "LOG_MMAP_MIN_BYTES", 1)
+    assert list(iter_lines(str(path), start=10, end=120)) == buffered
+    assert list(iter_lines(str(path), start=path.stat().st_size)) == []
+
+def test_rotation_chains_are_listed_oldest_first(tmp_path):
+    """Tests that rotated and compressed generations sort before the live file."""
+    for name in ("foo.log", "foo.log.1", "foo.log.2.gz", "foo.log.10.zst", "bar.log"):
+        (tmp_path / name).write_text("")
+    names = [os.path.basename(path) for path in list_log_files(str(tmp_path))]
+    assert names == ["bar.log", "foo.log.10.zst", "foo.log.2.gz", "foo.log.1", "foo.log"]
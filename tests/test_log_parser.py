@@ -1,13 +1,21 @@
-import sys, os
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-
+import json
 import pytest
-from src.backend.log_parser import (
+from log_parser import (
     parse_apache_log_line,
     parse_keyval_log_line,
     parse_singleline_log_line,
-    parse_pretty_log_block
+    parse_pretty_log_block,
+    iter_pretty_blocks,
+    iter_file_documents,
+    iter_document_batches,
+    load_and_parse_logs,
+    detect_file_format,
+    fast_parse_apache_log_line,
+    fast_parse_singleline_log_line,
+    MAX_BLOCK_LINES,
 )
+from hybrid_index import FieldIndex
+from security import ip_token
 
 # --- 1. Tests for Apache Log Parser ---
 
@@ -106,4 +114,136 @@ def test_parse_empty_pretty_log_block():
     log_block = "\n   \n"
     parsed = parse_pretty_log_block(log_block)
     # The parser returns an empty dict for an empty block, which is correct.
-    assert parsed == {}
\ No newline at end of file
+    assert parsed == {}
+
+# --- 5. Tests for Streaming Ingestion ---
+
+def test_iter_pretty_blocks_splits_on_blank_lines():
+    """Tests that blank (or whitespace-only) lines delimit pretty blocks."""
+    lines = ["TIMESTAMP: a", "POD: p1", "", "   ", "TIMESTAMP: b", "POD: p2"]
+    blocks = list(iter_pretty_blocks(lines))
+    assert blocks == ["TIMESTAMP: a\nPOD: p1", "TIMESTAMP: b\nPOD: p2"]
+
+def test_iter_file_documents_pretty(tmp_path):
+    """Tests that pretty files yield one Document per block, numbered from 1."""
+    log_file = tmp_path / "app-pretty.log"
+    log_file.write_text("TIMESTAMP: t1\nLEVEL: INFO\n\nTIMESTAMP: t2\nLEVEL: WARN\n")
+    docs = list(iter_file_documents(str(log_file)))
+
+    assert len(docs) == 2
+    assert docs[1].metadata == {"source": "app-pretty.log", "block": 2, "level": "WARN"}
+    assert docs[1].page_content == "timestamp=t2 level=WARN"
+
+def test_iter_document_batches_matches_eager_loader(tmp_path):
+    """Tests that batched streaming yields the same Documents as load_and_parse_logs."""
+    (tmp_path / "events.jsonl").write_text('{"a": 1}\nnot json\n{"a": 2}\n')
+    (tmp_path / "plain.log").write_text("first\n\nsecond\nthird\n")
+
+    batches = list(iter_document_batches(str(tmp_path), batch_size=2))
+    assert all(len(batch) <= 2 for batch in batches)
+
+    streamed = [doc for batch in batches for doc in batch]
+    eager = load_and_parse_logs(str(tmp_path))
+    assert len(streamed) == 5
+    assert [(d.page_content, d.metadata) for d in streamed] == [(d.page_content, d.metadata) for d in eager]
+
+def test_iter_file_documents_keeps_indexed_fields(tmp_path):
+    """Tests that filterable fields and a normalised timestamp are copied into metadata."""
+    log_file = tmp_path / "app-singleline.log"
+    log_file.write_text("2025-09-13T00:15:44+05:30 | orchestrator-eval-64 | ERROR | event=dispatch | status=503 | job=job-423\n")
+    doc = next(iter_file_documents(str(log_file)))
+
+    assert doc.metadata == {
+        "source": "app-singleline.log", "line": 1, "level": "ERROR", "pod": "orchestrator-eval-64",
+        "status": "503", "event": "dispatch", "timestamp": "2025-09-13T00:15:44+05:30",
+    }
+
+def test_iter_file_documents_redacts_at_ingest(tmp_path):
+    """Tests that IPs and emails are masked in content and metadata before indexing."""
+    log_file = tmp_path / "access.apache"
+    log_file.write_text('10.253.3.41 - - [12/Sep/2025:23:47:22 +0530] "GET /health HTTP/1.1" 200 17 "ops@example.com" "INFO"\n')
+    doc = next(iter_file_documents(str(log_file)))
+
+    assert "10.253.3.41" not in doc.page_content and "ops@example.com" not in doc.page_content
+    assert doc.metadata["ip"] == ip_token("10.253.3.41") != ip_token("10.253.3.42")
+    assert doc.metadata["status"] == "200"
+
+def test_ip_filter_works_with_redaction(tmp_path):
+    """Tests that a question naming an IP filters on the tokens stored for redacted IPs."""
+    log_file = tmp_path / "access.apache"
+    log_file.write_text(
+        '10.253.3.41 - - [12/Sep/2025:23:47:22 +0530] "GET /health HTTP/1.1" 200 17 "-" "INFO"\n'
+        '10.253.3.42 - - [12/Sep/2025:23:47:23 +0530] "GET /login HTTP/1.1" 401 17 "-" "WARN"\n'
+    )
+    docs = list(iter_file_documents(str(log_file)))
+    index = FieldIndex()
+    index.add(["a", "b"], docs)
+
+    filters = index.extract_filters("what did 10.253.3.42 request?")
+    assert filters == {"ip": {ip_token("10.253.3.42")}}
+    assert index.candidates(filters) == [1]
+
+def test_fast_parsers_match_regex_parsers():
+    """Tests that the split-based parsers return what the regex parsers do, including on odd lines."""
+    apache = [
+        '10.253.3.41 - - [12/Sep/2025:23:47:22 +0530] "PUT /health HTTP/1.1" 200 1746 "angular-ui-eval-833" "INFO"',
+        '10.0.0.1 - - [12/Sep/2025:23:47:22 +0530] "GET /q?x="a" b HTTP/1.1" 404 0 "-" "WARN"',
+        'not an apache line',
+    ]
+    singleline = [
+        "2025-09-13T00:15:44+05:30 | orchestrator-eval-64 | DEBUG | event=dispatch | job=job-423 | msg=took 3 tries",
+        "2025-09-13T00:15:44+05:30 | pod | INFO",
+        " | pod | INFO | event=x",
+        "",
+    ]
+    for line in apache:
+        assert fast_parse_apache_log_line(line) == parse_apache_log_line(line)
+    for line in singleline:
+        assert fast_parse_singleline_log_line(line) == parse_singleline_log_line(line)
+
+def test_format_is_sniffed_from_content(tmp_path):
+    """Tests that rotated files without a format hint in their name are parsed by content."""
+    (tmp_path / "app-2025-09-13.log.1").write_text(
+        "2025-09-13T00:15:44+05:30 | orchestrator-eval-64 | ERROR | event=dispatch | status=503\n"
+    )
+    (tmp_path / "web.log.2").write_text(
+        '10.0.0.1 - - [12/Sep/2025:23:47:22 +0530] "GET / HTTP/1.1" 200 5 "-" "INFO"\n'
+    )
+    (tmp_path / "events-pretty.log").write_text("just some text\n")
+
+    assert detect_file_format(str(tmp_path / "app-2025-09-13.log.1")) == "singleline"
+    assert detect_file_format(str(tmp_path / "web.log.2")) == "apache"
+    assert detect_file_format(str(tmp_path / "events-pretty.log")) == "text"
+
+    doc = next(iter_file_documents(str(tmp_path / "app-2025-09-13.log.1")))
+    assert doc.metadata["level"] == "ERROR" and doc.metadata["status"] == "503"
+
+def test_python_logging_lines_are_not_sniffed_as_pretty(tmp_path):
+    """Tests that LEVEL:logger:msg lines are parsed one Document per line, not as one pretty block."""
+    log_file = tmp_path / "worker.log"
+    log_file.write_text("".join(f"{'ERROR' if i % 3 else 'INFO'}:root:job {i} finished\n" for i in range(500)))
+
+    assert detect_file_format(str(log_file)) == "text"
+    docs = list(iter_file_documents(str(log_file)))
+    assert len(docs) == 500
+    assert docs[0].metadata["line"] == 1 and docs[0].page_content == "INFO:root:job 0 finished"
+
+def test_file_name_hint_wins_over_weak_content_match(tmp_path):
+    """Tests that a format named in the file name is kept when most sampled lines fit it."""
+    log_file = tmp_path / "api-keyval.log"
+    log_file.write_text(
+        "TIMESTAMP: 2025-09-13T00:15:44Z\nLEVEL: INFO\n\nTIMESTAMP: 2025-09-13T00:15:45Z\nLEVEL: WARN\n\n"
+        + "level=ERROR status=503 pod=api-1\n" * 6
+    )
+    assert detect_file_format(str(log_file)) == "keyval"
+
+    pretty_file = tmp_path / "kube.log"
+    pretty_file.write_text("TIMESTAMP: t1\nPOD: p1\n\nTIMESTAMP: t2\nPOD: p2\n")
+    assert detect_file_format(str(pretty_file)) == "pretty"
+
+def test_pretty_blocks_are_bounded(tmp_path):
+    """Tests that a pretty file without blank lines is read in blocks of at most MAX_BLOCK_LINES lines."""
+    log_file = tmp_path / "app-pretty.log"
+    log_file.write_text("MESSAGE: v\n" * (MAX_BLOCK_LINES * 2 + 1))
+    docs = list(iter_file_documents(str(log_file)))
+    assert [doc.metadata["block"] for doc in docs] == [1, 2, 3]
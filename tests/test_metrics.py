@@ -0,0 +1,36 @@
+import sys
+import time
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from prometheus_client import REGISTRY
+import metrics
+from metrics import LLMTimingHandler
+
+def _count(stage):
+    return REGISTRY.get_sample_value("logcopilot_stage_seconds_count", {"stage": stage}) or 0
+
+def test_llm_handler_times_first_token_and_generation():
+    """Tests that a streamed LLM call records time to first token and total generation once each."""
+    llm = GenericFakeChatModel(messages=iter([AIMessage(content="a b c d")]))
+    before_first, before_total = _count("llm_first_token"), _count("llm_generation")
+    chunks = list(llm.stream("question", {"callbacks": [LLMTimingHandler()]}))
+    assert len(chunks) > 1
+    assert _count("llm_first_token") == before_first + 1
+    assert _count("llm_generation") == before_total + 1
+
+def test_profiled_writes_stack_sampler_report(tmp_path, monkeypatch):
+    """Tests that the built-in sampler writes folded stacks naming the profiled code."""
+    monkeypatch.setattr(metrics, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setitem(sys.modules, "pyinstrument", None)  # force the built-in sampler
+    reports = []
+
+    def busy_work():
+        deadline = time.perf_counter() + 0.1
+        while time.perf_counter() < deadline:
+            pass
+
+    with metrics.profiled("test", reports.append):
+        busy_work()
+    assert reports and reports[0].endswith(".folded")
+    with open(reports[0]) as f:
+        assert "busy_work" in f.read()
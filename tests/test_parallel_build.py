@@ -0,0 +1,72 @@
+import os
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+import log_index
+from log_index import LogIndex
+
+class _FailingEmbeddings:
+    """Picklable embeddings whose every call fails, as a broken model would in a worker."""
+
+    def embed_documents(self, texts):
+        raise RuntimeError("embedding model crashed")
+
+def _write_logs(directory):
+    os.makedirs(directory)
+    with open(os.path.join(directory, "app.log"), "w") as out:
+        for i in range(30):
+            out.write(f"ts=2025-09-13T01:00:{i:02d}Z level={'ERROR' if i % 7 == 0 else 'INFO'} pod=api-{i // 10} n={i}\n")
+    with open(os.path.join(directory, "web.apache"), "w") as out:
+        for i in range(12):
+            out.write(f'10.0.0.{i} - - [13/Sep/2025:01:00:{i:02d} +0000] "GET /item/{i} HTTP/1.1" 200 5 "-" "INFO"\n')
+    with open(os.path.join(directory, "tail.log"), "w") as out:
+        out.write("ts=2025-09-13T02:00:00Z level=INFO pod=api-9 n=1\nts=2025-09-13T02:00:01Z level=WARN pod=api-9 n=2")
+
+def _parallel(monkeypatch, model):
+    monkeypatch.setattr(log_index, "PARALLEL_BUILD", True)
+    monkeypatch.setattr(log_index, "PARSE_WORKERS", 2)
+    monkeypatch.setattr(log_index, "EMBED_WORKERS", 1)
+    monkeypatch.setattr(log_index, "EMBED_BATCH_SIZE", 4)
+    monkeypatch.setattr(log_index, "SHARD_BYTES", 512)  # app.log is split into several shards  # app.log is split into several shards
+    monkeypatch.setattr(log_index, "EMBEDDING_MODEL_ID", model)
+
+def _snapshot(index):
+    """
+    (ID, content, metadata without record references) of every stored vector.
+    File keys are random per build, so IDs are given as "<file>-<n>".
+    """
+    files = {entry.key: os.path.basename(entry.path) for entry in index.manifest.entries.values()}
+    rows = []
+    for doc_id, doc in index.store.iter_documents():
+        key, n = doc_id.rsplit("-", 1)
+        doc = index._hydrate(doc)
+        metadata = {k: v for k, v in doc.metadata.items() if k not in ("record", "records")}
+        rows.append((f"{files[key]}-{n}", doc.page_content, sorted(metadata.items())))
+    return sorted(rows)
+
+def test_parallel_build_matches_serial_build(tmp_path, monkeypatch):
+    """Tests that a parallel build stores the same IDs, contents and metadata as the serial build."""
+    logs = str(tmp_path / "logs")
+    _write_logs(logs)
+    embeddings = DeterministicFakeEmbedding(size=8)
+
+    serial = LogIndex(embeddings, str(tmp_path / "serial"), logs)
+    serial.build()
+
+    _parallel(monkeypatch, embeddings)
+    parallel = LogIndex(embeddings, str(tmp_path / "parallel"), logs)
+    parallel.build()
+
+    assert len(parallel.store) == len(serial.store) > 0
+    assert _snapshot(parallel) == _snapshot(serial)
+    assert {k: (e.offset, e.unit, e.count) for k, e in parallel.manifest.entries.items()} == \
+        {k: (e.offset, e.unit, e.count) for k, e in serial.manifest.entries.items()}
+
+def test_parallel_build_surfaces_worker_errors(tmp_path, monkeypatch):
+    """Tests that an exception in an embedding worker fails the build instead of being lost."""
+    logs = str(tmp_path / "logs")
+    _write_logs(logs)
+    _parallel(monkeypatch, _FailingEmbeddings())
+    index = LogIndex(DeterministicFakeEmbedding(size=8), str(tmp_path / "store"), logs)
+
+    with pytest.raises(RuntimeError, match="embedding model crashed"):
+        index.build()
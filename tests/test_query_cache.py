@@ -0,0 +1,39 @@
+import time
+from query_cache import QueryCache
+
+RESPONSE = {"summary": "3 errors", "evidence": []}
+
+def test_exact_hit_ignores_case_and_punctuation():
+    """Tests that a repeated question is answered from the exact level."""
+    cache = QueryCache(max_entries=8, ttl_seconds=60, similarity_threshold=0.95)
+    assert cache.get("Show errors", None, 1) is None
+    cache.put("Show errors", None, 1, RESPONSE)
+    assert cache.get("  show   ERRORS? ", None, 1) == RESPONSE
+    assert cache.stats()["exact_hits"] == 1 and cache.stats()["misses"] == 1
+
+def test_semantic_hit_requires_similarity_and_same_identifiers():
+    """Tests that close embeddings hit only when the digit-bearing tokens agree."""
+    cache = QueryCache(max_entries=8, ttl_seconds=60, similarity_threshold=0.95)
+    cache.put("errors on pod-64", None, 1, RESPONSE, embedding=[1.0, 0.0])
+    assert cache.get("which errors did pod-64 log", None, 1, embedding=[0.99, 0.05]) == RESPONSE
+    assert cache.get("errors on pod-65", None, 1, embedding=[1.0, 0.0]) is None
+    assert cache.get("pod-64 memory", None, 1, embedding=[0.0, 1.0]) is None
+    assert cache.stats()["semantic_hits"] == 1
+
+def test_scope_version_ttl_and_lru():
+    """Tests that entries are separated by scope and dropped on version change, expiry and overflow."""
+    cache = QueryCache(max_entries=2, ttl_seconds=0.05, similarity_threshold=0.95)
+    cache.put("a", (0.0, 10.0), 1, RESPONSE)
+    assert cache.get("a", None, 1) is None
+    assert cache.get("a", (0.0, 10.0), 2) is None
+    assert cache.stats()["invalidated"] == 1
+
+    cache.put("a", None, 1, RESPONSE)
+    time.sleep(0.06)
+    assert cache.get("a", None, 1) is None
+
+    cache.ttl_seconds = 60
+    for query in ("a", "b", "c"):
+        cache.put(query, None, 1, RESPONSE)
+    assert cache.get("a", None, 1) is None and cache.get("c", None, 1) == RESPONSE
+    assert cache.stats()["evicted"] == 1
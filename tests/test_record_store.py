@@ -0,0 +1,90 @@
+import os
+import pytest
+from record_store import RecordStore, flatten, parse_rendered, render
+
+def test_render_is_dense_and_reversible():
+    """Tests that nested fields flatten to one key=value line that parses back exactly."""
+    fields = flatten({"level": "ERROR", "request": "GET /health HTTP/1.1", "ctx": {"retries": 3, "ok": False}, "note": ""})
+    text = render(fields.items())
+
+    assert text == 'level=ERROR request="GET /health HTTP/1.1" ctx.retries=3 ctx.ok=false note=""'
+    assert parse_rendered(text) == list(fields.items())
+    assert parse_rendered("plain text line") is None
+    assert parse_rendered('a="b"') is None  # not the canonical form of a=b
+
+def test_records_survive_save_load_and_appends(tmp_path):
+    """Tests that records are interned, memory-mapped on load, and can still be appended to."""
+    store = RecordStore()
+    first = store.add("level=ERROR pod=api-1 status=503")
+    second = store.add("a free-form line")
+    store.add("level=ERROR pod=api-2 status=503")
+    directory = str(tmp_path / "records")
+    store.save(directory)
+
+    loaded = RecordStore.load(directory)
+    assert len(loaded) == 3
+    assert loaded.as_dict(first) == {"level": "ERROR", "pod": "api-1", "status": "503"}
+    assert loaded.text(second) == "a free-form line"
+
+    added = loaded.add("level=WARN pod=api-1")
+    loaded.save(directory)
+    assert RecordStore.load(directory).text(added) == "level=WARN pod=api-1"
+    assert len(RecordStore.load(str(tmp_path / "missing"))) == 0
+
+def test_saves_append_and_ignore_uncommitted_bytes(tmp_path):
+    """Tests that a later save only appends, and that bytes past the committed lengths are overwritten."""
+    directory = str(tmp_path / "records")
+    store = RecordStore()
+    store.add("level=ERROR pod=api-1")
+    store.save(directory)
+    keys_path = os.path.join(directory, "keys")
+    with open(keys_path, "rb") as f:
+        before = f.read()
+
+    store.add("level=INFO pod=api-2")
+    store.save(directory)
+    with open(keys_path, "rb") as f:
+        after = f.read()
+    assert after.startswith(before) and len(after) == 2 * len(before)
+
+    # A crash after appending but before committing leaves extra bytes behind.
+    with open(keys_path, "ab") as f:
+        f.write(b"\xff" * 12)
+    loaded = RecordStore.load(directory)
+    assert len(loaded) == 2
+    third = loaded.add("level=WARN pod=api-3")
+    loaded.save(directory)
+    reloaded = RecordStore.load(directory)
+    assert [reloaded.text(i) for i in range(3)] == ["level=ERROR pod=api-1", "level=INFO pod=api-2", "level=WARN pod=api-3"]
+    assert third == 2
+
+def test_released_records_are_compacted_away_and_the_rest_keep_their_ids(tmp_path):
+    """Tests that a save compacts once enough records are released, and that IDs survive it and reloads."""
+    directory = str(tmp_path / "records")
+    store = RecordStore()
+    ids = [store.add(f"level=INFO pod=api-{i} msg=m{i}") for i in range(8)]
+    store.save(directory)
+    blob_before = os.path.getsize(os.path.join(directory, "strings"))
+
+    store.release(ids[:1])  # below the threshold: only the release is saved
+    store.save(directory)
+    assert len(RecordStore.load(directory)) == 8 and RecordStore.load(directory).released == 1
+
+    loaded = RecordStore.load(directory)
+    loaded.release(ids[4:6])
+    added = loaded.add("level=WARN pod=api-9 msg=new")
+    loaded.save(directory)
+
+    reloaded = RecordStore.load(directory)
+    assert len(reloaded) == 6 and reloaded.released == 0
+    assert os.path.getsize(os.path.join(directory, "strings")) < blob_before
+    assert [reloaded.text(i) for i in ids[1:4] + ids[6:] + [added]] == [
+        "level=INFO pod=api-1 msg=m1", "level=INFO pod=api-2 msg=m2", "level=INFO pod=api-3 msg=m3",
+        "level=INFO pod=api-6 msg=m6",
+        "level=INFO pod=api-7 msg=m7", "level=WARN pod=api-9 msg=new"]
+    with pytest.raises(KeyError):
+        reloaded.fields(ids[0])
+
+    later = reloaded.add("level=ERROR pod=api-10")
+    reloaded.save(directory)
+    assert later == added + 1 and RecordStore.load(directory).text(later) == "level=ERROR pod=api-10"
@@ -0,0 +1,64 @@
+from datetime import datetime
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from log_index import LogIndex
+from rollups import Rollups
+
+def _rollups():
+    rollups = Rollups(bucket_seconds=60)
+    entries = [
+        ("10:05", "ERROR", "503", "api-1"), ("10:20", "ERROR", "503", "api-1"), ("10:40", "ERROR", "500", "api-2"),
+        ("10:50", "INFO", "200", "api-2"), ("08:00", "ERROR", "503", "api-3"),
+    ]
+    for clock, level, status, pod in entries:
+        rollups.add("file-a", {"timestamp": f"2025-09-13T{clock}:00+00:00", "level": level, "status": status, "pod": pod})
+    return rollups
+
+def test_count_questions_are_answered_as_tables():
+    """Tests that counts honour filters, grouping, top-N and a relative time range."""
+    rollups = _rollups()
+    reference = datetime.fromisoformat("2025-09-13T11:00:00+00:00")
+
+    response = rollups.answer("how many 5xx errors per pod in the last hour", None, reference)
+    assert response["summary"].startswith("3 log entries matching")
+    assert response["evidence"] == [{"type": "table", "content": {"headers": ["pod", "entries"],
+                                                                  "rows": [["api-1", 2], ["api-2", 1]]}}]
+
+    top = rollups.answer("top 1 pods by 503 count", None, reference)
+    assert top["evidence"][0]["content"]["rows"] == [["api-1", 2]]
+
+    total = rollups.answer("How many ERROR entries?", None, reference)
+    assert total["evidence"][0]["content"] == {"headers": ["entries"], "rows": [[4]]}
+
+    hourly = rollups.answer("error count per hour", None, reference)
+    assert hourly["evidence"][0]["content"]["rows"] == [["2025-09-13T08:00+00:00", 1], ["2025-09-13T10:00+00:00", 3]]
+
+def test_other_questions_go_to_the_rag_chain():
+    """Tests that open-ended questions and words counts can't account for are not aggregated."""
+    rollups = _rollups()
+    reference = datetime.fromisoformat("2025-09-13T11:00:00+00:00")
+    assert rollups.answer("why did api-1 return 503?", None, reference) is None
+    assert rollups.answer("how many errors were caused by the database timeout", None, reference) is None
+    assert rollups.answer("how many requests from 10.0.0.1", None, reference) is None
+    assert rollups.answer("show me the api-1 errors", None, reference) is None
+
+def test_ingestion_counts_each_entry_once(tmp_path):
+    """Tests that an unterminated last line is counted once it completes and truncated files are recounted."""
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    path = logs / "app.log"
+    path.write_text("ts=2025-09-13T10:00:00Z level=ERROR pod=api-1\nts=2025-09-13T10:00:01Z level=ERROR pod=api")
+    index = LogIndex(DeterministicFakeEmbedding(size=8), str(tmp_path / "store"), str(logs))
+    index.build()
+    assert len(index.rollups) == 1
+
+    with open(path, "a") as f:
+        f.write("-2\nts=2025-09-13T10:00:02Z level=INFO pod=api-2\n")
+    index.refresh()
+    assert index.aggregate("how many errors per pod")["evidence"][0]["content"]["rows"] == [["api-1", 1], ["api-2", 1]]
+    assert len(index.rollups) == 3
+
+    path.write_text("ts=2025-09-13T11:00:00Z level=WARN pod=api-3\n")
+    index.refresh()
+    reloaded = LogIndex(index.embeddings, index.store_path, str(logs))
+    reloaded.load_or_build(refresh=False)
+    assert reloaded.aggregate("count by level")["evidence"][0]["content"]["rows"] == [["warn", 1]]
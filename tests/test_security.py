@@ -1,10 +1,7 @@
-
-import sys, os
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import pytest
 
-from src.backend.security import mask_sensitive_data
-from src.backend.log_parser import (
+from security import Redactor, StreamMasker, load_patterns, mask_sensitive_data
+from log_parser import (
     parse_apache_log_line,
     parse_keyval_log_line,
     parse_singleline_log_line,
@@ -64,3 +61,35 @@ def test_mask_in_pretty_log():
     assert "[EMAIL_MASKED]" in masked
     assert "[IP_ADDRESS_MASKED]" in masked
     assert "[UUID_MASKED]" in masked
+
+def test_stream_masker_handles_secrets_split_across_chunks():
+    """Ensure secrets split over chunk boundaries are never emitted unmasked."""
+    chunks = ['{"summary": "ip 192.1', '68.1', '.1 and mail te', 'st@exam', 'ple.com", "id": "f47ac10b-58cc-',
+              '4372-a567-0e02b2c3d479"}']
+    masker = StreamMasker()
+    emitted = [masker.feed(chunk) for chunk in chunks] + [masker.flush()]
+    streamed = "".join(emitted)
+
+    assert streamed == mask_sensitive_data("".join(chunks))
+    for i in range(1, len(emitted)):
+        prefix = "".join(emitted[:i])
+        assert "192.1" not in prefix and "test@" not in prefix and "f47ac10b" not in prefix
+
+def test_stream_masker_emits_text_without_delay_at_breaks():
+    """Ensure text up to the last delimiter is released immediately."""
+    masker = StreamMasker()
+    assert masker.feed("The service failed ") == "The service failed "
+    assert masker.feed("twice") == ""
+    assert masker.flush() == "twice"
+
+def test_redactor_single_pass_with_custom_patterns():
+    """Tests that user-defined patterns are masked alongside the built-in ones, in one pass."""
+    patterns = load_patterns('{"api_key": "sk-[A-Za-z0-9]{8,}", "host": "db-(prod|stage)"}')
+    redactor = Redactor(patterns)
+    texts = ["key sk-AbCdEf123456 from 10.0.0.5", "db-prod down", "nothing here"]
+
+    assert redactor.redact_batch(texts) == [
+        "key [API_KEY_MASKED] from [IP_ADDRESS_MASKED]",
+        "[HOST_MASKED] down",
+        "nothing here",
+    ]
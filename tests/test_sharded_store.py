@@ -0,0 +1,99 @@
+import os
+import threading
+from datetime import datetime
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from sharded_store import UNDATED, ShardedVectorStore
+
+EMBEDDINGS = DeterministicFakeEmbedding(size=8)
+
+def _add(store, entries):
+    ids = [doc_id for doc_id, _ in entries]
+    chunks = [Document(page_content=doc_id, metadata={"timestamp": ts} if ts else {}) for doc_id, ts in entries]
+    store.add(ids, chunks, EMBEDDINGS.embed_documents(ids))
+
+def test_vectors_are_bucketed_by_utc_hour(tmp_path):
+    """Tests that entries land in hourly shards (UTC) and undated ones in their own shard."""
+    store = ShardedVectorStore(str(tmp_path), EMBEDDINGS, "hour")
+    _add(store, [("a", "2025-09-13T00:15:00+05:30"), ("b", "2025-09-13T00:45:00+05:30"), ("c", None)])
+    assert {name: shard.count for name, shard in store.shards.items()} == {"20250912T18": 1, "20250912T19": 1, UNDATED: 1}
+
+    start = datetime.fromisoformat("2025-09-13T00:40:00+05:30").timestamp()
+    assert store.overlapping(start, start + 600) == ["20250912T19"]
+    assert store.search(EMBEDDINGS.embed_query("b"), 5, buckets=["20250912T19"]) == ["b"]
+
+def test_shards_load_lazily_with_lru_eviction(tmp_path):
+    """Tests that a reloaded store only keeps the most recently used shards in memory."""
+    store = ShardedVectorStore(str(tmp_path), EMBEDDINGS, "hour", max_loaded=1)
+    _add(store, [("a", "2025-09-13T00:00:00Z"), ("b", "2025-09-13T01:00:00Z"), ("c", "2025-09-13T02:00:00Z")])
+    store.save()
+
+    reloaded = ShardedVectorStore.load(str(tmp_path), EMBEDDINGS, "hour", max_loaded=1)
+    assert reloaded.loaded_shards() == []
+    assert reloaded.get("b").page_content == "b"
+    assert reloaded.get("c").page_content == "c"
+    assert reloaded.loaded_shards() == ["20250913T02"]
+    assert sorted(reloaded.search(EMBEDDINGS.embed_query("a"), 3)) == ["a", "b", "c"]
+
+def test_delete_drops_empty_shards(tmp_path):
+    """Tests that deleting a shard's last vector removes the shard from disk on save."""
+    store = ShardedVectorStore(str(tmp_path), EMBEDDINGS, "day")
+    _add(store, [("a", "2025-09-12T10:00:00Z"), ("b", "2025-09-13T10:00:00Z")])
+    store.save()
+
+    assert [d.page_content for d in store.delete(["a", "missing"])] == ["a"]
+    store.save()
+    assert sorted(os.listdir(tmp_path / "shards")) == ["20250913"]
+    assert len(ShardedVectorStore.load(str(tmp_path), EMBEDDINGS, "day")) == 1
+
+def test_shards_convert_to_configured_index_type(tmp_path):
+    """Tests that a shard is rebuilt as a trained IVF index at the threshold and still deletes correctly."""
+    store = ShardedVectorStore(str(tmp_path), EMBEDDINGS, "day", index_factory="IVF4,Flat", train_min=200, nprobe=4)
+    _add(store, [(f"doc-{i}", "2025-09-13T10:00:00Z") for i in range(150)])
+    assert store.shards["20250913"].factory == "Flat"
+
+    _add(store, [(f"doc-{i}", "2025-09-13T10:00:00Z") for i in range(150, 250)])
+    assert store.shards["20250913"].factory == "IVF4,Flat"
+
+    # IVF keeps stale row labels on removal, so deletes must not shift later results.
+    store.delete([f"doc-{i}" for i in range(10)])
+    assert store.search(EMBEDDINGS.embed_query("doc-100"), 1) == ["doc-100"]
+    store.save()
+    reloaded = ShardedVectorStore.load(str(tmp_path), EMBEDDINGS, "day", index_factory="IVF4,Flat", nprobe=4)
+    assert reloaded.shards["20250913"].factory == "IVF4,Flat"
+    assert reloaded.search(EMBEDDINGS.embed_query("doc-200"), 1) == ["doc-200"]
+
+def test_mapped_shards_are_read_only_and_survive_saves(tmp_path):
+    """Tests that mmapped shards answer like loaded ones, reopen privately for writes, and outlive a save."""
+    writer = ShardedVectorStore(str(tmp_path), EMBEDDINGS, "hour")
+    _add(writer, [("a", "2025-09-13T00:00:00Z"), ("b", "2025-09-13T00:10:00Z"), ("c", "2025-09-13T00:20:00Z")])
+    writer.save()
+
+    reader = ShardedVectorStore.load(str(tmp_path), EMBEDDINGS, "hour", mmap=True)
+    query = EMBEDDINGS.embed_query("b")
+    assert reader.search(query, 2) == writer.search(query, 2)
+    assert reader.search(query, 5, candidate_ids=["a", "c"]) == writer.search(query, 5, candidate_ids=["a", "c"])
+    assert reader.get("c").page_content == "c" and reader.shards["20250913T00"].mapped
+
+    # Another process rewriting the shard swaps its directory; the mapped copy stays readable.
+    writer.delete(["a"])
+    writer.save()
+    assert [doc_id for doc_id, _ in reader.iter_documents()] == ["a", "b", "c"]
+
+    _add(reader, [("d", "2025-09-13T00:30:00Z")])
+    assert not reader.shards["20250913T00"].mapped
+    assert sorted(doc_id for doc_id, _ in reader.iter_documents()) == ["b", "c", "d"]
+
+def test_shards_are_saved_once_and_opened_after_a_concurrent_swap(tmp_path):
+    """Tests that only the mapped layout is written, and that a lazy open during a directory swap waits for it."""
+    writer = ShardedVectorStore(str(tmp_path), EMBEDDINGS, "hour")
+    _add(writer, [("a", "2025-09-13T00:00:00Z"), ("b", "2025-09-13T00:10:00Z")])
+    writer.save()
+    directory = tmp_path / "shards" / "20250913T00"
+    assert "index.pkl" not in os.listdir(directory)
+
+    reader = ShardedVectorStore.load(str(tmp_path), EMBEDDINGS, "hour", mmap=True)
+    aside = tmp_path / "shards" / "20250913T00.old"
+    os.rename(directory, aside)  # as _write_shard does in another process, between its two renames
+    threading.Timer(0.1, os.rename, (aside, directory)).start()
+    assert reader.get("b").page_content == "b"
@@ -0,0 +1,82 @@
+import sys
+import threading
+import time
+import types
+from fastapi.testclient import TestClient
+import main
+from log_index import try_ingest_lease
+
+def _fake_modules(monkeypatch, release, fail=False, store_path="vector_store"):
+    class RAGPipeline:
+        def __init__(self, llm):
+            release.wait(5)
+            if fail:
+                raise RuntimeError("no vector store")
+            self.dispatcher = types.SimpleNamespace(stats=dict, queued=0)
+            self.index = types.SimpleNamespace(store_path=store_path)
+
+        def refresh_index(self):
+            return {"added_chunks": 0}
+    monkeypatch.setitem(sys.modules, "llm_loader", types.SimpleNamespace(load_local_llm=lambda: object(),
+                                                                           warm_llm=lambda llm: None))
+    monkeypatch.setitem(sys.modules, "rag_pipeline", types.SimpleNamespace(RAGPipeline=RAGPipeline))
+    monkeypatch.setattr(main, "LIVE_INGEST_ENABLED", False)
+    monkeypatch.setattr(main.app.state, "rag_pipeline", None)
+    monkeypatch.setattr(main.app.state, "ingest_lease", None)
+    monkeypatch.setattr(main.app.state, "live_ingestor", None)
+    monkeypatch.setattr(main.app.state, "startup", {"state": "starting", "error": None})
+
+def _wait_until_loaded(client):
+    for _ in range(100):
+        if client.get("/api/health").json()["startup"]["state"] != "starting":
+            return
+        time.sleep(0.05)
+
+def test_server_is_live_before_the_pipeline_is_ready(monkeypatch, tmp_path):
+    """Tests that health answers while the pipeline loads, and readiness and queries wait for it."""
+    release = threading.Event()
+    _fake_modules(monkeypatch, release, store_path=str(tmp_path / "store"))
+    with TestClient(main.app) as client:
+        health = client.get("/api/health")
+        assert health.status_code == 200 and health.json()["ready"] is False
+        assert client.get("/api/health/ready").status_code == 503
+        query = client.post("/api/query", json={"query": "errors?"})
+        assert query.status_code == 503 and query.headers["Retry-After"] == "5"
+
+        release.set()
+        _wait_until_loaded(client)
+        assert client.get("/api/health/ready").json() == {"ready": True, "state": "ready", "error": None}
+
+def test_failed_load_is_reported(monkeypatch):
+    """Tests that a pipeline that fails to load keeps the server live but not ready, with the error."""
+    release = threading.Event()
+    release.set()
+    _fake_modules(monkeypatch, release, fail=True)
+    with TestClient(main.app) as client:
+        _wait_until_loaded(client)
+        assert client.get("/api/health").status_code == 200
+        ready = client.get("/api/health/ready")
+        assert ready.status_code == 503 and ready.json()["error"] == "no vector store"
+        assert "no vector store" in client.post("/api/query", json={"query": "errors?"}).json()["detail"]
+
+def test_only_the_lease_holder_refreshes(monkeypatch, tmp_path):
+    """Tests that a worker without the ingestion lease refuses refreshes and follows the holder instead."""
+    store = str(tmp_path / "store")
+    release = threading.Event()
+    release.set()
+    _fake_modules(monkeypatch, release, store_path=store)
+    holder = try_ingest_lease(store)  # another worker
+    try:
+        with TestClient(main.app) as client:
+            _wait_until_loaded(client)
+            assert client.post("/api/index/refresh").status_code == 409
+            assert client.get("/api/ingest/status").json()["role"] == "follower"
+    finally:
+        holder.close()
+
+    _fake_modules(monkeypatch, release, store_path=store)
+    with TestClient(main.app) as client:
+        _wait_until_loaded(client)
+        assert client.post("/api/index/refresh").json() == {"added_chunks": 0}
+        assert client.get("/api/ingest/status").json() == {"running": False}
+    main.app.state.ingest_lease.close()
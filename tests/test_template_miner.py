@@ -0,0 +1,68 @@
+import pytest
+from langchain_core.documents import Document
+from log_parser import parse_singleline_log_line
+from record_store import flatten, render
+from template_miner import PARAM, TemplateMiner
+
+def _doc(line, number):
+    parsed = parse_singleline_log_line(line)
+    return Document(page_content=render(flatten(parsed).items()), metadata={"source": "app-singleline.log", "line": number})
+
+def test_lines_differing_in_variable_fields_share_a_template():
+    """Tests that job IDs, pods, timestamps and attempt counts become parameter slots."""
+    miner = TemplateMiner()
+    first, needs_first = miner.add(_doc("2025-09-13T00:15:44+05:30 | orchestrator-eval-64 | DEBUG | event=dispatch | job=job-423 | to=python-infer | attempts=3", 1))
+    second, needs_second = miner.add(_doc("2025-09-13T00:16:02+05:30 | orchestrator-eval-12 | DEBUG | event=dispatch | job=job-977 | to=python-infer | attempts=1", 2))
+
+    assert first is second
+    assert needs_first and not needs_second
+    assert len(miner) == 1
+    assert second.text == f"timestamp={PARAM} pod={PARAM} level=DEBUG event=dispatch job={PARAM} to=python-infer attempts={PARAM}"
+
+def test_preserved_fields_keep_events_apart():
+    """Tests that a different level or event never merges into an existing template."""
+    miner = TemplateMiner()
+    debug, _ = miner.add(_doc("2025-09-13T00:15:44+05:30 | orchestrator-eval-64 | DEBUG | event=dispatch | job=job-423", 1))
+    error, _ = miner.add(_doc("2025-09-13T00:15:45+05:30 | orchestrator-eval-64 | ERROR | event=dispatch | job=job-424", 2))
+    other, _ = miner.add(_doc("2025-09-13T00:15:46+05:30 | orchestrator-eval-64 | DEBUG | event=db_save | job=job-425", 3))
+    assert len({debug.id, error.id, other.id}) == 3
+
+def test_expand_returns_recent_occurrences_with_timestamps():
+    """Tests that a template expands into its occurrences, newest first."""
+    miner = TemplateMiner()
+    for i in range(4):
+        template, _ = miner.add(_doc(f"2025-09-13T00:15:4{i}+00:00 | pod-{i} | INFO | event=health | req=req-{i}", i + 1))
+
+    occurrences = miner.expand(template.id, limit=2)
+    assert [o["line"] for o in occurrences] == [4, 3]
+    assert occurrences[0]["timestamp"] == "2025-09-13T00:15:43+00:00"
+    assert "seen 4 times" in miner.describe(template.id, limit=2)
+
+def test_plain_text_lines_are_mined_too(tmp_path):
+    """Tests whitespace-tokenised lines and that the miner survives a save/load round trip."""
+    miner = TemplateMiner()
+    miner.add(Document(page_content="GET /health 200 from 10.0.0.1", metadata={"source": "plain.log", "line": 1}))
+    template, needs_vector = miner.add(Document(page_content="GET /health 200 from 10.0.0.7", metadata={"source": "plain.log", "line": 2}))
+    assert not needs_vector
+    assert template.text == f"GET /health 200 from {PARAM}"
+
+    miner.save(str(tmp_path / "templates.pkl"))
+    loaded = TemplateMiner.load(str(tmp_path / "templates.pkl"))
+    assert loaded.templates[template.id].count == 2
+
+def test_journal_holds_occurrences_not_entries(tmp_path):
+    """Tests that journaled matches replay into the same templates without storing the entries themselves."""
+    path = str(tmp_path / "templates.pkl")
+    miner = TemplateMiner()
+    miner.add(_doc("2025-09-13T00:15:40+00:00 | pod-0 | INFO | event=health | req=req-0", 1))
+    miner.save(path)
+    for i in range(1, 4):
+        miner.add(_doc(f"2025-09-13T00:15:4{i}+00:00 | pod-{i} | INFO | event=health | req=req-{i}", i + 1))
+    miner.save(path)
+    with open(path + ".log", "rb") as f:
+        journal = f.read()
+    assert b"req-3" not in journal and b"2025-09-13" not in journal  # masked tokens, epoch timestamps
+
+    loaded = TemplateMiner.load(path)
+    assert [t.count for t in loaded.templates] == [t.count for t in miner.templates] == [4]
+    assert loaded.expand(0, limit=3) == miner.expand(0, limit=3)
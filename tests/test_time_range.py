@@ -0,0 +1,35 @@
+import math
+import pytest
+from datetime import datetime
+from time_range import explicit_time_range, parse_time_range
+
+REFERENCE = datetime.fromisoformat("2025-09-13T05:30:00+05:30")
+
+def _iso(epoch):
+    return datetime.fromtimestamp(epoch, REFERENCE.tzinfo).isoformat()
+
+def test_clock_times_resolve_on_reference_date_and_zone():
+    """Tests that 'between 00:10 and 00:20' uses the logs' date and timezone."""
+    start, end = parse_time_range("what happened between 00:10 and 00:20?", REFERENCE)
+    assert _iso(start) == "2025-09-13T00:10:00+05:30"
+    assert _iso(end) == "2025-09-13T00:20:00+05:30"
+
+def test_relative_ranges_end_at_reference():
+    """Tests 'last hour' and 'past 15 minutes' style expressions."""
+    assert parse_time_range("errors in the last hour", REFERENCE) == (REFERENCE.timestamp() - 3600, REFERENCE.timestamp())
+    start, end = parse_time_range("past 15 minutes", REFERENCE)
+    assert end - start == 900
+
+def test_open_ended_and_missing_ranges():
+    """Tests 'since' ranges and that questions without times give no range."""
+    start, end = parse_time_range("failures since 2025-09-13T01:00:00+05:30", REFERENCE)
+    assert _iso(start) == "2025-09-13T01:00:00+05:30" and end == math.inf
+    assert parse_time_range("ERROR logs from orchestrator-eval-64 with status 503", REFERENCE) is None
+
+def test_explicit_time_range_validation():
+    """Tests request-supplied bounds, including rejection of unparseable values."""
+    start, end = explicit_time_range("2025-09-13T00:00:00Z", None)
+    assert start == datetime.fromisoformat("2025-09-13T00:00:00+00:00").timestamp() and end == math.inf
+    assert explicit_time_range(None, None) is None
+    with pytest.raises(ValueError):
+        explicit_time_range("yesterday-ish", None)